@@ -109,12 +109,28 @@ async def update_api_key(
     return api_key
 
 
-async def delete_api_key_by_name(db_session: AsyncSession, project_id: UUID, name: str) -> None:
+async def get_api_key_hmacs_by_project(db_session: AsyncSession, project_id: UUID) -> list[str]:
+    """
+    Get the HMACs of all API keys of a project.
+    """
+    result = await db_session.execute(
+        select(APIKey.key_hmac).filter_by(project_id=project_id)
+    )
+    return list(result.scalars().all())
+
+
+async def delete_api_key_by_name(db_session: AsyncSession, project_id: UUID, name: str) -> str | None:
+    """
+    Delete an API key by its name within a project.
+    Returns the HMAC of the deleted API key (e.g. to invalidate caches), None if not found.
+    """
     statement = (
         delete(APIKey)
         .filter_by(project_id=project_id, name=name)
+        .returning(APIKey.key_hmac)
     )
-    await db_session.execute(statement)
+    result = await db_session.execute(statement)
+    return result.scalar_one_or_none()
 
 
 async def hard_delete_api_key(db_session: AsyncSession, api_key_id: UUID) -> None:
@@ -6,7 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from aci.common import utils
 from aci.common.db import crud
 from aci.common.db.sql_models import App, Function
-from aci.common.enums import Visibility
+from aci.common.enums import Protocol, Visibility
 from aci.common.exceptions import FunctionNotFound, ConflictError, AppNotFound
 from aci.common.logging_setup import get_logger
 from aci.common.schemas.function import FunctionUpsert, FunctionUpdate
@@ -131,6 +131,22 @@ async def get_functions(
     return list(result.scalars().all())
 
 
+async def get_active_function_names_by_protocol(
+        db_session: AsyncSession, protocol: Protocol
+) -> list[str]:
+    """Get the names of the active functions (of active apps) using the given protocol."""
+    statement = (
+        select(Function.name)
+        .join(App, Function.app_id == App.id)
+        .filter(Function.protocol == protocol)
+        .filter(App.active)
+        .filter(Function.active)
+    )
+
+    result = await db_session.execute(statement)
+    return list(result.scalars().all())
+
+
 async def get_functions_by_app_id(db_session: AsyncSession, app_id: UUID) -> list[Function]:
     statement = select(Function).filter(Function.app_id == app_id)
 
@@ -1,7 +1,7 @@
 from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import distinct, exists, func, select
+from sqlalchemy import column, distinct, exists, func, or_, select, update, values
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from aci.common import validators
@@ -62,6 +62,16 @@ async def get_linked_accounts_by_app_id(db_session: AsyncSession, app_id: UUID)
     return linked_accounts
 
 
+async def get_linked_account_by_id(
+    db_session: AsyncSession, linked_account_id: UUID
+) -> LinkedAccount | None:
+    """Get a linked account by its id, without access control, for internal use only."""
+    statement = select(LinkedAccount).filter_by(id=linked_account_id)
+    result = await db_session.execute(statement)
+    linked_account: LinkedAccount | None = result.scalar_one_or_none()
+    return linked_account
+
+
 # TODO: the access control (project_id check) should probably be done at the route level?
 async def get_linked_account_by_id_under_project(
     db_session: AsyncSession, linked_account_id: UUID, project_id: UUID
@@ -164,6 +174,37 @@ async def update_linked_account_last_used_at(
     return linked_account
 
 
+async def bulk_update_linked_accounts_last_used_at(
+    db_session: AsyncSession,
+    last_used_at_by_id: dict[UUID, datetime],
+) -> None:
+    """
+    Update last_used_at of many linked accounts in a single UPDATE ... FROM (VALUES ...) statement.
+    A linked account is only updated if the given timestamp is newer than the stored one.
+    """
+    if not last_used_at_by_id:
+        return
+
+    last_used_at_values = values(
+        column("id", LinkedAccount.__table__.c.id.type),
+        column("last_used_at", LinkedAccount.__table__.c.last_used_at.type),
+        name="last_used_at_values",
+    ).data(list(last_used_at_by_id.items()))
+    statement = (
+        update(LinkedAccount)
+        .where(
+            LinkedAccount.id == last_used_at_values.c.id,
+            or_(
+                LinkedAccount.last_used_at.is_(None),
+                LinkedAccount.last_used_at < last_used_at_values.c.last_used_at,
+            ),
+        )
+        .values(last_used_at=last_used_at_values.c.last_used_at)
+        .execution_options(synchronize_session=False)
+    )
+    await db_session.execute(statement)
+
+
 async def delete_linked_accounts(db_session: AsyncSession, project_id: UUID, app_name: str) -> int:
     statement = (
         select(LinkedAccount)
@@ -4,7 +4,7 @@ CRUD operations for MCP servers.
 from datetime import datetime
 from uuid import UUID, uuid4
 
-from sqlalchemy import select, update, delete, exists
+from sqlalchemy import column, or_, select, update, delete, exists, values
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from aci.common.db.sql_models import MCPServer
@@ -184,3 +184,34 @@ async def update_mcp_server_last_used_at(
     statement = update(MCPServer).filter_by(id=mcp_server_id).values(last_used_at=last_used_at)
     await db_session.execute(statement)
     await db_session.commit()
+
+
+async def bulk_update_mcp_servers_last_used_at(
+        db_session: AsyncSession,
+        last_used_at_by_id: dict[str, datetime],
+) -> None:
+    """
+    Update last_used_at of many MCP servers in a single UPDATE ... FROM (VALUES ...) statement.
+    An MCP server is only updated if the given timestamp is newer than the stored one.
+    """
+    if not last_used_at_by_id:
+        return
+
+    last_used_at_values = values(
+        column("id", MCPServer.__table__.c.id.type),
+        column("last_used_at", MCPServer.__table__.c.last_used_at.type),
+        name="last_used_at_values",
+    ).data(list(last_used_at_by_id.items()))
+    statement = (
+        update(MCPServer)
+        .where(
+            MCPServer.id == last_used_at_values.c.id,
+            or_(
+                MCPServer.last_used_at.is_(None),
+                MCPServer.last_used_at < last_used_at_values.c.last_used_at,
+            ),
+        )
+        .values(last_used_at=last_used_at_values.c.last_used_at)
+        .execution_options(synchronize_session=False)
+    )
+    await db_session.execute(statement)
@@ -5,7 +5,7 @@ TODO: function todelete project and all related data (app_configurations, api_ke
 from datetime import date
 from uuid import UUID
 
-from sqlalchemy import func, select, update
+from sqlalchemy import case, column, func, or_, select, update, values
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from aci.common import encryption
@@ -92,6 +92,47 @@ async def get_total_monthly_quota_usage_for_org(db_session: AsyncSession, org_id
     return quota_result or 0
 
 
+async def bulk_add_monthly_quota_used(
+        db_session: AsyncSession,
+        month: date,
+        quota_used_by_id: dict[UUID, int],
+) -> None:
+    """
+    Add quota usage of the given month (first day of the month) to many projects in a single
+    UPDATE ... FROM (VALUES ...) statement. The monthly usage of a project tracking an older month
+    is reset first, usage of a month older than the tracked one only counts in total_quota_used.
+    """
+    if not quota_used_by_id:
+        return
+
+    quota_used_values = values(
+        column("id", Project.__table__.c.id.type),
+        column("quota_used", Project.__table__.c.monthly_quota_used.type),
+        name="quota_used_values",
+    ).data(list(quota_used_by_id.items()))
+    quota_used = quota_used_values.c.quota_used
+    statement = (
+        update(Project)
+        .where(Project.id == quota_used_values.c.id)
+        .values(
+            monthly_quota_used=case(
+                (Project.monthly_quota_month == month, Project.monthly_quota_used + quota_used),
+                (
+                    or_(Project.monthly_quota_month.is_(None), Project.monthly_quota_month < month),
+                    quota_used,
+                ),
+                else_=Project.monthly_quota_used,
+            ),
+            monthly_quota_month=func.greatest(
+                func.coalesce(Project.monthly_quota_month, month), month
+            ),
+            total_quota_used=Project.total_quota_used + quota_used,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db_session.execute(statement)
+
+
 async def get_api_key(db_session: AsyncSession, key: str) -> APIKey | None:
     key_hmac = encryption.hmac_sha256(key)
     result = await db_session.execute(select(APIKey).filter_by(key_hmac=key_hmac))
@@ -82,7 +82,7 @@ class Project(Base):
 
     """ quota related fields: TODO: TBD how to implement quota system """
     # First day of the month in which `monthly_quota_used` applies (e.g., 2025-08-01)
-    monthly_quota_month: Mapped[date] = mapped_column(Date, nullable=True)
+    monthly_quota_month: Mapped[date | None] = mapped_column(Date, nullable=True, default=None)
     # Hard monthly cap (must be >= 0)
     monthly_quota_limit: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
     # Usage in the current tracked month (reset when month rolls)
@@ -256,6 +256,9 @@ class App(Base):
         init=False,
     )
     project_id: Mapped[UUID | None] = mapped_column(PGUUID(as_uuid=True), nullable=True, index=True, default=None)
+    # max concurrent outbound calls of the app's REST functions per worker, on its own bulkhead
+    # instead of the shared per-host one, e.g. for an API with a low rate limit. None for the default
+    max_concurrency: Mapped[int | None] = mapped_column(Integer, nullable=True, default=None)
 
     # deleting app will delete all functions under the app
     functions: Mapped[list[Function]] = relationship(
@@ -598,6 +601,10 @@ class ExecutionLog(Base):
         primary_key=True,
     )
     project_id: Mapped[UUID] = mapped_column(PGUUID(as_uuid=True), nullable=False)
+    # served from the function response cache, without calling the function
+    cached: Mapped[bool] = mapped_column(
+        Boolean, nullable=False, server_default=text("false"), default=False
+    )
 
     __table_args__ = (
         # These indexes are created by partitions maintainer
@@ -83,6 +83,28 @@ class FunctionDefinitionFormat(StrEnum):
     OPENAI_RESPONSES = "openai_responses"
 
 
+class ResponseProjection(StrEnum):
+    """
+    projection of a function execution result, see aci.server.response_projection
+    """
+
+    FULL = "full"  # the result as returned by the upstream
+    SCHEMA = "schema"  # only the fields declared in the function response schema
+    MINIMAL = "minimal"  # only the fields listed in the function response_projection
+
+
+class FunctionExecutionMode(StrEnum):
+    SYNC = "sync"  # the result is returned in the response
+    ASYNC = "async"  # a job is returned right away, see aci.server.function_jobs
+
+
+class FunctionJobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
 class ClientIdentityProvider(StrEnum):
     GOOGLE = "google"
     # GITHUB = "github"
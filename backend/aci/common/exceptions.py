@@ -496,4 +496,114 @@ class APIKeyNotFound(ACIException):
             title="API key not found",
             message=message,
             error_code=status.HTTP_404_NOT_FOUND,
-        )
\ No newline at end of file
+        )
+
+
+class UpstreamConcurrencyLimitExceeded(ACIException):
+    """
+    Exception raised when a function execution waited too long for a free slot of the upstream
+    host's concurrency limit
+    """
+
+    def __init__(self, message: str | None = None):
+        super().__init__(
+            title="Upstream concurrency limit exceeded",
+            message=message,
+            error_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+
+class FunctionJobNotFound(ACIException):
+    """
+    Exception raised when a function job is not found (or its result expired)
+    """
+
+    def __init__(self, message: str | None = None):
+        super().__init__(
+            title="Function job not found",
+            message=message,
+            error_code=status.HTTP_404_NOT_FOUND,
+        )
+
+
+class FunctionJobQueueFull(ACIException):
+    """
+    Exception raised when too many function jobs are waiting to be executed
+    """
+
+    def __init__(self, message: str | None = None):
+        super().__init__(
+            title="Function job queue full",
+            message=message,
+            error_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+
+class FunctionJobWebhookNotAllowed(ACIException):
+    """
+    Exception raised when the completion webhook url of a function job is not allowed (not https,
+    resolves to a private address, ...) or webhooks are not enabled
+    """
+
+    def __init__(self, message: str | None = None):
+        super().__init__(
+            title="Function job webhook not allowed",
+            message=message,
+            error_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class FunctionExecutionTimeout(ACIException):
+    """
+    Exception raised when a function execution didn't complete before its deadline
+    """
+
+    def __init__(self, message: str | None = None):
+        super().__init__(
+            title="Function execution timeout",
+            message=message,
+            error_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        )
+
+
+class ClientDisconnected(ACIException):
+    """
+    Exception raised when the client disconnected before the request completed,
+    the response is never sent
+    """
+
+    def __init__(self, message: str | None = None):
+        super().__init__(
+            title="Client disconnected",
+            message=message,
+            # non-standard "client closed request" status code (nginx)
+            error_code=499,
+        )
+
+
+class TooManyConcurrentExecutions(ACIException):
+    """
+    Exception raised when a function execution of a project can't be admitted, because the project
+    has too many executions in flight and waiting
+    """
+
+    def __init__(self, message: str | None = None):
+        super().__init__(
+            title="Too many concurrent executions",
+            message=message,
+            error_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+
+class RateLimitExceeded(ACIException):
+    """
+    Exception raised when an API key or its project sent more requests than the rate limits of its
+    subscription plan allow
+    """
+
+    def __init__(self, message: str | None = None):
+        super().__init__(
+            title="Rate limit exceeded",
+            message=message,
+            error_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
@@ -31,6 +31,8 @@ class AppUpsert(BaseModel, extra="forbid"):
     default_security_credentials_by_scheme: dict[
         SecurityScheme, APIKeySchemeCredentials | OAuth2SchemeCredentials | NoAuthSchemeCredentials
     ]
+    # max concurrent outbound calls of the app's REST functions per worker, None for the per-host default
+    max_concurrency: int | None = Field(default=None, ge=1)
     org_id: UUID | None = None
 
     @field_validator("name")
@@ -18,6 +18,7 @@ class ExecutionLogResponse(BaseModel):
     execution_time: int = Field(description="Execution time in milliseconds")
     created_at: datetime
     project_id: UUID
+    cached: bool = Field(default=False, description="Whether the result was served from cache")
 
 
 class ExecutionDetailResponse(BaseModel):
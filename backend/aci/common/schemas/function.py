@@ -7,7 +7,9 @@ from pydantic import BaseModel, ConfigDict, Field, RootModel, field_validator, m
 
 from aci.common.db.sql_models import MAX_STRING_LENGTH
 from aci.common.enums import (
+    ExecutionStatus,
     FunctionDefinitionFormat,
+    FunctionJobStatus,
     HttpLocation,
     HttpMethod,
     Protocol,
@@ -18,11 +20,21 @@ from aci.common.validator import (
     validate_function_parameters_schema_rest_protocol,
 )
 
+MAX_FUNCTION_EXECUTE_BATCH_SIZE = 50
+
 
 class RestMetadata(BaseModel):
     method: HttpMethod
     path: str
     server_url: str
+    # opt-in caching of successful results, only for read-only functions (see FunctionResponseCache)
+    cacheable: bool | None = None
+    cache_ttl: int | None = Field(default=None, ge=1, description="cache ttl in seconds")
+    # fields kept by the "minimal" response projection, e.g. ["id", "items.title"]
+    # (see aci.server.response_projection)
+    response_projection: list[str] | None = None
+    # deadline of the executions, unless requested by the caller (see aci.server.execution_deadline)
+    timeout_seconds: float | None = Field(default=None, gt=0)
 
 
 class ConnectorMetadata(RootModel[dict]):
@@ -159,6 +171,23 @@ class FunctionExecute(BaseModel):
     )
 
 
+class FunctionExecuteBatchItem(FunctionExecute):
+    function_name: str = Field(
+        ...,
+        max_length=MAX_STRING_LENGTH,
+        description="The name of the function to execute.",
+    )
+
+
+class FunctionExecuteBatch(BaseModel):
+    items: list[FunctionExecuteBatchItem] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_FUNCTION_EXECUTE_BATCH_SIZE,
+        description="The function calls to execute, they are executed concurrently.",
+    )
+
+
 class FunctionDetails(BaseModel):
     id: UUID
     app_name: str
@@ -242,3 +271,53 @@ class FunctionExecutionResult(BaseModel):
     success: bool
     data: Any | None = None  # adding "| None" just for clarity
     error: str | None = None
+
+
+class TruncatedResponseData(BaseModel):
+    """
+    Data of a failed execution whose upstream response body exceeded the max size,
+    the download is aborted and only a preview of the body is returned.
+    """
+
+    truncated: Literal[True] = True
+    max_bytes: int
+    status_code: int
+    content_type: str | None = None
+    # size announced by the upstream (Content-Length), if any
+    content_length: int | None = None
+    preview: str
+
+
+class FunctionJob(BaseModel):
+    """An asynchronous function execution (?mode=async), its result is kept for a limited time."""
+
+    id: UUID
+    function_name: str
+    status: FunctionJobStatus
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    # set once the job is finished
+    result: FunctionExecutionResult | None = None
+
+
+class FunctionJobWebhookSigningKey(BaseModel):
+    """
+    Key of the project the completion webhooks are signed with: the X-ACI-Webhook-Signature header
+    is "sha256=" + the hex HMAC-SHA256 of "<X-ACI-Webhook-Timestamp header>.<body>" with this key.
+    """
+
+    signing_key: str
+
+
+class FunctionExecuteBatchItemResult(FunctionExecutionResult):
+    function_name: str
+    status: ExecutionStatus
+    # HTTP status code of the error if the function could not be executed at all
+    # (e.g. function not found, linked account disabled)
+    error_code: int | None = None
+
+
+class FunctionExecuteBatchResult(BaseModel):
+    # in the same order as the items of the request
+    results: list[FunctionExecuteBatchItemResult]
@@ -9,6 +9,17 @@ class PlanType(Enum):
     TEAM = "team"
 
 
+class PlanRateLimits(BaseModel):
+    """Requests allowed per API key and per project of the plan, None for no limit."""
+
+    api_key_per_second: int | None = None
+    api_key_per_minute: int | None = None
+    api_key_per_day: int | None = None
+    project_per_second: int | None = None
+    project_per_minute: int | None = None
+    project_per_day: int | None = None
+
+
 class PlanFeatures(BaseModel):
     linked_accounts: int
     api_calls_monthly: int
@@ -16,6 +27,8 @@ class PlanFeatures(BaseModel):
     custom_oauth: bool
     log_retention_days: int
     projects: int
+    # if not set, the default rate limits of the plan are used (see SERVER_RATE_LIMIT_PLAN_TIERS)
+    rate_limits: PlanRateLimits | None = None
 
 
 class PlanUpdate(BaseModel, extra="forbid"):
@@ -1,12 +1,15 @@
 import json
 import os
 import re
+import time
 from functools import cache
+from typing import Any
 from uuid import UUID
 
 from sqlalchemy import Engine, create_engine
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, AsyncEngine, async_sessionmaker
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
 from aci.common.logging_setup import get_logger
 
@@ -78,10 +81,41 @@ def create_db_session(db_url: str) -> Session:
     return session
 
 
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool of the async engine that records the time spent getting a connection on checkout,
+    i.e. waiting for a connection to be returned to the pool or opening a new one.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._checkouts = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait_seconds = time.perf_counter() - start
+            self._checkouts += 1
+            self._wait_seconds += wait_seconds
+            self._max_wait_seconds = max(self._max_wait_seconds, wait_seconds)
+
+    def get_wait_metrics(self) -> dict[str, Any]:
+        return {
+            "checkouts": self._checkouts,
+            "wait_ms_total": round(self._wait_seconds * 1000, 3),
+            "wait_ms_max": round(self._max_wait_seconds * 1000, 3),
+        }
+
+
 @cache
 def get_db_async_engine(db_url: str) -> AsyncEngine:
     return create_async_engine(
         db_url,
+        poolclass=TimedAsyncQueuePool,
         pool_size=10,
         max_overflow=10,
         pool_timeout=30,
@@ -0,0 +1,325 @@
+"""
+Cache of verified API keys, so that API key authenticated requests (execute, MCP, ...) don't pay a
+database round trip just for the authentication.
+
+Two tiers, keyed by the HMAC of the API key (the API key itself is never stored):
+- a small in-process LRU with a short TTL, in front of
+- Redis (if configured, shared by all workers) with a longer TTL.
+
+Only active API keys are cached (with a snapshot of their project), unknown or inactive ones always
+go to the database. When an API key (or its project) is updated or deleted, its entries are
+removed from Redis and an invalidation is published, so that every worker drops it from its local
+cache right away. The local TTL bounds how long a worker can miss an invalidation (e.g. while
+reconnecting to Redis).
+
+NOTE: the project of a cached API key is a snapshot, not attached to any session, only its columns
+can be used (which is all the API key authenticated routes use: id, org_id, visibility_access).
+"""
+
+import abc
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any
+from uuid import UUID
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aci.common import encryption
+from aci.common.db import crud
+from aci.common.db.sql_models import Project
+from aci.common.enums import Visibility
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.api_key import APIKeyExtract
+from aci.server import config
+
+logger = get_logger(__name__)
+
+
+class ProjectSnapshot(BaseModel):
+    """The columns of a project, to cache it outside of any session."""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: UUID
+    org_id: UUID
+    name: str
+    visibility_access: Visibility
+    monthly_quota_month: date | None
+    monthly_quota_limit: int
+    monthly_quota_used: int
+    total_quota_used: int
+    created_at: datetime
+    updated_at: datetime
+
+    def to_project(self) -> Project:
+        project = Project(
+            org_id=self.org_id,
+            name=self.name,
+            visibility_access=self.visibility_access,
+            monthly_quota_limit=self.monthly_quota_limit,
+            monthly_quota_used=self.monthly_quota_used,
+            total_quota_used=self.total_quota_used,
+        )
+        project.id = self.id
+        project.monthly_quota_month = self.monthly_quota_month
+        project.created_at = self.created_at
+        project.updated_at = self.updated_at
+        return project
+
+
+class _CachedAPIKey(BaseModel):
+    id: UUID
+    name: str
+    project: ProjectSnapshot
+
+    def to_extract(self) -> APIKeyExtract:
+        return APIKeyExtract(id=self.id, name=self.name, project=self.project.to_project())
+
+
+class APIKeyCacheBase(abc.ABC):
+    def __init__(self, enabled: bool, local_ttl_seconds: float, local_max_size: int):
+        """
+        Args:
+            enabled: if False, API keys are always verified against the database
+            local_ttl_seconds: ttl of the in-process cache
+            local_max_size: max number of API keys in the in-process cache, least recently used
+                first out
+        """
+        self.enabled = enabled
+        self.local_ttl_seconds = local_ttl_seconds
+        self.local_max_size = local_max_size
+        # key hmac -> (expires at, cached API key)
+        self._local: OrderedDict[str, tuple[float, _CachedAPIKey]] = OrderedDict()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "invalidated": 0}
+
+    async def extract_api_key(self, db_session: AsyncSession, api_key: str) -> APIKeyExtract | None:
+        """
+        Same as crud.api_keys.extract_api_key, served from the cache when possible.
+
+        Returns:
+            The API key and its project, None if the API key is unknown or inactive
+        """
+        if not self.enabled or not api_key or not api_key.startswith("api_"):
+            return await crud.api_keys.extract_api_key(db_session, api_key)
+
+        key_hmac = encryption.hmac_sha256(api_key)
+        cached = self._get_local(key_hmac)
+        if cached is not None:
+            self._stats["local_hits"] += 1
+            return cached.to_extract()
+
+        try:
+            cached = await self._get_shared(key_hmac)
+        except Exception:
+            logger.exception("Failed to get API key from the shared cache")
+        if cached is not None:
+            self._stats["shared_hits"] += 1
+            self._set_local(key_hmac, cached)
+            return cached.to_extract()
+
+        self._stats["misses"] += 1
+        api_key_extract = await crud.api_keys.extract_api_key(db_session, api_key)
+        if api_key_extract is None:
+            return None
+
+        cached = _CachedAPIKey(
+            id=api_key_extract.id,
+            name=api_key_extract.name,
+            project=ProjectSnapshot.model_validate(api_key_extract.project),
+        )
+        self._set_local(key_hmac, cached)
+        try:
+            await self._set_shared(key_hmac, cached)
+        except Exception:
+            logger.exception("Failed to set API key in the shared cache")
+        return api_key_extract
+
+    async def invalidate(self, key_hmacs: list[str]) -> None:
+        """Drop API keys from the cache of every worker, e.g. when they are updated or deleted."""
+        if not key_hmacs:
+            return
+        self._drop_local(key_hmacs)
+        try:
+            await self._invalidate_shared(key_hmacs)
+        except Exception:
+            logger.exception("Failed to invalidate API keys in the shared cache")
+
+    @abc.abstractmethod
+    async def start(self) -> None:
+        """Start listening to the invalidations of the other workers."""
+        pass
+
+    @abc.abstractmethod
+    async def stop(self) -> None:
+        pass
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"local_size": len(self._local), **self._stats}
+
+    def _get_local(self, key_hmac: str) -> _CachedAPIKey | None:
+        entry = self._local.get(key_hmac)
+        if entry is None:
+            return None
+        expires_at, cached = entry
+        if expires_at <= time.monotonic():
+            del self._local[key_hmac]
+            return None
+        self._local.move_to_end(key_hmac)
+        return cached
+
+    def _set_local(self, key_hmac: str, cached: _CachedAPIKey) -> None:
+        self._local[key_hmac] = (time.monotonic() + self.local_ttl_seconds, cached)
+        self._local.move_to_end(key_hmac)
+        while len(self._local) > self.local_max_size:
+            self._local.popitem(last=False)
+
+    def _drop_local(self, key_hmacs: list[str]) -> None:
+        for key_hmac in key_hmacs:
+            if self._local.pop(key_hmac, None) is not None:
+                self._stats["invalidated"] += 1
+
+    @abc.abstractmethod
+    async def _get_shared(self, key_hmac: str) -> _CachedAPIKey | None:
+        pass
+
+    @abc.abstractmethod
+    async def _set_shared(self, key_hmac: str, cached: _CachedAPIKey) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def _invalidate_shared(self, key_hmacs: list[str]) -> None:
+        pass
+
+
+class InMemoryAPIKeyCache(APIKeyCacheBase):
+    """
+    Single tier cache, for deployments without Redis.
+    Invalidations only reach the worker making the change, the other workers pick up the change
+    within the local TTL.
+    """
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def _get_shared(self, key_hmac: str) -> _CachedAPIKey | None:
+        return None
+
+    async def _set_shared(self, key_hmac: str, cached: _CachedAPIKey) -> None:
+        pass
+
+    async def _invalidate_shared(self, key_hmacs: list[str]) -> None:
+        pass
+
+
+class RedisAPIKeyCache(APIKeyCacheBase):
+    def __init__(
+        self,
+        redis_client: Any,
+        key_prefix: str,
+        ttl_seconds: int,
+        reconnect_delay_seconds: float,
+        enabled: bool,
+        local_ttl_seconds: float,
+        local_max_size: int,
+    ):
+        """
+        Args:
+            redis_client: the Redis client
+            key_prefix: prefix of the Redis keys, and name of the invalidation channel
+            ttl_seconds: ttl of the API keys in Redis
+            reconnect_delay_seconds: delay before subscribing again after a Redis error
+        """
+        super().__init__(enabled, local_ttl_seconds, local_max_size)
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self.ttl_seconds = ttl_seconds
+        self.reconnect_delay_seconds = reconnect_delay_seconds
+        self.channel = f"{key_prefix}:invalidations"
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if not self.enabled or (self._task and not self._task.done()):
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"API key cache invalidation listener started, channel={self.channel}")
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info("API key cache invalidation listener stopped")
+
+    async def _get_shared(self, key_hmac: str) -> _CachedAPIKey | None:
+        value = await self.redis_client.get(self._key(key_hmac))
+        return _CachedAPIKey.model_validate_json(value) if value else None
+
+    async def _set_shared(self, key_hmac: str, cached: _CachedAPIKey) -> None:
+        await self.redis_client.set(
+            self._key(key_hmac), cached.model_dump_json(), ex=self.ttl_seconds
+        )
+
+    async def _invalidate_shared(self, key_hmacs: list[str]) -> None:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(*[self._key(key_hmac) for key_hmac in key_hmacs])
+            for key_hmac in key_hmacs:
+                pipe.publish(self.channel, key_hmac)
+            await pipe.execute()
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                async with self.redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # entries cached while not subscribed may have missed invalidations
+                    self._local.clear()
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self._drop_local([message["data"]])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(
+                    f"API key cache invalidation listener failed, retrying in "
+                    f"{self.reconnect_delay_seconds}s"
+                )
+                self._local.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._stop_event.wait(), timeout=self.reconnect_delay_seconds
+                    )
+                except TimeoutError:
+                    pass
+
+    def _key(self, key_hmac: str) -> str:
+        return f"{self.key_prefix}:{key_hmac}"
+
+
+api_key_cache: APIKeyCacheBase
+if config.REDIS_HOST:
+    from aci.server.redis_client import redis_client
+
+    api_key_cache = RedisAPIKeyCache(
+        redis_client=redis_client,
+        key_prefix=config.API_KEY_CACHE_REDIS_KEY_PREFIX,
+        ttl_seconds=config.API_KEY_CACHE_TTL_SECONDS,
+        reconnect_delay_seconds=config.API_KEY_CACHE_RECONNECT_DELAY_SECONDS,
+        enabled=config.API_KEY_CACHE_ENABLED,
+        local_ttl_seconds=config.API_KEY_CACHE_LOCAL_TTL_SECONDS,
+        local_max_size=config.API_KEY_CACHE_LOCAL_MAX_SIZE,
+    )
+else:
+    api_key_cache = InMemoryAPIKeyCache(
+        enabled=config.API_KEY_CACHE_ENABLED,
+        local_ttl_seconds=config.API_KEY_CACHE_LOCAL_TTL_SECONDS,
+        local_max_size=config.API_KEY_CACHE_LOCAL_MAX_SIZE,
+    )
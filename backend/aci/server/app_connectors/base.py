@@ -1,3 +1,4 @@
+import contextvars
 from abc import ABC, abstractmethod
 
 from aci.common.db.sql_models import LinkedAccount
@@ -12,9 +13,16 @@ from aci.common.schemas.security_scheme import (
     OAuth2Scheme,
     OAuth2SchemeCredentials,
 )
+from aci.server.connector_execution_engine import connector_execution_engine
 
 logger = get_logger(__name__)
 
+# linked account of the current execution, it's not kept on the connector instance as instances
+# are shared by concurrent executions (see aci.server.connector_instance_cache)
+_execution_linked_account: contextvars.ContextVar[LinkedAccount | None] = contextvars.ContextVar(
+    "connector_execution_linked_account", default=None
+)
+
 
 class AppConnectorBase(ABC):
     """
@@ -32,10 +40,29 @@ class AppConnectorBase(ABC):
         | APIKeySchemeCredentials
         | NoAuthSchemeCredentials,
     ):
-        self.linked_account = linked_account
+        self._linked_account = linked_account
         self.security_scheme = security_scheme
         self.security_credentials = security_credentials
 
+    @property
+    def linked_account(self) -> LinkedAccount:
+        """
+        The linked account as passed to the current execution (it's checked, e.g. enabled, on every
+        execution), the one the instance was built with outside of an execution.
+        """
+        linked_account = _execution_linked_account.get()
+        if linked_account is not None and linked_account.id == self._linked_account.id:
+            return linked_account
+        return self._linked_account
+
+    # optional hook, empty by default
+    @classmethod  # noqa: B027
+    def preload(cls) -> None:
+        """
+        Load the static resources of the connector (e.g. API discovery documents) ahead of the
+        first execution, called at startup. Runs in a thread, so it can block.
+        """
+
     @abstractmethod
     def _before_execute(self) -> None:
         """
@@ -43,10 +70,27 @@ class AppConnectorBase(ABC):
         """
         pass
 
-    def execute(self, method_name: str, function_input: dict) -> FunctionExecutionResult:
+    async def execute(
+        self,
+        method_name: str,
+        function_input: dict,
+        linked_account: LinkedAccount | None = None,
+    ) -> FunctionExecutionResult:
         """
         This method is the main entry point for executing a function.
+        Both sync and async (coroutine) connector methods are supported, sync methods are run in
+        the connector execution engine's thread pool to avoid blocking the event loop.
+
+        Args:
+            linked_account: the latest state of the linked account, for a cached instance
         """
+        token = _execution_linked_account.set(linked_account)
+        try:
+            return await self._execute(method_name, function_input)
+        finally:
+            _execution_linked_account.reset(token)
+
+    async def _execute(self, method_name: str, function_input: dict) -> FunctionExecutionResult:
         logger.info(
             f"Executing via connector, method_name={method_name}, "
             f"class_name={self.__class__.__name__}"
@@ -65,7 +109,9 @@ class AppConnectorBase(ABC):
             logger.info(
                 f"Executing method, method_name={method_name}, class_name={self.__class__.__name__}"
             )
-            result = method(**function_input)
+            result = await connector_execution_engine.run(
+                self.__class__.__name__, method, function_input
+            )
             return FunctionExecutionResult(success=True, data=result)
         except Exception as e:
             logger.exception(
@@ -1,7 +1,5 @@
 from typing import Any, override
 
-from e2b_code_interpreter import Sandbox
-
 from aci.common.db.sql_models import LinkedAccount
 from aci.common.logging_setup import get_logger
 from aci.common.schemas.security_scheme import (
@@ -9,6 +7,7 @@ from aci.common.schemas.security_scheme import (
     APIKeySchemeCredentials,
 )
 from aci.server.app_connectors.base import AppConnectorBase
+from aci.server.e2b_sandbox_pool import e2b_sandbox_pool
 
 logger = get_logger(__name__)
 
@@ -38,6 +37,7 @@ class E2b(AppConnectorBase):
         """
         Execute code in E2B sandbox and return the result.
         """
-        with Sandbox(api_key=self.api_key) as sandbox:
+        # warm sandbox of the API key, in a fresh code context, see aci.server.e2b_sandbox_pool
+        with e2b_sandbox_pool.lease(self.api_key) as sandbox:
             execution = sandbox.run_code(code)
             return {"text": execution.text}
@@ -1,9 +1,12 @@
 import base64
+import json
+import threading
 from email.mime.text import MIMEText
-from typing import override
+from typing import Any, override
 
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import Resource, build_from_document  # type: ignore[attr-defined]
+from googleapiclient.discovery_cache import get_static_doc
 
 from aci.common.db.sql_models import LinkedAccount
 from aci.common.logging_setup import get_logger
@@ -15,6 +18,26 @@ from aci.server.app_connectors.base import AppConnectorBase
 
 logger = get_logger(__name__)
 
+# parsed discovery document of the Gmail API, see Gmail.preload
+_discovery_document: dict[str, Any] | None = None
+_discovery_document_lock = threading.Lock()
+
+
+def _get_discovery_document() -> dict[str, Any]:
+    """
+    The discovery document shipped with googleapiclient (what build() loads and parses on every
+    call), loaded and parsed once.
+    """
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_document_lock:
+            if _discovery_document is None:
+                content = get_static_doc("gmail", "v1")  # type: ignore[no-untyped-call]
+                if content is None:
+                    raise RuntimeError("static discovery document of gmail v1 not found")
+                _discovery_document = json.loads(content)
+    return _discovery_document
+
 
 # TODO: how should we handle args are passed as flattened? separated by double underscore?
 # e.g. person__name, person__title. maybe need to preprocess the args before passing to the method?
@@ -34,6 +57,22 @@ class Gmail(AppConnectorBase):
             token=security_credentials.access_token,
             refresh_token=security_credentials.refresh_token,
         )
+        # instances are cached and shared by concurrent executions (see
+        # aci.server.connector_instance_cache) but the http client of a service isn't thread-safe,
+        # so each thread builds its own service
+        self._local = threading.local()
+
+    @classmethod
+    @override
+    def preload(cls) -> None:
+        _get_discovery_document()
+
+    def _get_service(self) -> Resource:
+        service: Resource | None = getattr(self._local, "service", None)
+        if service is None:
+            service = build_from_document(_get_discovery_document(), credentials=self.credentials)
+            self._local.service = service
+        return service
 
     @override
     def _before_execute(self) -> None:
@@ -84,7 +123,7 @@ class Gmail(AppConnectorBase):
         # Create the final message body
         message_body = {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()}
 
-        service = build("gmail", "v1", credentials=self.credentials)
+        service = self._get_service()
 
         sent_message = service.users().messages().send(userId=sender, body=message_body).execute()  # type: ignore
 
@@ -133,7 +172,7 @@ class Gmail(AppConnectorBase):
         # Create the message body
         message_body = {"message": {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()}}
 
-        service = build("gmail", "v1", credentials=self.credentials)
+        service = self._get_service()
 
         # Create the draft
         draft = service.users().drafts().create(userId=sender, body=message_body).execute()  # type: ignore
@@ -187,7 +226,7 @@ class Gmail(AppConnectorBase):
             "message": {"raw": base64.urlsafe_b64encode(message.as_bytes()).decode()},
         }
 
-        service = build("gmail", "v1", credentials=self.credentials)
+        service = self._get_service()
 
         # Update the draft
         updated_draft = (
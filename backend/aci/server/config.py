@@ -1,3 +1,4 @@
+import json
 import os
 
 from aci.common.utils import check_and_get_env_variable, construct_db_url
@@ -35,6 +36,20 @@ SVIX_SIGNING_SECRET = check_and_get_env_variable("SERVER_SVIX_SIGNING_SECRET")
 # RATE LIMITS
 RATE_LIMIT_IP_PER_SECOND = int(check_and_get_env_variable("SERVER_RATE_LIMIT_IP_PER_SECOND"))
 RATE_LIMIT_IP_PER_DAY = int(check_and_get_env_variable("SERVER_RATE_LIMIT_IP_PER_DAY"))
+# per API key and per project rate limits per subscription plan name (see PlanRateLimits), used
+# for plans that don't define their own rate_limits feature
+RATE_LIMIT_PLAN_TIERS: dict[str, dict[str, int]] = json.loads(
+    os.getenv(
+        "SERVER_RATE_LIMIT_PLAN_TIERS",
+        '{"free": {"api_key_per_second": 10, "project_per_second": 20, "project_per_minute": 600},'
+        ' "starter": {"api_key_per_second": 20, "project_per_second": 40, "project_per_minute": 1200},'
+        ' "team": {"api_key_per_second": 50, "project_per_second": 100, "project_per_minute": 3000}}',
+    )
+)
+RATE_LIMIT_TIER_CACHE_TTL_SECONDS = int(os.getenv("SERVER_RATE_LIMIT_TIER_CACHE_TTL_SECONDS", "300"))
+RATE_LIMIT_REDIS_KEY_PREFIX = os.getenv("SERVER_RATE_LIMIT_REDIS_KEY_PREFIX", "ratelimit")
+# max number of counters (in-memory limiter) and of clients shed locally, per worker
+RATE_LIMIT_LOCAL_MAX_SIZE = int(os.getenv("SERVER_RATE_LIMIT_LOCAL_MAX_SIZE", "100000"))
 
 # QUOTA
 PROJECT_DAILY_QUOTA = int(check_and_get_env_variable("SERVER_PROJECT_DAILY_QUOTA"))
@@ -46,6 +61,8 @@ EXECUTION_LOG_APPENDER_FLUSH_EVERY_MS = int(os.getenv("SERVER_EXECUTION_LOG_APPE
 EXECUTION_LOG_APPENDER_MAX_BATCH = int(os.getenv("SERVER_EXECUTION_LOG_APPENDER_MAX_BATCH", "500"))
 EXECUTION_LOG_APPENDER_DROP_POLICY = os.getenv("SERVER_EXECUTION_LOG_APPENDER_DROP_POLICY", "drop_new_lowprio")
 EXECUTION_LOG_APPENDER_REDIS_QUEUE_NAME = os.getenv("SERVER_EXECUTION_LOG_APPENDER_REDIS_QUEUE_NAME", "execution_logs")
+# request/response of an execution larger than this (serialized) are stored as a truncated preview
+EXECUTION_LOG_DETAIL_MAX_BYTES = int(os.getenv("SERVER_EXECUTION_LOG_DETAIL_MAX_BYTES", "65536"))
 
 # Redis
 REDIS_HOST = os.getenv("SERVER_REDIS_HOST")# Fallback to in-memory storage if redis is not configured
@@ -53,6 +70,291 @@ REDIS_PORT = int(os.getenv("SERVER_REDIS_PORT", "6379"))
 REDIS_PASSWORD = os.getenv("SERVER_REDIS_PASSWORD", None)
 REDIS_DB = int(os.getenv("SERVER_REDIS_DB", "0"))
 
+# HTTP CLIENT (shared by REST function executors)
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("SERVER_HTTP_CLIENT_MAX_CONNECTIONS", "500"))
+HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SERVER_HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", "100"))
+HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("SERVER_HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SERVER_HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS", "10"))
+HTTP_CLIENT_READ_TIMEOUT_SECONDS = float(os.getenv("SERVER_HTTP_CLIENT_READ_TIMEOUT_SECONDS", "30"))
+HTTP_CLIENT_WRITE_TIMEOUT_SECONDS = float(os.getenv("SERVER_HTTP_CLIENT_WRITE_TIMEOUT_SECONDS", "10"))
+HTTP_CLIENT_POOL_TIMEOUT_SECONDS = float(os.getenv("SERVER_HTTP_CLIENT_POOL_TIMEOUT_SECONDS", "10"))
+HTTP_CLIENT_HTTP2 = os.getenv("SERVER_HTTP_CLIENT_HTTP2", "false").lower() == "true"
+
+# FUNCTION EXECUTION
+# max number of functions whose compiled input validators are cached per worker
+FUNCTION_INPUT_VALIDATOR_CACHE_SIZE = int(
+    os.getenv("SERVER_FUNCTION_INPUT_VALIDATOR_CACHE_SIZE", "2048")
+)
+
+# max number of function lookups cached by the execution context resolver per worker
+EXECUTION_CONTEXT_CACHE_SIZE = int(os.getenv("SERVER_EXECUTION_CONTEXT_CACHE_SIZE", "4096"))
+EXECUTION_CONTEXT_CACHE_TTL_SECONDS = int(
+    os.getenv("SERVER_EXECUTION_CONTEXT_CACHE_TTL_SECONDS", "60")
+)
+
+# max number of items of one batch execution request executed at the same time
+FUNCTION_EXECUTE_BATCH_MAX_CONCURRENCY = int(
+    os.getenv("SERVER_FUNCTION_EXECUTE_BATCH_MAX_CONCURRENCY", "5")
+)
+
+# deadline of an execution, unless requested with the X-REQUEST-TIMEOUT header or set per function
+# with "timeout_seconds" in protocol_data, see aci.server.execution_deadline
+FUNCTION_EXECUTION_DEFAULT_TIMEOUT_SECONDS = float(
+    os.getenv("SERVER_FUNCTION_EXECUTION_DEFAULT_TIMEOUT_SECONDS", "60")
+)
+FUNCTION_EXECUTION_MAX_TIMEOUT_SECONDS = float(
+    os.getenv("SERVER_FUNCTION_EXECUTION_MAX_TIMEOUT_SECONDS", "300")
+)
+# how often the execute route checks whether the client is still connected
+CLIENT_DISCONNECT_POLL_INTERVAL_SECONDS = float(
+    os.getenv("SERVER_CLIENT_DISCONNECT_POLL_INTERVAL_SECONDS", "0.5")
+)
+
+# LAST USED AT
+# last_used_at of linked accounts and MCP servers is recorded in memory ("memory") or
+# Redis ("redis") and flushed to the database periodically
+LAST_USED_AT_RECORDER_BACKEND = os.getenv("SERVER_LAST_USED_AT_RECORDER_BACKEND", "memory")
+LAST_USED_AT_RECORDER_REDIS_KEY_PREFIX = os.getenv(
+    "SERVER_LAST_USED_AT_RECORDER_REDIS_KEY_PREFIX", "last_used_at"
+)
+LAST_USED_AT_FLUSH_EVERY_SECONDS = float(os.getenv("SERVER_LAST_USED_AT_FLUSH_EVERY_SECONDS", "5"))
+
+# OAUTH2 TOKEN REFRESH
+# access tokens are considered expired (and refreshed) this long before their actual expiry
+OAUTH2_TOKEN_REFRESH_LEEWAY_SECONDS = int(
+    os.getenv("SERVER_OAUTH2_TOKEN_REFRESH_LEEWAY_SECONDS", "60")
+)
+# refreshes of the same linked account are serialized across workers with a Redis lock (if configured)
+OAUTH2_TOKEN_REFRESH_LOCK_TIMEOUT_SECONDS = int(
+    os.getenv("SERVER_OAUTH2_TOKEN_REFRESH_LOCK_TIMEOUT_SECONDS", "30")
+)
+OAUTH2_TOKEN_REFRESH_LOCK_KEY_PREFIX = os.getenv(
+    "SERVER_OAUTH2_TOKEN_REFRESH_LOCK_KEY_PREFIX", "oauth2_token_refresh"
+)
+# tokens of recently used linked accounts expiring within this window are refreshed in the background
+OAUTH2_PROACTIVE_REFRESH_WINDOW_SECONDS = (
+    int(os.getenv("SERVER_OAUTH2_PROACTIVE_REFRESH_WINDOW_MINUTES", "5")) * 60
+)
+OAUTH2_PROACTIVE_REFRESH_INTERVAL_SECONDS = float(
+    os.getenv("SERVER_OAUTH2_PROACTIVE_REFRESH_INTERVAL_SECONDS", "30")
+)
+OAUTH2_PROACTIVE_REFRESH_MAX_CONCURRENCY = int(
+    os.getenv("SERVER_OAUTH2_PROACTIVE_REFRESH_MAX_CONCURRENCY", "10")
+)
+OAUTH2_PROACTIVE_REFRESH_MAX_TRACKED = int(
+    os.getenv("SERVER_OAUTH2_PROACTIVE_REFRESH_MAX_TRACKED", "10000")
+)
+
+# OAUTH2 CLIENT POOL
+# clients for the OAuth2 token endpoints, one per (access_token_url, client_id, token_endpoint_auth_method)
+OAUTH2_CLIENT_POOL_MAX_SIZE = int(os.getenv("SERVER_OAUTH2_CLIENT_POOL_MAX_SIZE", "256"))
+OAUTH2_CLIENT_KEEPALIVE_EXPIRY_SECONDS = float(
+    os.getenv("SERVER_OAUTH2_CLIENT_KEEPALIVE_EXPIRY_SECONDS", "60")
+)
+
+# UPSTREAM RESILIENCE (REST function executions)
+# circuit breaker per upstream host, opened on a high failure rate (transport errors and 5xx)
+UPSTREAM_CIRCUIT_BREAKER_ENABLED = (
+    os.getenv("SERVER_UPSTREAM_CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+)
+UPSTREAM_CIRCUIT_BREAKER_MAX_HOSTS = int(os.getenv("SERVER_UPSTREAM_CIRCUIT_BREAKER_MAX_HOSTS", "1024"))
+UPSTREAM_CIRCUIT_BREAKER_WINDOW_SECONDS = int(
+    os.getenv("SERVER_UPSTREAM_CIRCUIT_BREAKER_WINDOW_SECONDS", "30")
+)
+UPSTREAM_CIRCUIT_BREAKER_MIN_REQUESTS = int(
+    os.getenv("SERVER_UPSTREAM_CIRCUIT_BREAKER_MIN_REQUESTS", "20")
+)
+UPSTREAM_CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD = float(
+    os.getenv("SERVER_UPSTREAM_CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD", "0.5")
+)
+UPSTREAM_CIRCUIT_BREAKER_OPEN_SECONDS = float(
+    os.getenv("SERVER_UPSTREAM_CIRCUIT_BREAKER_OPEN_SECONDS", "30")
+)
+UPSTREAM_CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS = int(
+    os.getenv("SERVER_UPSTREAM_CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS", "3")
+)
+# retries of idempotent requests on transport errors and 429/5xx responses, 1 to disable
+UPSTREAM_RETRY_MAX_ATTEMPTS = int(os.getenv("SERVER_UPSTREAM_RETRY_MAX_ATTEMPTS", "3"))
+UPSTREAM_RETRY_BACKOFF_BASE_SECONDS = float(
+    os.getenv("SERVER_UPSTREAM_RETRY_BACKOFF_BASE_SECONDS", "0.2")
+)
+UPSTREAM_RETRY_BACKOFF_MAX_SECONDS = float(
+    os.getenv("SERVER_UPSTREAM_RETRY_BACKOFF_MAX_SECONDS", "5")
+)
+UPSTREAM_RETRY_AFTER_MAX_SECONDS = float(os.getenv("SERVER_UPSTREAM_RETRY_AFTER_MAX_SECONDS", "10"))
+# bulkhead per upstream host: max concurrent calls per worker, can be overridden per host
+# (and per app with App.max_concurrency), e.g. SERVER_UPSTREAM_BULKHEAD_MAX_CONCURRENCY_OVERRIDES='{"api.hubapi.com": 10}'
+UPSTREAM_BULKHEAD_MAX_CONCURRENCY = int(os.getenv("SERVER_UPSTREAM_BULKHEAD_MAX_CONCURRENCY", "100"))
+UPSTREAM_BULKHEAD_MAX_CONCURRENCY_OVERRIDES: dict[str, int] = json.loads(
+    os.getenv("SERVER_UPSTREAM_BULKHEAD_MAX_CONCURRENCY_OVERRIDES", "{}")
+)
+# how long a call waits for a free slot before failing with 429
+UPSTREAM_BULKHEAD_QUEUE_TIMEOUT_SECONDS = float(
+    os.getenv("SERVER_UPSTREAM_BULKHEAD_QUEUE_TIMEOUT_SECONDS", "5")
+)
+
+# UPSTREAM RESPONSES (REST function executions)
+# bodies are streamed, the download is aborted once this size is exceeded (10MB)
+UPSTREAM_RESPONSE_MAX_BYTES = int(os.getenv("SERVER_UPSTREAM_RESPONSE_MAX_BYTES", "10485760"))
+# size of the preview returned for a body exceeding the max size
+UPSTREAM_RESPONSE_PREVIEW_BYTES = int(os.getenv("SERVER_UPSTREAM_RESPONSE_PREVIEW_BYTES", "4096"))
+
+# FUNCTION RESPONSE CACHE
+# opt-in per function with "cacheable" / "cache_ttl" in protocol_data, stored in the default aiocache cache
+FUNCTION_RESPONSE_CACHE_ENABLED = (
+    os.getenv("SERVER_FUNCTION_RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+)
+FUNCTION_RESPONSE_CACHE_DEFAULT_TTL_SECONDS = int(
+    os.getenv("SERVER_FUNCTION_RESPONSE_CACHE_DEFAULT_TTL_SECONDS", "30")
+)
+FUNCTION_RESPONSE_CACHE_MAX_TTL_SECONDS = int(
+    os.getenv("SERVER_FUNCTION_RESPONSE_CACHE_MAX_TTL_SECONDS", "3600")
+)
+# results larger than this are not cached
+FUNCTION_RESPONSE_CACHE_MAX_ENTRY_BYTES = int(
+    os.getenv("SERVER_FUNCTION_RESPONSE_CACHE_MAX_ENTRY_BYTES", "262144")
+)
+# max time concurrent misses of the same key wait for the first one to fill the cache
+FUNCTION_RESPONSE_CACHE_LOCK_LEASE_SECONDS = float(
+    os.getenv("SERVER_FUNCTION_RESPONSE_CACHE_LOCK_LEASE_SECONDS", "10")
+)
+FUNCTION_RESPONSE_CACHE_KEY_PREFIX = os.getenv(
+    "SERVER_FUNCTION_RESPONSE_CACHE_KEY_PREFIX", "function_response"
+)
+
+# RESPONSE PROJECTION
+# projection of execution results when the caller doesn't request one: full | schema | minimal
+FUNCTION_RESPONSE_PROJECTION_DEFAULT = os.getenv("SERVER_FUNCTION_RESPONSE_PROJECTION_DEFAULT", "full")
+# max number of compiled projections kept in memory (one per function and projection)
+FUNCTION_RESPONSE_PROJECTION_MAX_COMPILED = int(
+    os.getenv("SERVER_FUNCTION_RESPONSE_PROJECTION_MAX_COMPILED", "4096")
+)
+
+# FUNCTION JOBS (executions with ?mode=async)
+# jobs are queued in Redis if configured (shared by all workers), in memory otherwise
+# number of jobs executed concurrently by each worker
+FUNCTION_JOBS_WORKERS = int(os.getenv("SERVER_FUNCTION_JOBS_WORKERS", "4"))
+FUNCTION_JOBS_MAX_QUEUED = int(os.getenv("SERVER_FUNCTION_JOBS_MAX_QUEUED", "1000"))
+# how long jobs (and their results) are kept after their last update
+FUNCTION_JOBS_TTL_SECONDS = int(os.getenv("SERVER_FUNCTION_JOBS_TTL_SECONDS", "3600"))
+# max long-polling time of GET /v1/jobs/{id}, keep it below the load balancer idle timeout
+FUNCTION_JOBS_MAX_WAIT_SECONDS = int(os.getenv("SERVER_FUNCTION_JOBS_MAX_WAIT_SECONDS", "25"))
+# how often a long-polling request checks the job in Redis
+FUNCTION_JOBS_POLL_INTERVAL_SECONDS = float(
+    os.getenv("SERVER_FUNCTION_JOBS_POLL_INTERVAL_SECONDS", "0.5")
+)
+FUNCTION_JOBS_WEBHOOK_TIMEOUT_SECONDS = float(
+    os.getenv("SERVER_FUNCTION_JOBS_WEBHOOK_TIMEOUT_SECONDS", "10")
+)
+# secret the per-project signing keys of the completion webhooks are derived from, webhooks are
+# disabled if not set
+FUNCTION_JOBS_WEBHOOK_SIGNING_SECRET = os.getenv("SERVER_FUNCTION_JOBS_WEBHOOK_SIGNING_SECRET", "")
+FUNCTION_JOBS_REDIS_KEY_PREFIX = os.getenv("SERVER_FUNCTION_JOBS_REDIS_KEY_PREFIX", "function_jobs")
+
+# FAIR SHARE SCHEDULER
+# admission of function executions per project, so that a project bursting doesn't starve the
+# others, see aci.server.fair_share_scheduler. Limits are per worker.
+FAIR_SHARE_ENABLED = os.getenv("SERVER_FAIR_SHARE_ENABLED", "true").lower() == "true"
+FAIR_SHARE_MAX_CONCURRENCY = int(os.getenv("SERVER_FAIR_SHARE_MAX_CONCURRENCY", "64"))
+FAIR_SHARE_MAX_IN_FLIGHT_PER_PROJECT = int(
+    os.getenv("SERVER_FAIR_SHARE_MAX_IN_FLIGHT_PER_PROJECT", "16")
+)
+FAIR_SHARE_MAX_QUEUED_PER_PROJECT = int(os.getenv("SERVER_FAIR_SHARE_MAX_QUEUED_PER_PROJECT", "100"))
+FAIR_SHARE_QUEUE_TIMEOUT_SECONDS = float(os.getenv("SERVER_FAIR_SHARE_QUEUE_TIMEOUT_SECONDS", "10"))
+# share of the execution slots per subscription plan name, relative to each other
+FAIR_SHARE_PLAN_WEIGHTS: dict[str, float] = json.loads(
+    os.getenv("SERVER_FAIR_SHARE_PLAN_WEIGHTS", '{"free": 1, "starter": 2, "team": 4}')
+)
+FAIR_SHARE_DEFAULT_WEIGHT = float(os.getenv("SERVER_FAIR_SHARE_DEFAULT_WEIGHT", "1"))
+FAIR_SHARE_WEIGHT_CACHE_TTL_SECONDS = int(
+    os.getenv("SERVER_FAIR_SHARE_WEIGHT_CACHE_TTL_SECONDS", "300")
+)
+FAIR_SHARE_WEIGHT_CACHE_SIZE = int(os.getenv("SERVER_FAIR_SHARE_WEIGHT_CACHE_SIZE", "10000"))
+
+# APP CONNECTORS
+# thread pool size for sync connector methods (e.g. googleapiclient, e2b sdk)
+CONNECTOR_EXECUTOR_MAX_WORKERS = int(os.getenv("SERVER_CONNECTOR_EXECUTOR_MAX_WORKERS", "32"))
+# max concurrent executions per connector, can be overridden per connector class name
+# e.g. SERVER_CONNECTOR_MAX_CONCURRENCY_OVERRIDES='{"E2b": 4}'
+CONNECTOR_MAX_CONCURRENCY = int(os.getenv("SERVER_CONNECTOR_MAX_CONCURRENCY", "16"))
+CONNECTOR_MAX_CONCURRENCY_OVERRIDES: dict[str, int] = json.loads(
+    os.getenv("SERVER_CONNECTOR_MAX_CONCURRENCY_OVERRIDES", "{}")
+)
+# app names of the connectors imported at startup (comma separated), "*" for all of them,
+# the others are imported on first use, see aci.server.connector_registry
+CONNECTOR_EAGER_IMPORTS: list[str] | None = (
+    None
+    if os.getenv("SERVER_CONNECTOR_EAGER_IMPORTS", "*").strip() == "*"
+    else [
+        app_name.strip().upper()
+        for app_name in os.getenv("SERVER_CONNECTOR_EAGER_IMPORTS", "").split(",")
+        if app_name.strip()
+    ]
+)
+# check at startup that the connector functions of the database have an implementation
+CONNECTOR_REGISTRY_VALIDATE = (
+    os.getenv("SERVER_CONNECTOR_REGISTRY_VALIDATE", "true").lower() == "true"
+)
+# connector instances (and the SDK clients they build) are reused across executions of the same
+# linked account, see aci.server.connector_instance_cache
+CONNECTOR_INSTANCE_CACHE_ENABLED = (
+    os.getenv("SERVER_CONNECTOR_INSTANCE_CACHE_ENABLED", "true").lower() == "true"
+)
+CONNECTOR_INSTANCE_CACHE_TTL_SECONDS = int(
+    os.getenv("SERVER_CONNECTOR_INSTANCE_CACHE_TTL_SECONDS", "1800")
+)
+CONNECTOR_INSTANCE_CACHE_MAX_SIZE = int(os.getenv("SERVER_CONNECTOR_INSTANCE_CACHE_MAX_SIZE", "1000"))
+
+# API KEY CACHE
+# verified API keys are cached in-process and in Redis (if configured), see aci.server.api_key_cache
+API_KEY_CACHE_ENABLED = os.getenv("SERVER_API_KEY_CACHE_ENABLED", "true").lower() == "true"
+# bounds how long a worker can miss an invalidation
+API_KEY_CACHE_LOCAL_TTL_SECONDS = int(os.getenv("SERVER_API_KEY_CACHE_LOCAL_TTL_SECONDS", "10"))
+API_KEY_CACHE_LOCAL_MAX_SIZE = int(os.getenv("SERVER_API_KEY_CACHE_LOCAL_MAX_SIZE", "10000"))
+API_KEY_CACHE_TTL_SECONDS = int(os.getenv("SERVER_API_KEY_CACHE_TTL_SECONDS", "300"))
+API_KEY_CACHE_RECONNECT_DELAY_SECONDS = float(
+    os.getenv("SERVER_API_KEY_CACHE_RECONNECT_DELAY_SECONDS", "1")
+)
+API_KEY_CACHE_REDIS_KEY_PREFIX = os.getenv("SERVER_API_KEY_CACHE_REDIS_KEY_PREFIX", "api_keys")
+
+# REQUEST CONTEXT CACHE
+# request contexts of the dev portal routes cached per (token, project, organization), per worker,
+# see aci.server.request_context_cache
+REQUEST_CONTEXT_CACHE_ENABLED = (
+    os.getenv("SERVER_REQUEST_CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+)
+# max ttl, entries never outlive the token, bounds how long other workers see a stale project
+REQUEST_CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("SERVER_REQUEST_CONTEXT_CACHE_TTL_SECONDS", "30"))
+REQUEST_CONTEXT_CACHE_MAX_SIZE = int(os.getenv("SERVER_REQUEST_CONTEXT_CACHE_MAX_SIZE", "10000"))
+
+# E2B SANDBOX POOL
+# warm sandboxes per E2B API key, see aci.server.e2b_sandbox_pool
+E2B_SANDBOX_POOL_ENABLED = os.getenv("SERVER_E2B_SANDBOX_POOL_ENABLED", "true").lower() == "true"
+E2B_SANDBOX_POOL_MIN_IDLE = int(os.getenv("SERVER_E2B_SANDBOX_POOL_MIN_IDLE", "1"))
+E2B_SANDBOX_POOL_MAX_IDLE = int(os.getenv("SERVER_E2B_SANDBOX_POOL_MAX_IDLE", "4"))
+# executions after which a sandbox is recycled. Kept small: every execution runs in a new code
+# context, i.e. a new Jupyter kernel, and the E2B SDK can't shut kernels down, so a sandbox runs up
+# to this many kernels until it is recycled
+E2B_SANDBOX_POOL_MAX_USES = int(os.getenv("SERVER_E2B_SANDBOX_POOL_MAX_USES", "5"))
+E2B_SANDBOX_POOL_IDLE_TTL_SECONDS = int(os.getenv("SERVER_E2B_SANDBOX_POOL_IDLE_TTL_SECONDS", "120"))
+E2B_SANDBOX_POOL_EVICTION_INTERVAL_SECONDS = int(
+    os.getenv("SERVER_E2B_SANDBOX_POOL_EVICTION_INTERVAL_SECONDS", "15")
+)
+E2B_SANDBOX_POOL_WARMUP_WORKERS = int(os.getenv("SERVER_E2B_SANDBOX_POOL_WARMUP_WORKERS", "2"))
+# lifetime of the sandboxes on E2B, pooled sandboxes are recycled a minute before
+E2B_SANDBOX_TIMEOUT_SECONDS = int(os.getenv("SERVER_E2B_SANDBOX_TIMEOUT_SECONDS", "600"))
+
+# QUOTA COUNTERS
+# monthly quota usage is counted in Redis (if configured, else per worker) and flushed to the
+# projects table in the background, see aci.server.quota_service
+QUOTA_COUNTER_REDIS_KEY_PREFIX = os.getenv("SERVER_QUOTA_COUNTER_REDIS_KEY_PREFIX", "quota")
+# how long the limit of a project is cached (without Redis, also its usage) before being read from
+# the database again
+QUOTA_COUNTER_LIMIT_TTL_SECONDS = int(os.getenv("SERVER_QUOTA_COUNTER_LIMIT_TTL_SECONDS", "300"))
+QUOTA_RECONCILE_INTERVAL_SECONDS = float(os.getenv("SERVER_QUOTA_RECONCILE_INTERVAL_SECONDS", "5"))
+# max projects per bulk UPDATE
+QUOTA_RECONCILE_MAX_BATCH = int(os.getenv("SERVER_QUOTA_RECONCILE_MAX_BATCH", "1000"))
+
 # APP
 APP_TITLE = "ACI"
 APP_VERSION = "0.0.1-beta.4"
@@ -77,6 +379,12 @@ ROUTER_PREFIX_ORGANIZATIONS = "/v1/organizations"
 ROUTER_PREFIX_MCP_SERVERS = "/v1/mcp-servers"
 ROUTER_PREFIX_EXECUTION_LOGS = "/v1/execution-logs"
 ROUTER_PREFIX_API_KEYS = "/v1/api-keys"
+ROUTER_PREFIX_JOBS = "/v1/jobs"
+
+# METRICS
+# token required by the internal /v1/health/metrics route (X-METRICS-TOKEN header), the route is
+# disabled when not set
+METRICS_TOKEN = os.getenv("SERVER_METRICS_TOKEN", "")
 
 # DEV PORTAL
 DEV_PORTAL_URL = check_and_get_env_variable("SERVER_DEV_PORTAL_URL")
@@ -94,6 +402,8 @@ ACI_ORG_ID_HEADER = "X-ORG-ID"
 ACI_PROJECT_ID_HEADER = "X-PROJECT-ID"
 ACI_API_KEY_HEADER = "X-API-KEY"
 LINKED_ACCOUNT_OWNER_ID_HEADER = "X-LINKED-ACCOUNT-OWNER-ID"
+REQUEST_TIMEOUT_HEADER = "X-REQUEST-TIMEOUT"
+METRICS_TOKEN_HEADER = "X-METRICS-TOKEN"
 
 # 8KB
 MAX_LOG_FIELD_SIZE = 8 * 1024
@@ -0,0 +1,186 @@
+"""
+Execution engine for app connector methods.
+
+Connector methods are a mix of coroutines (e.g. AgentSecretsManager) and blocking sync calls
+(e.g. googleapiclient in Gmail, the E2B sandbox SDK). Coroutines are awaited natively on the
+event loop, while sync methods are offloaded to a dedicated, size-limited thread pool so one
+slow connector can't freeze every other request on the worker.
+Each connector also has its own concurrency cap, so a single connector can't take every thread.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from aci.common.logging_setup import get_logger
+from aci.server import config
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ConnectorExecutionStats:
+    """Runtime counters of a single connector"""
+
+    max_concurrency: int
+    # waiting for a concurrency slot of the connector
+    waiting: int = 0
+    # holding a concurrency slot, either running or queued in the thread pool
+    in_flight: int = 0
+    completed: int = 0
+    failed: int = 0
+
+
+class ConnectorExecutionEngine:
+    def __init__(
+        self,
+        max_workers: int,
+        default_max_concurrency: int,
+        max_concurrency_overrides: dict[str, int] | None = None,
+    ):
+        """
+        Args:
+            max_workers: size of the thread pool used for sync connector methods
+            default_max_concurrency: max concurrent executions per connector
+            max_concurrency_overrides: per connector (class name) overrides of the concurrency cap
+        """
+        self.max_workers = max_workers
+        self.default_max_concurrency = default_max_concurrency
+        self.max_concurrency_overrides = max_concurrency_overrides or {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._stats: dict[str, ConnectorExecutionStats] = {}
+        # submitted to the thread pool but not picked up by a thread yet
+        self._thread_pool_pending = 0
+        self._thread_pool_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="app-connector"
+            )
+        return self._executor
+
+    def _get_semaphore(self, connector_name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(connector_name)
+        if semaphore is None:
+            max_concurrency = self.max_concurrency_overrides.get(
+                connector_name, self.default_max_concurrency
+            )
+            semaphore = asyncio.Semaphore(max_concurrency)
+            self._semaphores[connector_name] = semaphore
+            self._stats[connector_name] = ConnectorExecutionStats(max_concurrency=max_concurrency)
+        return semaphore
+
+    async def run(self, connector_name: str, method: Callable[..., Any], kwargs: dict) -> Any:
+        """
+        Run a connector method under the connector's concurrency cap.
+        Coroutine methods are awaited directly, sync methods run in the thread pool.
+        """
+        semaphore = self._get_semaphore(connector_name)
+        stats = self._stats[connector_name]
+
+        stats.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.waiting -= 1
+
+        stats.in_flight += 1
+
+        def release() -> None:
+            stats.in_flight -= 1
+            semaphore.release()
+
+        try:
+            if inspect.iscoroutinefunction(method):
+                try:
+                    result = await method(**kwargs)
+                finally:
+                    release()
+            else:
+                result = await self._run_in_thread_pool(method, kwargs, on_done=release)
+        except Exception:
+            stats.failed += 1
+            raise
+
+        stats.completed += 1
+        return result
+
+    async def _run_in_thread_pool(
+        self, method: Callable[..., Any], kwargs: dict, on_done: Callable[[], None]
+    ) -> Any:
+        """
+        Run the method in the thread pool, on_done is called (in the event loop) once the method
+        returned, or if it's cancelled before a thread picked it up. A running thread can't be
+        interrupted, if the caller is cancelled the method keeps running (and calling the
+        connector), so on_done is only called when it's actually done.
+        """
+        # copy the context so request scoped contextvars (e.g. request_id for logging) are
+        # still available inside the worker thread
+        context = contextvars.copy_context()
+        started = False
+
+        def mark_started() -> None:
+            nonlocal started
+            with self._thread_pool_lock:
+                if not started:
+                    started = True
+                    self._thread_pool_pending -= 1
+
+        def run() -> Any:
+            mark_started()
+            return context.run(functools.partial(method, **kwargs))
+
+        with self._thread_pool_lock:
+            self._thread_pool_pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._get_executor().submit(run)
+        except BaseException:
+            mark_started()
+            on_done()
+            raise
+        # NOTE: on the concurrent future, not on the asyncio future wrapping it, which is done as
+        # soon as the caller is cancelled
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(on_done))
+        try:
+            return await asyncio.wrap_future(future)
+        finally:
+            # the job might have been cancelled before a thread picked it up
+            mark_started()
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "thread_pool_pending": self._thread_pool_pending,
+            "connectors": {
+                connector_name: {
+                    "max_concurrency": stats.max_concurrency,
+                    "waiting": stats.waiting,
+                    "in_flight": stats.in_flight,
+                    "completed": stats.completed,
+                    "failed": stats.failed,
+                }
+                for connector_name, stats in self._stats.items()
+            },
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Connector execution engine thread pool shut down")
+
+
+connector_execution_engine = ConnectorExecutionEngine(
+    max_workers=config.CONNECTOR_EXECUTOR_MAX_WORKERS,
+    default_max_concurrency=config.CONNECTOR_MAX_CONCURRENCY,
+    max_concurrency_overrides=config.CONNECTOR_MAX_CONCURRENCY_OVERRIDES,
+)
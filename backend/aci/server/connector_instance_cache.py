@@ -0,0 +1,143 @@
+"""
+Cache of app connector instances, so that connectors (and the SDK clients / service objects they
+build, e.g. the Gmail service) are reused across executions of the same linked account instead of
+being built on every call.
+
+Instances are keyed by (connector class, linked account id) and versioned by a hash of the
+security scheme and credentials: an instance built with credentials that have since been refreshed
+(or changed) is never reused, it's replaced on the next execution. Instances are also dropped right
+away when this worker refreshes the credentials (see invalidate), and after a TTL.
+
+NOTE: cached instances are shared by concurrent executions, connectors must not keep per-call state
+on the instance (and must keep thread-unsafe clients per thread, see Gmail).
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+from aci.common.db.sql_models import LinkedAccount
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.security_scheme import (
+    APIKeyScheme,
+    APIKeySchemeCredentials,
+    NoAuthScheme,
+    NoAuthSchemeCredentials,
+    OAuth2Scheme,
+    OAuth2SchemeCredentials,
+)
+from aci.server import config
+from aci.server.app_connectors.base import AppConnectorBase
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Entry:
+    version: str
+    expires_at: float
+    instance: AppConnectorBase
+
+
+class ConnectorInstanceCache:
+    def __init__(self, enabled: bool, ttl_seconds: float, max_size: int):
+        """
+        Args:
+            enabled: if False, a new instance is built for every execution
+            ttl_seconds: how long an instance is reused at most
+            max_size: max number of instances kept, least recently used first out
+        """
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[type[AppConnectorBase], UUID], _Entry] = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "invalidated": 0}
+
+    def get(
+        self,
+        connector_class: type[AppConnectorBase],
+        linked_account: LinkedAccount,
+        security_scheme: OAuth2Scheme | APIKeyScheme | NoAuthScheme,
+        security_credentials: OAuth2SchemeCredentials
+        | APIKeySchemeCredentials
+        | NoAuthSchemeCredentials,
+    ) -> AppConnectorBase:
+        """Get the connector instance of the linked account, building it if needed."""
+        if not self.enabled:
+            return connector_class(linked_account, security_scheme, security_credentials)
+
+        key = (connector_class, linked_account.id)
+        version = _get_version(security_scheme, security_credentials)
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version and entry.expires_at > now:
+            self._stats["hits"] += 1
+            self._entries.move_to_end(key)
+            # NOTE: the instance keeps the linked account it was built with, the latest one is
+            # passed to each execution (see AppConnectorBase.execute)
+            return entry.instance
+
+        if entry is None:
+            self._stats["misses"] += 1
+        else:
+            self._stats["stale"] += 1
+            logger.debug(
+                f"Connector instance is stale, rebuilding, class_name={connector_class.__name__}, "
+                f"linked_account_id={linked_account.id}"
+            )
+        instance = connector_class(linked_account, security_scheme, security_credentials)
+        self._entries[key] = _Entry(version, now + self.ttl_seconds, instance)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return instance
+
+    def invalidate(self, linked_account_id: UUID) -> None:
+        """Drop the instances of the linked account, e.g. when its credentials are refreshed."""
+        keys = [key for key in self._entries if key[1] == linked_account_id]
+        for key in keys:
+            del self._entries[key]
+        if keys:
+            self._stats["invalidated"] += len(keys)
+            logger.debug(f"Invalidated connector instances, linked_account_id={linked_account_id}")
+
+    async def preload(self, connector_classes: list[type[AppConnectorBase]]) -> None:
+        """
+        Preload the static resources of the connectors (see AppConnectorBase.preload), in threads
+        as preloading usually reads and parses files. Failures are logged, the resources are then
+        loaded on first use.
+        """
+        for connector_class in connector_classes:
+            try:
+                await asyncio.to_thread(connector_class.preload)
+                logger.info(f"Preloaded connector, class_name={connector_class.__name__}")
+            except Exception:
+                logger.exception(
+                    f"Failed to preload connector, class_name={connector_class.__name__}"
+                )
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"size": len(self._entries), **self._stats}
+
+
+def _get_version(
+    security_scheme: OAuth2Scheme | APIKeyScheme | NoAuthScheme,
+    security_credentials: OAuth2SchemeCredentials
+    | APIKeySchemeCredentials
+    | NoAuthSchemeCredentials,
+) -> str:
+    digest = hashlib.sha256()
+    digest.update(security_scheme.model_dump_json().encode())
+    digest.update(security_credentials.model_dump_json().encode())
+    return digest.hexdigest()
+
+
+connector_instance_cache = ConnectorInstanceCache(
+    enabled=config.CONNECTOR_INSTANCE_CACHE_ENABLED,
+    ttl_seconds=config.CONNECTOR_INSTANCE_CACHE_TTL_SECONDS,
+    max_size=config.CONNECTOR_INSTANCE_CACHE_MAX_SIZE,
+)
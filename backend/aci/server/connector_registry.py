@@ -0,0 +1,185 @@
+"""
+Registry of the app connectors (aci.server.app_connectors), mapping connector function names to
+the connector class and method implementing them, e.g.
+"BRAVE_SEARCH__WEB_SEARCH" -> (aci.server.app_connectors.brave_search.BraveSearch, "web_search").
+
+The connector modules are discovered once at startup and imported eagerly (all of them by default,
+see CONNECTOR_EAGER_IMPORTS), so that the first execution of a connector doesn't pay the import
+of its SDK on a live request. Modules not imported eagerly are imported on first use.
+
+Only the public methods defined by the connector classes are exposed as functions (not the methods
+of AppConnectorBase nor private helpers). At startup, the connector functions of the database
+catalog are checked against the registry and the ones without an implementation are logged (only
+the module is checked for connectors not imported eagerly).
+"""
+
+import importlib
+import inspect
+import pkgutil
+from types import ModuleType
+from typing import Any
+
+from aci.common.db import crud
+from aci.common.enums import Protocol
+from aci.common.exceptions import NoImplementationFound
+from aci.common.logging_setup import get_logger
+from aci.common.utils import create_db_async_session
+from aci.server import app_connectors, config
+from aci.server.app_connectors.base import AppConnectorBase
+from aci.server.connector_instance_cache import connector_instance_cache
+
+logger = get_logger(__name__)
+
+# modules of the package that aren't connectors
+_NON_CONNECTOR_MODULES = {"base"}
+
+
+class ConnectorRegistry:
+    def __init__(self, package: ModuleType, eager_imports: list[str] | None, validate: bool):
+        """
+        Args:
+            package: the package of the connector modules
+            eager_imports: app names of the connectors imported at startup, None for all
+            validate: whether to check the connector functions of the database catalog at startup
+        """
+        self.package = package
+        self.eager_imports = eager_imports
+        self.validate = validate
+        # app name -> module name, of all discovered connector modules
+        self._modules: dict[str, str] = {}
+        # function name -> (connector class, method name), of the imported connectors
+        self._functions: dict[str, tuple[type[AppConnectorBase], str]] = {}
+        self._loaded: set[str] = set()
+        self._missing_functions: list[str] = []
+
+    async def start(self) -> None:
+        """Discover and import the connectors, validate them and preload their resources."""
+        self.discover()
+        app_names = self._modules if self.eager_imports is None else self.eager_imports
+        for app_name in app_names:
+            try:
+                self.load(app_name)
+            except NoImplementationFound:
+                logger.exception(f"Failed to import connector, app_name={app_name}")
+
+        if self.validate:
+            await self.validate_catalog()
+
+        loaded_classes = {connector_class for connector_class, _ in self._functions.values()}
+        await connector_instance_cache.preload(
+            sorted(loaded_classes, key=lambda connector_class: connector_class.__name__)
+        )
+
+    def discover(self) -> None:
+        """Find the connector modules of the package, without importing them."""
+        for module_info in pkgutil.iter_modules(self.package.__path__):
+            if module_info.ispkg or module_info.name in _NON_CONNECTOR_MODULES:
+                continue
+            self._modules[module_info.name.upper()] = f"{self.package.__name__}.{module_info.name}"
+        logger.info(f"Discovered app connectors, app_names={sorted(self._modules)}")
+
+    def load(self, app_name: str) -> None:
+        """
+        Import the connector of the app and register its functions.
+
+        Raises:
+            NoImplementationFound: the app has no connector
+        """
+        if app_name in self._loaded:
+            return
+        if not self._modules:
+            # not started, e.g. in scripts
+            self.discover()
+        module_name = self._modules.get(app_name)
+        if module_name is None:
+            raise NoImplementationFound(f"no app connector found for app={app_name}")
+        # e.g. BRAVE_SEARCH -> BraveSearch
+        class_name = "".join(word.capitalize() for word in app_name.split("_"))
+        try:
+            connector_class = getattr(importlib.import_module(module_name), class_name)
+        except (ImportError, AttributeError) as e:
+            logger.exception(
+                f"Failed to import app connector class, module_name={module_name}, "
+                f"class_name={class_name}"
+            )
+            raise NoImplementationFound("no app connector class found") from e
+        if not (
+            isinstance(connector_class, type) and issubclass(connector_class, AppConnectorBase)
+        ):
+            raise NoImplementationFound(f"{class_name} is not an app connector class")
+
+        for method_name, _ in inspect.getmembers(connector_class, inspect.isroutine):
+            if method_name.startswith("_") or hasattr(AppConnectorBase, method_name):
+                continue
+            self._functions[f"{app_name}__{method_name.upper()}"] = (connector_class, method_name)
+        self._loaded.add(app_name)
+        logger.info(f"Loaded app connector, app_name={app_name}, class_name={class_name}")
+
+    def resolve(self, function_name: str) -> tuple[type[AppConnectorBase], str]:
+        """
+        Get the connector class and method implementing the function.
+
+        Raises:
+            NoImplementationFound: the function has no connector implementation
+        """
+        resolved = self._functions.get(function_name)
+        if resolved is not None:
+            return resolved
+
+        app_name = function_name.split("__", 1)[0]
+        if app_name not in self._loaded:
+            # not imported at startup
+            self.load(app_name)
+            resolved = self._functions.get(function_name)
+            if resolved is not None:
+                return resolved
+
+        logger.error(f"No app connector method found, function_name={function_name}")
+        raise NoImplementationFound(f"no app connector method found for function={function_name}")
+
+    async def validate_catalog(self) -> None:
+        """Log the connector functions of the database catalog that have no implementation."""
+        db_session = create_db_async_session(config.DB_FULL_URL)
+        try:
+            function_names = await crud.functions.get_active_function_names_by_protocol(
+                db_session, Protocol.CONNECTOR
+            )
+        except Exception:
+            logger.exception("Failed to get the connector functions of the catalog")
+            return
+        finally:
+            await db_session.close()
+
+        missing_functions = []
+        for function_name in sorted(function_names):
+            app_name = function_name.split("__", 1)[0]
+            if app_name in self._loaded:
+                implemented = function_name in self._functions
+            else:
+                # not imported eagerly, only check that the connector module exists
+                implemented = app_name in self._modules
+            if not implemented:
+                missing_functions.append(function_name)
+        self._missing_functions = missing_functions
+        if missing_functions:
+            logger.error(
+                f"Connector functions of the catalog have no implementation, "
+                f"function_names={missing_functions}"
+            )
+        else:
+            logger.info(f"Validated connector functions, count={len(function_names)}")
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "discovered": len(self._modules),
+            "loaded": sorted(self._loaded),
+            "functions": len(self._functions),
+            "missing_functions": self._missing_functions,
+        }
+
+
+connector_registry = ConnectorRegistry(
+    package=app_connectors,
+    eager_imports=config.CONNECTOR_EAGER_IMPORTS,
+    validate=config.CONNECTOR_REGISTRY_VALIDATE,
+)
@@ -1,3 +1,4 @@
+import hmac
 from collections.abc import Generator
 from typing import Annotated, Optional, Any, AsyncGenerator
 from typing import Callable
@@ -20,8 +21,11 @@ from aci.common.exceptions import (
 )
 from aci.common.logging_setup import get_logger
 from aci.server import config, acl
+from aci.server.api_key_cache import api_key_cache
 from aci.server.config import ACI_PROJECT_ID_HEADER, ACI_ORG_ID_HEADER
 from aci.server.quota_service import consume_monthly_quota
+from aci.server.rate_limiter import rate_limiter
+from aci.server.request_context_cache import request_context_cache
 
 logger = get_logger(__name__)
 http_bearer = HTTPBearer(auto_error=False, description="login to receive a JWT token")
@@ -31,6 +35,12 @@ api_key_header = APIKeyHeader(
     auto_error=False,
 )
 
+metrics_token_header = APIKeyHeader(
+    name=config.METRICS_TOKEN_HEADER,
+    description="Token of the internal metrics route",
+    auto_error=False,
+)
+
 auth = acl.get_propelauth()
 
 
@@ -119,6 +129,20 @@ async def validate_api_key(
         return api_key_id
 
 
+async def validate_metrics_token(
+        metrics_token: Annotated[str | None, Security(metrics_token_header)] = None,
+) -> None:
+    """Internal-only routes (metrics), not exposed at all if no token is configured."""
+    if not config.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if metrics_token is None or not hmac.compare_digest(metrics_token, config.METRICS_TOKEN):
+        logger.warning("Invalid metrics token")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+        )
+
+
 def get_header(header_name: str, optional=False) -> Callable:
     async def dependency(request: Request) -> str:
         value = request.headers.get(header_name)
@@ -133,8 +157,8 @@ def get_header(header_name: str, optional=False) -> Callable:
 
 
 async def get_request_context(
-        user: Annotated[User, Depends(auth.require_user)],
         db_session: Annotated[AsyncSession, Depends(yield_db_async_session)],
+        jwt_token: Annotated[HTTPAuthorizationCredentials | None, Security(http_bearer)] = None,
         prefer_org_id: UUID = Depends(get_header(ACI_ORG_ID_HEADER)),
         project_id: UUID = Depends(get_header(ACI_PROJECT_ID_HEADER)),
 ) -> RequestContext:
@@ -142,6 +166,22 @@ async def get_request_context(
     Returns a RequestContext object containing the DB session,
     the validated API key ID, and the project ID.
     """
+    if jwt_token is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    credentials = jwt_token.credentials
+
+    # a dev portal page load fires many calls with the same token, organization and project,
+    # see aci.server.request_context_cache
+    cached = request_context_cache.get(credentials, project_id, prefer_org_id)
+    if cached:
+        cached_user, cached_project = cached
+        return RequestContext(
+            db_session=db_session,
+            project=cached_project,
+            user=cached_user,
+        )
+
+    user = auth.require_user(jwt_token)
     project = await crud.projects.get_project(db_session, project_id)
     if not project:
         logger.error(f"Project not found, project_id={project_id}")
@@ -162,6 +202,7 @@ async def get_request_context(
             detail=f"Project {project.id} does not belong to organization {org_id}",
         )
 
+    request_context_cache.set(credentials, project_id, prefer_org_id, user, project)
     return RequestContext(
         db_session=db_session,
         project=project,
@@ -227,8 +268,7 @@ async def get_request_context2(
                 detail=f"Missing organization ID in header '{ACI_ORG_ID_HEADER}'"
             )
 
-        user = auth.require_user(jwt_token)
-        context = await get_request_context(user, db_session, prefer_org_id, project_id)
+        context = await get_request_context(db_session, jwt_token, prefer_org_id, project_id)
         return RequestContext2(
             user=context.user,
             project=context.project,
@@ -256,9 +296,7 @@ async def get_api_key_context(
         )
 
     # Verify API key and extract information
-    api_key_extract = await crud.api_keys.extract_api_key(
-        db_session, api_key,
-    )
+    api_key_extract = await api_key_cache.extract_api_key(db_session, api_key)
 
     if not api_key_extract:
         logger.error(f"API key verification failed, partial_api_key={api_key[:4]}****{api_key[-4:]}")
@@ -267,6 +305,8 @@ async def get_api_key_context(
     # Get the project
     project = api_key_extract.project
 
+    await rate_limiter.hit_api_key(db_session, api_key_extract.id, project)
+
     return APIKeyContext(
         project=project,
         db_session=db_session,
@@ -275,7 +315,7 @@ async def get_api_key_context(
     )
 
 
-async def validate_monthly_quota(
+async def get_request_context2_for_quota(
         db_session: Annotated[AsyncSession, Depends(yield_db_async_session2)],
         jwt_token: Annotated[Optional[HTTPAuthorizationCredentials], Security(http_bearer)] = None,
         api_key: Annotated[Optional[str], Security(api_key_header)] = None,
@@ -283,19 +323,28 @@ async def validate_monthly_quota(
         project_id: UUID = Depends(get_header(ACI_PROJECT_ID_HEADER, optional=True)),
 ) -> RequestContext2:
     """
-    Use quota for a project operation.
-
-    1. Only check and manage quota for certain endpoints
-    2. Reset quota if it's a new month
-    3. Increment usage or raise error if exceeded
+    Same as get_request_context2, but the context stays usable after consuming quota
+    (consuming quota commits the session, and the session doesn't expire objects on commit).
+    For routes that consume quota themselves, e.g. when the amount depends on the request body.
     """
-
-    context = await get_request_context2(
+    return await get_request_context2(
         db_session=db_session,
         jwt_token=jwt_token,
         api_key=api_key,
         prefer_org_id=prefer_org_id,
         project_id=project_id,
     )
+
+
+async def validate_monthly_quota(
+        context: Annotated[RequestContext2, Depends(get_request_context2_for_quota)],
+) -> RequestContext2:
+    """
+    Use quota for a project operation.
+
+    1. Only check and manage quota for certain endpoints
+    2. Reset quota if it's a new month
+    3. Increment usage or raise error if exceeded
+    """
     await consume_monthly_quota(context.db_session, context.project.id, 1)
     return context
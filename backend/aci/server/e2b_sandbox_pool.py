@@ -0,0 +1,317 @@
+"""
+Pool of pre-warmed E2B sandboxes, so that code executions (E2B__RUN_CODE) don't pay the boot of a
+sandbox on every call.
+
+Sandboxes are pooled per E2B API key (sandboxes are never shared across API keys, i.e. accounts):
+- lease: an idle sandbox of the API key is taken (or a new one is created if there is none), with
+  a fresh code context (a new kernel), so the variables and imports of previous executions are not
+  visible. The rest of the sandbox is shared by the executions of the API key: files (including
+  /tmp) and background processes started by previous executions are still there
+- release: the sandbox goes back to the pool, unless it failed, was used max_uses times, is close
+  to its E2B timeout or the pool of the API key is full, in which case it's killed (recycled).
+  The kernels of previous leases keep running (the E2B SDK has no way to shut a code context
+  down), max_uses bounds how many a sandbox accumulates
+- after a lease, the pool of the API key is refilled in the background up to min_idle sandboxes
+- sandboxes idle for longer than idle_ttl_seconds are killed in the background, so API keys that
+  are no longer used don't keep sandboxes running
+
+Leases happen in the connector threads (the E2B SDK is sync), so the pool is thread-safe. The
+sandbox factory can be swapped (e.g. for a fake sandbox class in tests), sandboxes only need the
+create_code_context, run_code and kill methods of e2b_code_interpreter.Sandbox.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from e2b_code_interpreter import Sandbox
+
+from aci.common.logging_setup import get_logger
+from aci.server import config
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _PooledSandbox:
+    sandbox: Any
+    created_at: float
+    last_used_at: float
+    uses: int = 0
+
+
+@dataclass
+class _KeyPool:
+    idle: list[_PooledSandbox] = field(default_factory=list)
+    # sandboxes being created by the background refill
+    warming: int = 0
+
+
+class LeasedSandbox:
+    """A sandbox leased from the pool, running code in a fresh code context."""
+
+    def __init__(self, sandbox: Any, context: Any):
+        self.sandbox = sandbox
+        self.context = context
+
+    def run_code(self, code: str) -> Any:
+        return self.sandbox.run_code(code, context=self.context)
+
+
+class E2bSandboxPool:
+    def __init__(
+        self,
+        sandbox_factory: Callable[[str], Any],
+        enabled: bool,
+        min_idle: int,
+        max_idle: int,
+        max_uses: int,
+        max_age_seconds: float,
+        idle_ttl_seconds: float,
+        eviction_interval_seconds: float,
+        warmup_workers: int,
+    ):
+        """
+        Args:
+            sandbox_factory: creates a sandbox for the given API key
+            enabled: if False, every lease creates a sandbox and kills it after use
+            min_idle: idle sandboxes kept warm per API key after it was used
+            max_idle: max idle sandboxes kept per API key
+            max_uses: executions after which a sandbox is recycled
+            max_age_seconds: age after which a sandbox is recycled, must be below the timeout of
+                the sandboxes on E2B
+            idle_ttl_seconds: idle time after which a sandbox is killed
+            eviction_interval_seconds: how often idle sandboxes are checked
+            warmup_workers: threads creating sandboxes in the background
+        """
+        self.sandbox_factory = sandbox_factory
+        self.enabled = enabled
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+        self.max_uses = max_uses
+        self.max_age_seconds = max_age_seconds
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.eviction_interval_seconds = eviction_interval_seconds
+        self.warmup_workers = warmup_workers
+        # API key -> sandboxes of the API key
+        self._pools: dict[str, _KeyPool] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._warmup_executor: ThreadPoolExecutor | None = None
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stats = {"leased": 0, "warm_hits": 0, "created": 0, "recycled": 0, "evicted": 0}
+
+    @contextmanager
+    def lease(self, api_key: str) -> Iterator[LeasedSandbox]:
+        """
+        Lease a sandbox of the API key for the duration of the context. Blocking, must be called
+        from a thread (e.g. by a sync connector method).
+        """
+        pooled = self._take(api_key) if self.enabled else None
+        if pooled is None:
+            pooled = self._create(api_key)
+        healthy = False
+        try:
+            # reset: previous executions' variables and imports live in other code contexts
+            leased = LeasedSandbox(pooled.sandbox, pooled.sandbox.create_code_context())
+            pooled.uses += 1
+            yield leased
+            # errors of the executed code are returned in the execution, an exception means the
+            # sandbox itself failed (e.g. timeout, connection error)
+            healthy = True
+        finally:
+            self._release(api_key, pooled, healthy)
+            if self.enabled:
+                self._refill(api_key)
+
+    async def start(self) -> None:
+        """Start evicting idle sandboxes in the background."""
+        if not self.enabled or (self._task and not self._task.done()):
+            return
+        self._closed = False
+        self._stop_event.clear()
+        self._warmup_executor = ThreadPoolExecutor(
+            max_workers=self.warmup_workers, thread_name_prefix="e2b-sandbox-warmup"
+        )
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"E2B sandbox pool started, min_idle={self.min_idle}, max_idle={self.max_idle}, "
+            f"idle_ttl_seconds={self.idle_ttl_seconds}"
+        )
+
+    async def stop(self) -> None:
+        """Stop the background eviction and kill the idle sandboxes."""
+        self._stop_event.set()
+        if self._task:
+            await self._task
+            self._task = None
+        with self._lock:
+            self._closed = True
+            idle = [pooled for pool in self._pools.values() for pooled in pool.idle]
+            self._pools.clear()
+        if self._warmup_executor:
+            self._warmup_executor.shutdown(wait=False, cancel_futures=True)
+            self._warmup_executor = None
+        await asyncio.to_thread(self._kill_all, idle)
+        logger.info(f"E2B sandbox pool stopped, killed={len(idle)}")
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self._lock:
+            idle = sum(len(pool.idle) for pool in self._pools.values())
+            warming = sum(pool.warming for pool in self._pools.values())
+            api_keys = len(self._pools)
+        return {"api_keys": api_keys, "idle": idle, "warming": warming, **self._stats}
+
+    def _take(self, api_key: str) -> _PooledSandbox | None:
+        now = time.monotonic()
+        expired = []
+        pooled = None
+        with self._lock:
+            self._stats["leased"] += 1
+            pool = self._pools.get(api_key)
+            while pool and pool.idle:
+                # most recently used first, the least recently used ones get evicted when idle
+                candidate = pool.idle.pop()
+                if now - candidate.created_at >= self.max_age_seconds:
+                    expired.append(candidate)
+                    continue
+                pooled = candidate
+                self._stats["warm_hits"] += 1
+                break
+        self._kill_all(expired, "recycled")
+        return pooled
+
+    def _create(self, api_key: str) -> _PooledSandbox:
+        sandbox = self.sandbox_factory(api_key)
+        now = time.monotonic()
+        with self._lock:
+            self._stats["created"] += 1
+        logger.debug(f"Created E2B sandbox, api_key_hash={_hash(api_key)}")
+        return _PooledSandbox(sandbox=sandbox, created_at=now, last_used_at=now)
+
+    def _release(self, api_key: str, pooled: _PooledSandbox, healthy: bool) -> None:
+        pooled.last_used_at = time.monotonic()
+        reusable = (
+            self.enabled
+            and healthy
+            and pooled.uses < self.max_uses
+            and pooled.last_used_at - pooled.created_at < self.max_age_seconds
+        )
+        with self._lock:
+            if reusable and not self._closed:
+                pool = self._pools.setdefault(api_key, _KeyPool())
+                if len(pool.idle) < self.max_idle:
+                    pool.idle.append(pooled)
+                    return
+        self._kill_all([pooled], "recycled")
+
+    def _refill(self, api_key: str) -> None:
+        """Create sandboxes in the background up to min_idle idle sandboxes of the API key."""
+        with self._lock:
+            if self._closed or self._warmup_executor is None:
+                return
+            pool = self._pools.setdefault(api_key, _KeyPool())
+            missing = self.min_idle - len(pool.idle) - pool.warming
+            if missing <= 0:
+                return
+            pool.warming += missing
+            executor = self._warmup_executor
+        for _ in range(missing):
+            try:
+                executor.submit(self._warm_up, api_key)
+            except RuntimeError:
+                # shut down in the meantime
+                with self._lock:
+                    pool.warming -= 1
+
+    def _warm_up(self, api_key: str) -> None:
+        pooled = None
+        try:
+            pooled = self._create(api_key)
+        except Exception:
+            logger.exception(f"Failed to create E2B sandbox, api_key_hash={_hash(api_key)}")
+        with self._lock:
+            pool = self._pools.get(api_key)
+            if pool is not None:
+                pool.warming -= 1
+            if pooled is None:
+                return
+            if not self._closed and pool is not None and len(pool.idle) < self.max_idle:
+                # least recently used end, warm sandboxes are taken after the recently used ones
+                pool.idle.insert(0, pooled)
+                return
+        self._kill_all([pooled], "recycled")
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stop_event.wait(), timeout=self.eviction_interval_seconds
+                )
+            except TimeoutError:
+                pass
+            try:
+                await self._evict_idle()
+            except Exception:
+                logger.exception("Failed to evict idle E2B sandboxes")
+
+    async def _evict_idle(self) -> None:
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for api_key, pool in list(self._pools.items()):
+                keep = []
+                for pooled in pool.idle:
+                    if (
+                        now - pooled.last_used_at >= self.idle_ttl_seconds
+                        or now - pooled.created_at >= self.max_age_seconds
+                    ):
+                        evicted.append(pooled)
+                    else:
+                        keep.append(pooled)
+                pool.idle = keep
+                if not pool.idle and not pool.warming:
+                    del self._pools[api_key]
+        if evicted:
+            await asyncio.to_thread(self._kill_all, evicted, "evicted")
+            logger.info(f"Evicted idle E2B sandboxes, count={len(evicted)}")
+
+    def _kill_all(self, sandboxes: list[_PooledSandbox], reason: str | None = None) -> None:
+        for pooled in sandboxes:
+            try:
+                pooled.sandbox.kill()
+            except Exception:
+                # sandboxes are killed by E2B anyway after their timeout
+                logger.warning("Failed to kill E2B sandbox", exc_info=True)
+        if reason and sandboxes:
+            with self._lock:
+                self._stats[reason] += len(sandboxes)
+
+
+def _hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+def _create_sandbox(api_key: str) -> Sandbox:
+    return Sandbox.create(api_key=api_key, timeout=config.E2B_SANDBOX_TIMEOUT_SECONDS)
+
+
+e2b_sandbox_pool = E2bSandboxPool(
+    sandbox_factory=_create_sandbox,
+    enabled=config.E2B_SANDBOX_POOL_ENABLED,
+    min_idle=config.E2B_SANDBOX_POOL_MIN_IDLE,
+    max_idle=config.E2B_SANDBOX_POOL_MAX_IDLE,
+    max_uses=config.E2B_SANDBOX_POOL_MAX_USES,
+    # recycled a minute before E2B kills them
+    max_age_seconds=max(config.E2B_SANDBOX_TIMEOUT_SECONDS - 60, 0),
+    idle_ttl_seconds=config.E2B_SANDBOX_POOL_IDLE_TTL_SECONDS,
+    eviction_interval_seconds=config.E2B_SANDBOX_POOL_EVICTION_INTERVAL_SECONDS,
+    warmup_workers=config.E2B_SANDBOX_POOL_WARMUP_WORKERS,
+)
@@ -0,0 +1,281 @@
+"""
+Resolves everything a function execution needs from the database (function, app, app configuration
+and linked account) in a single joined query.
+
+The function definition (and the app it belongs to) rarely changes, so a read-only snapshot of it is
+cached in process. On a cache hit only the mutable parts (app configuration, linked account) are
+fetched, together with the current function and app versions (updated_at) to validate the cached
+snapshot, which still makes it a single round trip.
+"""
+
+import copy
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import ColumnElement, Select, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload, object_mapper
+from sqlalchemy.orm.attributes import set_committed_value
+
+from aci.common.db.sql_models import App, AppConfiguration, Function, LinkedAccount, Project
+from aci.common.enums import Visibility
+from aci.common.logging_setup import get_logger
+from aci.server import config
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ExecutionContext:
+    # NOTE: the function (and function.app) is a snapshot shared between requests, it's not attached
+    # to any session and must be treated as read-only.
+    # Use app_configuration.app for anything that reads or updates app credentials.
+    function: Function
+    app_configuration: AppConfiguration | None
+    linked_account: LinkedAccount | None
+
+
+@dataclass(frozen=True)
+class _CachedFunction:
+    function: Function
+    function_version: datetime
+    app_version: datetime
+    expires_at: float
+
+
+@dataclass(frozen=True)
+class _Lookup:
+    """How to find the function, app configuration and linked account for one execution"""
+
+    cache_key: tuple[Any, ...]
+    function_name: str
+    # filters applied on Function and App, on top of the function name
+    function_filter: ColumnElement[bool]
+    app_configuration_condition: ColumnElement[bool]
+    linked_account_condition: ColumnElement[bool]
+    # preference if more than one function matches the name (e.g. a global and a user function)
+    order_by: tuple[ColumnElement[Any], ...] = ()
+
+
+def _snapshot[T](instance: T) -> T:
+    """
+    Make a detached copy of an ORM instance with all column attributes loaded, so it stays usable
+    after the session it was loaded from is committed or closed.
+    """
+    mapper = object_mapper(instance)
+    snapshot = mapper.class_manager.new_instance()
+    for column_attr in mapper.column_attrs:
+        set_committed_value(
+            snapshot, column_attr.key, copy.deepcopy(getattr(instance, column_attr.key))
+        )
+    return snapshot
+
+
+def _snapshot_function(function: Function) -> Function:
+    snapshot = _snapshot(function)
+    set_committed_value(snapshot, "app", _snapshot(function.app))
+    return snapshot
+
+
+class ExecutionContextResolver:
+    def __init__(self, max_size: int, ttl_seconds: int):
+        """
+        Args:
+            max_size: max number of cached functions
+            ttl_seconds: how long a function name lookup is cached. Cached functions are validated
+                against the database on every execution anyway, the ttl only bounds how long a
+                newly created function with the same name (e.g. a global function shadowing a user
+                function) can go unnoticed.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._functions: OrderedDict[tuple[Any, ...], _CachedFunction] = OrderedDict()
+
+    async def resolve_for_project(
+        self,
+        db_session: AsyncSession,
+        project: Project,
+        function_name: str,
+        linked_account_owner_id: str,
+        project_id: UUID | None = None,
+    ) -> ExecutionContext | None:
+        """
+        Resolve the execution context of a function called through the API by a project.
+        Global functions (active, and public if the project can only access public apps) take
+        precedence over user functions of the project.
+
+        Returns:
+            None if the function is not found. The app configuration and linked account are None if
+            the project doesn't have them.
+        """
+        public_only = project.visibility_access == Visibility.PUBLIC
+        global_function_filter = and_(Function.project_id.is_(None), App.active, Function.active)
+        if public_only:
+            global_function_filter = and_(
+                global_function_filter,
+                App.visibility == Visibility.PUBLIC,
+                Function.visibility == Visibility.PUBLIC,
+            )
+
+        lookup = _Lookup(
+            cache_key=("project", function_name, public_only, project_id),
+            function_name=function_name,
+            function_filter=or_(global_function_filter, Function.project_id == project_id),
+            app_configuration_condition=and_(
+                AppConfiguration.project_id == project.id,
+                AppConfiguration.app_id == Function.app_id,
+            ),
+            linked_account_condition=and_(
+                LinkedAccount.project_id == project.id,
+                LinkedAccount.app_id == Function.app_id,
+                LinkedAccount.linked_account_owner_id == linked_account_owner_id,
+            ),
+            order_by=(Function.project_id.is_(None).desc(),),
+        )
+        return await self._resolve(db_session, lookup)
+
+    async def resolve_for_app_configuration(
+        self,
+        db_session: AsyncSession,
+        app_configuration_id: UUID,
+        function_name: str,
+        linked_account_owner_id: str,
+        project_id: UUID | None = None,
+    ) -> ExecutionContext | None:
+        """
+        Resolve the execution context of a function called through an MCP server, which is bound to
+        an app configuration. Only active functions are considered, user functions if project_id
+        is given, global functions otherwise.
+
+        Returns:
+            None if the function is not found. The app configuration and linked account are None if
+            they don't exist.
+        """
+        scope_filter: ColumnElement[bool]
+        if project_id is None:
+            scope_filter = Function.project_id.is_(None)
+        else:
+            scope_filter = Function.project_id == project_id
+
+        lookup = _Lookup(
+            cache_key=("app_configuration", function_name, project_id),
+            function_name=function_name,
+            function_filter=and_(scope_filter, App.active, Function.active),
+            app_configuration_condition=AppConfiguration.id == app_configuration_id,
+            linked_account_condition=and_(
+                LinkedAccount.project_id == AppConfiguration.project_id,
+                LinkedAccount.app_id == Function.app_id,
+                LinkedAccount.linked_account_owner_id == linked_account_owner_id,
+            ),
+        )
+        return await self._resolve(db_session, lookup)
+
+    def invalidate(self, function_id: UUID) -> None:
+        for cache_key in [
+            cache_key
+            for cache_key, cached in self._functions.items()
+            if cached.function.id == function_id
+        ]:
+            del self._functions[cache_key]
+
+    def clear(self) -> None:
+        self._functions.clear()
+
+    async def _resolve(self, db_session: AsyncSession, lookup: _Lookup) -> ExecutionContext | None:
+        cached = self._get_cached(lookup.cache_key)
+        if cached is not None:
+            context = await self._resolve_cached(db_session, lookup, cached)
+            if context is not None:
+                return context
+            # the function was updated, deleted or no longer matches the lookup
+            self._functions.pop(lookup.cache_key, None)
+
+        statement = (
+            self._base_statement(lookup, Function, AppConfiguration, LinkedAccount)
+            .filter(Function.name == lookup.function_name, lookup.function_filter)
+            .options(contains_eager(Function.app))
+            .order_by(*lookup.order_by)
+            .limit(1)
+        )
+        row = (await db_session.execute(statement)).first()
+        if row is None:
+            return None
+
+        function, app_configuration, linked_account = row
+        function_snapshot = _snapshot_function(function)
+        self._put_cached(
+            lookup.cache_key,
+            _CachedFunction(
+                function=function_snapshot,
+                function_version=function.updated_at,
+                app_version=function.app.updated_at,
+                expires_at=time.monotonic() + self.ttl_seconds,
+            ),
+        )
+        return ExecutionContext(
+            function=function_snapshot,
+            app_configuration=app_configuration,
+            linked_account=linked_account,
+        )
+
+    async def _resolve_cached(
+        self, db_session: AsyncSession, lookup: _Lookup, cached: _CachedFunction
+    ) -> ExecutionContext | None:
+        statement = self._base_statement(
+            lookup, Function.updated_at, App.updated_at, AppConfiguration, LinkedAccount
+        ).filter(Function.id == cached.function.id, lookup.function_filter)
+        row = (await db_session.execute(statement)).first()
+        if row is None:
+            return None
+
+        function_version, app_version, app_configuration, linked_account = row
+        if function_version != cached.function_version or app_version != cached.app_version:
+            logger.debug(
+                f"Cached function is outdated, function_name={lookup.function_name}, "
+                f"function_id={cached.function.id}"
+            )
+            return None
+
+        return ExecutionContext(
+            function=cached.function,
+            app_configuration=app_configuration,
+            linked_account=linked_account,
+        )
+
+    @staticmethod
+    def _base_statement(lookup: _Lookup, *entities: Any) -> Select:
+        return (
+            select(*entities)
+            .select_from(Function)
+            .join(App, Function.app_id == App.id)
+            .outerjoin(AppConfiguration, lookup.app_configuration_condition)
+            .outerjoin(LinkedAccount, lookup.linked_account_condition)
+            # load app_configuration.app in the same query instead of a separate selectin query
+            .options(joinedload(AppConfiguration.app))
+        )
+
+    def _get_cached(self, cache_key: tuple[Any, ...]) -> _CachedFunction | None:
+        cached = self._functions.get(cache_key)
+        if cached is None:
+            return None
+        if cached.expires_at <= time.monotonic():
+            del self._functions[cache_key]
+            return None
+        self._functions.move_to_end(cache_key)
+        return cached
+
+    def _put_cached(self, cache_key: tuple[Any, ...], cached: _CachedFunction) -> None:
+        self._functions[cache_key] = cached
+        self._functions.move_to_end(cache_key)
+        while len(self._functions) > self.max_size:
+            self._functions.popitem(last=False)
+
+
+execution_context_resolver = ExecutionContextResolver(
+    max_size=config.EXECUTION_CONTEXT_CACHE_SIZE,
+    ttl_seconds=config.EXECUTION_CONTEXT_CACHE_TTL_SECONDS,
+)
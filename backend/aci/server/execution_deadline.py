@@ -0,0 +1,144 @@
+"""
+End-to-end deadline of function executions.
+
+The deadline of an execution covers everything from the execution context resolution to the
+credentials refresh, the upstream call (including retries) and the connector execution. Work
+still running past the deadline is cancelled, instead of holding worker capacity for a caller
+that already gave up.
+
+The timeout is taken from the X-REQUEST-TIMEOUT header (seconds), otherwise from the
+"timeout_seconds" of the function protocol_data, otherwise FUNCTION_EXECUTION_DEFAULT_TIMEOUT_SECONDS,
+capped at FUNCTION_EXECUTION_MAX_TIMEOUT_SECONDS.
+
+NOTE: sync connector methods already running in the thread pool can't be interrupted, only
+awaiting them is cancelled (methods not picked up by a thread yet are not run at all).
+"""
+
+import asyncio
+import contextvars
+from collections.abc import AsyncIterator, Awaitable
+from contextlib import asynccontextmanager
+
+from fastapi import Request
+
+from aci.common.db.sql_models import Function
+from aci.common.exceptions import ClientDisconnected, FunctionExecutionTimeout
+from aci.common.logging_setup import get_logger
+from aci.server import config
+
+logger = get_logger(__name__)
+
+
+class ExecutionDeadline:
+    def __init__(self, timeout: asyncio.Timeout, started_at: float, explicit: bool):
+        """
+        Args:
+            timeout: the asyncio timeout cancelling the execution
+            started_at: event loop time at which the execution started
+            explicit: whether the timeout was requested by the caller, which takes precedence
+                over the timeout of the function
+        """
+        self._timeout = timeout
+        self.started_at = started_at
+        self.explicit = explicit
+
+    def remaining(self) -> float:
+        when = self._timeout.when()
+        return float("inf") if when is None else when - asyncio.get_running_loop().time()
+
+    def apply_function_timeout(self, function: Function) -> None:
+        """Use the timeout of the function, unless the caller requested one."""
+        timeout_seconds = (function.protocol_data or {}).get("timeout_seconds")
+        if self.explicit or not timeout_seconds:
+            return
+        self._timeout.reschedule(self.started_at + _cap(float(timeout_seconds)))
+
+
+_deadline_ctx_var = contextvars.ContextVar[ExecutionDeadline | None](
+    "execution_deadline", default=None
+)
+
+
+def get_deadline() -> ExecutionDeadline | None:
+    """The deadline of the current execution, if any."""
+    return _deadline_ctx_var.get()
+
+
+def apply_function_timeout(function: Function) -> None:
+    """Use the timeout of the function for the current execution, see ExecutionDeadline."""
+    deadline = _deadline_ctx_var.get()
+    if deadline is not None:
+        deadline.apply_function_timeout(function)
+
+
+def get_remaining_seconds() -> float:
+    """Remaining time before the deadline of the current execution, inf if there is none."""
+    deadline = _deadline_ctx_var.get()
+    return float("inf") if deadline is None else deadline.remaining()
+
+
+@asynccontextmanager
+async def execution_deadline(
+    requested_timeout_seconds: float | None,
+) -> AsyncIterator[ExecutionDeadline]:
+    """
+    Run the execution under a deadline, see the module docstring.
+
+    Raises:
+        FunctionExecutionTimeout: the deadline was exceeded
+    """
+    explicit = requested_timeout_seconds is not None
+    timeout_seconds = _cap(
+        config.FUNCTION_EXECUTION_DEFAULT_TIMEOUT_SECONDS
+        if requested_timeout_seconds is None
+        else requested_timeout_seconds
+    )
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    timeout = asyncio.timeout_at(started_at + timeout_seconds)
+    try:
+        async with timeout:
+            deadline = ExecutionDeadline(timeout, started_at, explicit)
+            token = _deadline_ctx_var.set(deadline)
+            try:
+                yield deadline
+            finally:
+                _deadline_ctx_var.reset(token)
+    except TimeoutError as e:
+        if not timeout.expired():
+            raise
+        elapsed = loop.time() - started_at
+        logger.warning(f"Function execution deadline exceeded, elapsed={elapsed:.2f}s")
+        raise FunctionExecutionTimeout(
+            f"function execution didn't complete within {elapsed:.1f}s"
+        ) from e
+
+
+async def cancel_on_disconnect[T](request: Request, awaitable: Awaitable[T]) -> T:
+    """
+    Await the awaitable, cancelling it if the client disconnects in the meantime.
+
+    Raises:
+        ClientDisconnected: the client disconnected before the awaitable completed
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {task}, timeout=config.CLIENT_DISCONNECT_POLL_INTERVAL_SECONDS
+            )
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.warning(f"Client disconnected, cancelling request, path={request.url.path}")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise ClientDisconnected()
+    finally:
+        # cancelled ourselves (e.g. server shutdown)
+        if not task.done():
+            task.cancel()
+
+
+def _cap(timeout_seconds: float) -> float:
+    return min(timeout_seconds, config.FUNCTION_EXECUTION_MAX_TIMEOUT_SECONDS)
@@ -1,5 +1,6 @@
 import abc
 import asyncio
+import json
 import logging
 import threading
 from dataclasses import dataclass
@@ -19,6 +20,7 @@ from aci.server.config import (
     EXECUTION_LOG_APPENDER_MAX_BATCH,
     EXECUTION_LOG_APPENDER_DROP_POLICY,
     EXECUTION_LOG_APPENDER_REDIS_QUEUE_NAME,
+    EXECUTION_LOG_DETAIL_MAX_BYTES,
 )
 from aci.server.redis_client import redis_client
 
@@ -41,6 +43,24 @@ class LogEvent:
     # optional details
     request: Optional[dict[str, Any]] = None
     response: Optional[any] = None
+    # served from the function response cache
+    cached: bool = False
+
+
+def _bounded_preview(value: Any, max_bytes: int = EXECUTION_LOG_DETAIL_MAX_BYTES) -> Any:
+    """
+    Returns:
+        the value, or a truncated preview of it if it's larger than max_bytes (serialized)
+    """
+    serialized = json.dumps(value, default=str)
+    # ASCII only (ensure_ascii), the length is the size in bytes
+    if len(serialized) <= max_bytes:
+        return value
+    return {
+        "truncated": True,
+        "size": len(serialized),
+        "preview": serialized[:max_bytes],
+    }
 
 
 class LogAppenderBase(abc.ABC):
@@ -116,10 +136,29 @@ class LogAppenderBase(abc.ABC):
             response: Optional[Any] = None,
             created_at: Optional[datetime] = None,
             execution_id: Optional[UUID] = None,
+            cached: bool = False,
     ) -> Optional[UUID]:
         """Enqueue a log event asynchronously. Returns the execution ID if successful, None if dropped."""
         pass
 
+    @abc.abstractmethod
+    async def enqueue_many(self, events: list[LogEvent]) -> list[UUID | None]:
+        """
+        Enqueue several log events at once (e.g. for a batch execution).
+        Returns the execution ID of each event in order, None for the dropped ones.
+        """
+        pass
+
+    @staticmethod
+    def _bound_details(evt: LogEvent) -> None:
+        """
+        Replace the request/response of the event larger than EXECUTION_LOG_DETAIL_MAX_BYTES
+        (serialized) with a truncated preview, so large payloads are neither kept in the queue
+        nor stored in execution_details.
+        """
+        evt.request = _bounded_preview(evt.request)
+        evt.response = _bounded_preview(evt.response)
+
     async def _flush_to_db(self, batch: list[LogEvent]) -> None:
         """Flush a batch of log events to the database using a session."""
         if not batch:
@@ -136,6 +175,7 @@ class LogAppenderBase(abc.ABC):
             "execution_time": ev.execution_time,
             "created_at": ev.created_at,
             "project_id": ev.project_id,
+            "cached": ev.cached,
         } for ev in batch]
 
         details_rows = [{
@@ -211,6 +251,7 @@ class AsyncQueueLogAppender(LogAppenderBase):
             response: Optional[Any] = None,
             created_at: Optional[datetime] = None,
             execution_id: Optional[UUID] = None,
+            cached: bool = False,
     ) -> Optional[UUID]:
         if not self.q:
             logger.warning("AsyncQueueLogAppender not started, dropping event")
@@ -229,7 +270,9 @@ class AsyncQueueLogAppender(LogAppenderBase):
             project_id=project_id,
             request=request,
             response=response,
+            cached=cached,
         )
+        self._bound_details(evt)
         try:
             # Never block the caller; drop if full
             self.q.put_nowait(evt)
@@ -239,6 +282,22 @@ class AsyncQueueLogAppender(LogAppenderBase):
             logger.warning("AsyncQueueLogAppender queue full, dropping event")
             return None
 
+    async def enqueue_many(self, events: list[LogEvent]) -> list[UUID | None]:
+        if not self.q:
+            logger.warning("AsyncQueueLogAppender not started, dropping %d events", len(events))
+            return [None] * len(events)
+
+        execution_ids: list[UUID | None] = []
+        for evt in events:
+            self._bound_details(evt)
+            try:
+                self.q.put_nowait(evt)
+                execution_ids.append(evt.id)
+            except asyncio.QueueFull:
+                logger.warning("AsyncQueueLogAppender queue full, dropping event")
+                execution_ids.append(None)
+        return execution_ids
+
     async def _run(self) -> None:
         sleep_s = self.flush_every_ms / 1000.0
         batch: list[LogEvent] = []
@@ -321,9 +380,8 @@ class AsyncRedisLogAppender(LogAppenderBase):
             response: Optional[Any] = None,
             created_at: Optional[datetime] = None,
             execution_id: Optional[UUID] = None,
+            cached: bool = False,
     ) -> Optional[UUID]:
-        import json
-
         evt = LogEvent(
             id=execution_id or uuid4(),
             function_name=function_name,
@@ -337,42 +395,54 @@ class AsyncRedisLogAppender(LogAppenderBase):
             project_id=project_id,
             request=request,
             response=response,
+            cached=cached,
         )
 
+        return (await self.enqueue_many([evt]))[0]
+
+    async def enqueue_many(self, events: list[LogEvent]) -> list[UUID | None]:
+        if not events:
+            return []
+
         try:
-            # Serialize the event to JSON
-            serialized = json.dumps({
-                "id": str(evt.id),
-                "function_name": evt.function_name,
-                "app_name": evt.app_name,
-                "api_key_name": evt.api_key_name,
-                "linked_account_owner_id": evt.linked_account_owner_id,
-                "app_configuration_id": str(evt.app_configuration_id) if evt.app_configuration_id else None,
-                "status": evt.status.value,
-                "execution_time": evt.execution_time,
-                "created_at": evt.created_at.isoformat(),
-                "project_id": str(evt.project_id),
-                "request": evt.request,
-                "response": evt.response,
-            })
-
-            # Push to Redis queue (async)
-            queue_length = await self.redis_client.lpush(self.queue_name, serialized)
+            serialized = []
+            for evt in events:
+                self._bound_details(evt)
+                serialized.append(self._serialize(evt))
+
+            # Push all events to Redis queue in one round trip (async)
+            queue_length = await self.redis_client.lpush(self.queue_name, *serialized)
 
             # Drop oldest if queue is too long (implement max_queue limit)
             if queue_length > self.max_queue:
                 logger.warning("Redis queue is full, dropping oldest")
-                await self.redis_client.rpop(self.queue_name)
+                await self.redis_client.rpop(self.queue_name, queue_length - self.max_queue)
 
-            return evt.id
+            return [evt.id for evt in events]
         except Exception as e:
-            logger.exception("Failed to enqueue log event to Redis: %s", e)
+            logger.exception("Failed to enqueue log events to Redis: %s", e)
             # Drop on any Redis error to protect hot path
-            return None
+            return [None] * len(events)
+
+    @staticmethod
+    def _serialize(evt: LogEvent) -> str:
+        return json.dumps({
+            "id": str(evt.id),
+            "function_name": evt.function_name,
+            "app_name": evt.app_name,
+            "api_key_name": evt.api_key_name,
+            "linked_account_owner_id": evt.linked_account_owner_id,
+            "app_configuration_id": str(evt.app_configuration_id) if evt.app_configuration_id else None,
+            "status": evt.status.value,
+            "execution_time": evt.execution_time,
+            "created_at": evt.created_at.isoformat(),
+            "project_id": str(evt.project_id),
+            "cached": evt.cached,
+            "request": evt.request,
+            "response": evt.response,
+        }, default=str)
 
     async def _run(self) -> None:
-        import json
-
         sleep_s = self.flush_every_ms / 1000.0
         batch: list[LogEvent] = []
 
@@ -402,6 +472,7 @@ class AsyncRedisLogAppender(LogAppenderBase):
                             project_id=UUID(data["project_id"]),
                             request=data["request"],
                             response=data["response"],
+                            cached=data.get("cached", False),
                         )
                         batch.append(evt)
                     except (json.JSONDecodeError, KeyError, ValueError) as e:
@@ -0,0 +1,278 @@
+"""
+Per-project fair-share admission of function executions.
+
+All projects share the same worker (database connections, upstream connections, connector
+threads), so without admission control a single project bursting (e.g. a bulk agent job) takes all
+of it and every other project's latency goes up.
+
+Executions are admitted up to a max number in flight per worker, and per project. Executions that
+can't be admitted right away wait in a weighted fair queue: each waiting execution gets a virtual
+finish tag (max(virtual time, last tag of its project) + 1 / weight) and freed slots go to the
+smallest tag first, so projects get slots in proportion to their weight (from their subscription
+plan), however many executions they queue. Executions waiting longer than the queue timeout fail
+with a 429.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import UUID
+
+from aci.common.db import crud
+from aci.common.exceptions import TooManyConcurrentExecutions
+from aci.common.logging_setup import get_logger
+from aci.common.utils import create_db_async_session
+from aci.server import billing, config
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _ProjectState:
+    weight: float
+    in_flight: int = 0
+    waiting: int = 0
+    # virtual finish tag of the last queued execution of the project
+    last_tag: float = 0.0
+
+
+@dataclass(order=True)
+class _Waiter:
+    tag: float
+    # FIFO among equal tags
+    seq: int
+    project_id: UUID = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class FairShareScheduler:
+    def __init__(
+        self,
+        enabled: bool,
+        max_concurrency: int,
+        max_in_flight_per_project: int,
+        max_queued_per_project: int,
+        queue_timeout_seconds: float,
+        plan_weights: dict[str, float],
+        default_weight: float,
+        weight_cache_ttl_seconds: float,
+        weight_cache_size: int,
+    ):
+        """
+        Args:
+            enabled: if False, executions are always admitted right away
+            max_concurrency: max executions in flight on this worker, all projects together
+            max_in_flight_per_project: max executions in flight on this worker per project
+            max_queued_per_project: max executions waiting per project, more fail right away
+            queue_timeout_seconds: max time an execution waits to be admitted
+            plan_weights: weight of the projects per subscription plan name
+            default_weight: weight of projects whose plan has no weight
+            weight_cache_ttl_seconds: how long the weight of a project is cached
+            weight_cache_size: max number of projects whose weight is cached
+        """
+        self.enabled = enabled
+        self.max_concurrency = max_concurrency
+        self.max_in_flight_per_project = max_in_flight_per_project
+        self.max_queued_per_project = max_queued_per_project
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.plan_weights = plan_weights
+        self.default_weight = default_weight
+        self.weight_cache_ttl_seconds = weight_cache_ttl_seconds
+        self.weight_cache_size = weight_cache_size
+        self._projects: dict[UUID, _ProjectState] = {}
+        self._waiters: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        # project id -> (expires at, weight)
+        self._weights: dict[UUID, tuple[float, float]] = {}
+        self._stats = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+
+    @asynccontextmanager
+    async def admit(self, project_id: UUID, org_id: UUID | None = None) -> AsyncIterator[None]:
+        """
+        Hold an execution slot of the project for the duration of the context.
+
+        Args:
+            project_id: the project executing
+            org_id: the organization of the project if known, saves a lookup
+
+        Raises:
+            TooManyConcurrentExecutions: the project has too many executions waiting, or the
+                execution waited longer than the queue timeout
+        """
+        if not self.enabled:
+            yield
+            return
+
+        weight = await self._get_weight(project_id, org_id)
+        await self._acquire(project_id, weight)
+        try:
+            yield
+        finally:
+            self._release(project_id)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": sum(state.waiting for state in self._projects.values()),
+            "projects": len(self._projects),
+            **self._stats,
+        }
+
+    async def _acquire(self, project_id: UUID, weight: float) -> None:
+        state = self._projects.get(project_id)
+        if state is None:
+            state = self._projects[project_id] = _ProjectState(weight=weight)
+        state.weight = weight
+
+        if not self._waiters and self._can_admit(state):
+            self._grant(state)
+            return
+
+        if state.waiting >= self.max_queued_per_project:
+            self._stats["rejected"] += 1
+            self._forget_if_idle(project_id, state)
+            logger.warning(
+                f"Too many executions waiting, rejecting execution, project_id={project_id}, "
+                f"waiting={state.waiting}"
+            )
+            raise TooManyConcurrentExecutions(
+                f"project has {state.waiting} executions waiting, retry later"
+            )
+
+        tag = max(self._virtual_time, state.last_tag) + 1.0 / state.weight
+        state.last_tag = tag
+        waiter = _Waiter(
+            tag, next(self._seq), project_id, asyncio.get_running_loop().create_future()
+        )
+        heapq.heappush(self._waiters, waiter)
+        state.waiting += 1
+        self._stats["queued"] += 1
+        # a slot might be free (e.g. for another project than the ones waiting)
+        self._dispatch()
+
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.queue_timeout_seconds)
+        except asyncio.CancelledError:
+            if not self._withdraw(waiter, state):
+                # admitted in the meantime
+                self._release(project_id)
+            raise
+
+        if self._withdraw(waiter, state):
+            self._stats["timeouts"] += 1
+            logger.warning(
+                f"Execution waited too long to be admitted, project_id={project_id}, "
+                f"timeout={self.queue_timeout_seconds}s"
+            )
+            raise TooManyConcurrentExecutions(
+                f"execution not admitted within {self.queue_timeout_seconds}s, retry later"
+            )
+
+    def _withdraw(self, waiter: _Waiter, state: _ProjectState) -> bool:
+        """
+        Withdraw a waiter that wasn't admitted (its heap entry is skipped by _dispatch).
+
+        Returns:
+            False if the waiter was admitted already
+        """
+        if waiter.future.done():
+            return False
+        waiter.future.cancel()
+        state.waiting -= 1
+        self._forget_if_idle(waiter.project_id, state)
+        return True
+
+    def _release(self, project_id: UUID) -> None:
+        state = self._projects[project_id]
+        state.in_flight -= 1
+        self._in_flight -= 1
+        self._forget_if_idle(project_id, state)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiters, smallest virtual finish tag first, while there are free slots."""
+        blocked: list[_Waiter] = []
+        while self._waiters and self._in_flight < self.max_concurrency:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():
+                # withdrawn
+                continue
+            state = self._projects[waiter.project_id]
+            if not self._can_admit(state):
+                blocked.append(waiter)
+                continue
+            state.waiting -= 1
+            self._virtual_time = waiter.tag
+            self._grant(state)
+            waiter.future.set_result(None)
+        for waiter in blocked:
+            heapq.heappush(self._waiters, waiter)
+
+    def _can_admit(self, state: _ProjectState) -> bool:
+        return (
+            self._in_flight < self.max_concurrency
+            and state.in_flight < self.max_in_flight_per_project
+        )
+
+    def _grant(self, state: _ProjectState) -> None:
+        state.in_flight += 1
+        self._in_flight += 1
+        self._stats["admitted"] += 1
+
+    def _forget_if_idle(self, project_id: UUID, state: _ProjectState) -> None:
+        if state.in_flight == 0 and state.waiting == 0:
+            self._projects.pop(project_id, None)
+        if not self._projects:
+            # nothing in flight or waiting, restart the virtual clock
+            self._virtual_time = 0.0
+
+    async def _get_weight(self, project_id: UUID, org_id: UUID | None) -> float:
+        cached = self._weights.get(project_id)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            return cached[1]
+
+        weight = self.default_weight
+        # own session, the caller's one must not hold a connection while the execution is queued
+        db_session = create_db_async_session(config.DB_FULL_URL)
+        try:
+            if org_id is None:
+                project = await crud.projects.get_project(db_session, project_id)
+                org_id = project.org_id if project else None
+            if org_id is not None:
+                plan = await billing.get_active_plan_by_org_id(db_session, org_id)
+                weight = self.plan_weights.get(plan.name, self.default_weight)
+        except Exception:
+            # never fail the execution because of the weight
+            logger.exception(f"Failed to get the plan of the project, project_id={project_id}")
+        finally:
+            await db_session.close()
+
+        self._weights[project_id] = (now + self.weight_cache_ttl_seconds, weight)
+        if len(self._weights) > self.weight_cache_size:
+            # expired entries first, then the oldest ones
+            for key in [key for key, (expires_at, _) in self._weights.items() if expires_at <= now]:
+                del self._weights[key]
+            while len(self._weights) > self.weight_cache_size:
+                del self._weights[next(iter(self._weights))]
+        return weight
+
+
+fair_share_scheduler = FairShareScheduler(
+    enabled=config.FAIR_SHARE_ENABLED,
+    max_concurrency=config.FAIR_SHARE_MAX_CONCURRENCY,
+    max_in_flight_per_project=config.FAIR_SHARE_MAX_IN_FLIGHT_PER_PROJECT,
+    max_queued_per_project=config.FAIR_SHARE_MAX_QUEUED_PER_PROJECT,
+    queue_timeout_seconds=config.FAIR_SHARE_QUEUE_TIMEOUT_SECONDS,
+    plan_weights=config.FAIR_SHARE_PLAN_WEIGHTS,
+    default_weight=config.FAIR_SHARE_DEFAULT_WEIGHT,
+    weight_cache_ttl_seconds=config.FAIR_SHARE_WEIGHT_CACHE_TTL_SECONDS,
+    weight_cache_size=config.FAIR_SHARE_WEIGHT_CACHE_SIZE,
+)
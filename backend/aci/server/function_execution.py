@@ -0,0 +1,89 @@
+"""
+Execution of resolved functions with the credentials of their linked account, shared by the
+execute routes (aci.server.routes.functions) and the MCP tool calls (aci.server.mcp).
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aci.common.db.sql_models import AppConfiguration, Function, LinkedAccount
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.function import FunctionExecutionResult
+from aci.server import security_credentials_manager as scm
+from aci.server.function_executors import get_executor
+from aci.server.function_response_cache import function_response_cache
+from aci.server.security_credentials_manager import SecurityCredentialsResponse
+
+logger = get_logger(__name__)
+
+
+async def execute_with_credentials(
+    db_session: AsyncSession,
+    function: Function,
+    function_input: dict,
+    app_configuration: AppConfiguration,
+    linked_account: LinkedAccount,
+) -> tuple[FunctionExecutionResult, bool]:
+    """
+    Execute a resolved function with the credentials of the linked account, through the function
+    response cache if the function opts in.
+
+    Returns:
+        The full (not projected) execution result, and whether it was served from the cache
+    """
+    cache_ttl = function_response_cache.get_ttl(function)
+    if cache_ttl is None:
+        execution_result = await _execute_with_credentials(
+            db_session, function, function_input, app_configuration, linked_account
+        )
+        return execution_result, False
+
+    execution_result, cached = await function_response_cache.get_or_execute(
+        function_response_cache.build_key(function.name, function_input, linked_account.id),
+        cache_ttl,
+        lambda: _execute_with_credentials(
+            db_session, function, function_input, app_configuration, linked_account
+        ),
+    )
+    logger.info(f"Function response cache lookup, function_name={function.name}, cached={cached}")
+    return execution_result, cached
+
+
+async def _execute_with_credentials(
+    db_session: AsyncSession,
+    function: Function,
+    function_input: dict,
+    app_configuration: AppConfiguration,
+    linked_account: LinkedAccount,
+) -> FunctionExecutionResult:
+    """Get (and refresh if needed) the security credentials and execute the function."""
+    security_credentials_response: SecurityCredentialsResponse = await scm.get_security_credentials(
+        app_configuration.app, app_configuration, linked_account
+    )
+
+    logger.info(
+        f"Fetched security credentials for function execution, function_name={function.name}, "
+        f"app_name={function.app.name}, linked_account_owner_id={linked_account.linked_account_owner_id}, "
+        f"linked_account_id={linked_account.id}, is_updated={security_credentials_response.is_updated}, "
+        f"is_app_default_credentials={security_credentials_response.is_app_default_credentials}"
+    )
+
+    if security_credentials_response.is_updated:
+        # short write transaction, only when the credentials actually changed
+        await scm.update_security_credentials(
+            db_session, app_configuration.app, linked_account, security_credentials_response
+        )
+        await db_session.commit()
+
+    function_executor = get_executor(function.protocol, linked_account)
+    logger.info(
+        f"Instantiated function executor, function_executor={type(function_executor)}, "
+        f"function={function.name}"
+    )
+
+    # Execute the function
+    return await function_executor.execute(
+        function,
+        function_input,
+        security_credentials_response.scheme,
+        security_credentials_response.credentials,
+    )
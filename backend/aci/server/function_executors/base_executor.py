@@ -8,6 +8,9 @@ from aci.common.db.sql_models import Function, LinkedAccount
 from aci.common.exceptions import InvalidFunctionInput
 from aci.common.logging_setup import get_logger
 from aci.common.schemas.function import FunctionExecutionResult
+from aci.server.function_executors.function_input_validator import (
+    function_input_validator_cache,
+)
 
 logger = get_logger(__name__)
 
@@ -28,7 +31,7 @@ class FunctionExecutor(ABC, Generic[TScheme, TCred]):
     # app_instance: AppBase = app_factory.get_app_instance(function_name)
     # app_instance.validate_input(function.parameters, function_execution_params.function_input)
     # return app_instance.execute(function_name, function_execution_params.function_input)
-    def execute(
+    async def execute(
         self,
         function: Function,
         function_input: dict,
@@ -44,15 +47,12 @@ class FunctionExecutor(ABC, Generic[TScheme, TCred]):
         )
         function_input = self._preprocess_function_input(function, function_input)
 
-        return self._execute(function, function_input, security_scheme, security_credentials)
+        return await self._execute(function, function_input, security_scheme, security_credentials)
 
     def _preprocess_function_input(self, function: Function, function_input: dict) -> dict:
         # validate user input against the "visible" parameters
         try:
-            jsonschema.validate(
-                instance=function_input,
-                schema=processor.filter_visible_properties(function.parameters),
-            )
+            function_input_validator_cache.get(function).validate(function_input)
         except jsonschema.ValidationError as e:
             logger.exception(
                 f"Failed to validate function input, function_name={function.name}, error={e}"
@@ -82,7 +82,7 @@ class FunctionExecutor(ABC, Generic[TScheme, TCred]):
         return function_input
 
     @abstractmethod
-    def _execute(
+    async def _execute(
         self,
         function: Function,
         function_input: dict,
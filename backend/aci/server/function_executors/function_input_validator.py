@@ -0,0 +1,94 @@
+"""
+Cache of compiled function input validators.
+
+Filtering the visible properties deep-copies the whole parameters schema, and
+jsonschema.validate() re-checks the schema against its meta-schema and builds a new validator
+on every call. Both only depend on the function definition, so they are done once per function
+version and reused across executions.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from uuid import UUID
+
+import jsonschema
+from jsonschema.protocols import Validator
+
+from aci.common import processor
+from aci.common.db.sql_models import Function
+from aci.common.logging_setup import get_logger
+from aci.server import config
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class CompiledFunctionInputValidator:
+    # the function version (updated_at) the validator was compiled for
+    version: datetime
+    visible_parameters: dict
+    validator: Validator
+
+    def validate(self, instance: dict) -> None:
+        """
+        Same semantics as jsonschema.validate(), minus the schema check which was done at compile time.
+
+        Raises:
+            jsonschema.ValidationError: the most relevant error, if the instance is invalid
+        """
+        error = jsonschema.exceptions.best_match(self.validator.iter_errors(instance))
+        if error is not None:
+            raise error
+
+
+class FunctionInputValidatorCache:
+    """
+    LRU cache of compiled validators keyed by function id, an entry is only valid for the
+    function version (updated_at) it was compiled for.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._validators: OrderedDict[UUID, CompiledFunctionInputValidator] = OrderedDict()
+
+    def get(self, function: Function) -> CompiledFunctionInputValidator:
+        compiled = self._validators.get(function.id)
+        if compiled is not None and compiled.version == function.updated_at:
+            self._validators.move_to_end(function.id)
+            return compiled
+
+        compiled = self._compile(function)
+        self._validators[function.id] = compiled
+        self._validators.move_to_end(function.id)
+        while len(self._validators) > self.max_size:
+            self._validators.popitem(last=False)
+        return compiled
+
+    def invalidate(self, function_id: UUID) -> None:
+        self._validators.pop(function_id, None)
+
+    def clear(self) -> None:
+        self._validators.clear()
+
+    @staticmethod
+    def _compile(function: Function) -> CompiledFunctionInputValidator:
+        logger.debug(
+            f"Compiling function input validator, function_name={function.name}, "
+            f"function_id={function.id}, updated_at={function.updated_at}"
+        )
+        visible_parameters = processor.filter_visible_properties(function.parameters)
+        # pick the validator class the same way jsonschema.validate() does
+        validator_class = jsonschema.validators.validator_for(visible_parameters)
+        validator_class.check_schema(visible_parameters)
+
+        return CompiledFunctionInputValidator(
+            version=function.updated_at,
+            visible_parameters=visible_parameters,
+            validator=validator_class(visible_parameters),
+        )
+
+
+function_input_validator_cache = FunctionInputValidatorCache(
+    max_size=config.FUNCTION_INPUT_VALIDATOR_CACHE_SIZE
+)
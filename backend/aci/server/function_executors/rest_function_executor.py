@@ -1,3 +1,5 @@
+import asyncio
+import json
 from abc import abstractmethod
 from typing import Any, Generic, override
 
@@ -5,13 +7,28 @@ import httpx
 from httpx import HTTPStatusError
 
 from aci.common.db.sql_models import Function
+from aci.common.exceptions import UpstreamConcurrencyLimitExceeded
 from aci.common.logging_setup import get_logger
-from aci.common.schemas.function import FunctionExecutionResult, RestMetadata
+from aci.common.schemas.function import (
+    FunctionExecutionResult,
+    RestMetadata,
+    TruncatedResponseData,
+)
 from aci.common.schemas.security_scheme import (
     TCred,
     TScheme,
 )
+from aci.server import config
 from aci.server.function_executors.base_executor import FunctionExecutor
+from aci.server.http_client import get_http_client
+from aci.server.upstream_resilience import (
+    RETRYABLE_STATUS_CODES,
+    Bulkhead,
+    HostCircuitBreaker,
+    bulkhead_registry,
+    circuit_breaker_registry,
+    retry_policy,
+)
 
 logger = get_logger(__name__)
 
@@ -34,7 +51,7 @@ class RestFunctionExecutor(FunctionExecutor[TScheme, TCred], Generic[TScheme, TC
         pass
 
     @override
-    def _execute(
+    async def _execute(
         self,
         function: Function,
         function_input: dict,
@@ -74,46 +91,173 @@ class RestFunctionExecutor(FunctionExecutor[TScheme, TCred], Generic[TScheme, TC
             f"method={request.method} url={request.url} "
         )
 
-        return self._send_request(request)
+        bulkhead = bulkhead_registry.get(
+            request.url.host, function.app.name, function.app.max_concurrency
+        )
+        return await self._send_request(request, bulkhead)
+
+    async def _send_request(
+        self, request: httpx.Request, bulkhead: Bulkhead
+    ) -> FunctionExecutionResult:
+        """
+        Send the request, holding a slot of the bulkhead for each attempt.
+        The response body is streamed and the download is aborted once it exceeds
+        UPSTREAM_RESPONSE_MAX_BYTES, see _read_body.
+
+        Raises:
+            UpstreamConcurrencyLimitExceeded: no slot of the bulkhead was free within the queue timeout
+        """
+        # NOTE: the client is shared across the worker (see aci.server.http_client), don't close it here
+        client = get_http_client()
+        host = request.url.host
+        breaker = circuit_breaker_registry.get(host)
+        retryable = retry_policy.is_retryable_method(request.method)
+        attempt = 0
+        while True:
+            attempt += 1
+            if not circuit_breaker_registry.allow_request(breaker):
+                logger.warning(
+                    f"Upstream circuit is open, rejecting function execution, host={host}"
+                )
+                return FunctionExecutionResult(
+                    success=False,
+                    error=f"upstream host {host} is unavailable, "
+                    f"retry after {breaker.retry_after_seconds():.0f}s",
+                )
 
-    def _send_request(self, request: httpx.Request) -> FunctionExecutionResult:
-        # TODO: one client for all requests? cache the client? concurrency control? async client?
-        # TODO: add retry
-        timeout = httpx.Timeout(10.0, read=30.0)
-        with httpx.Client(timeout=timeout) as client:
             try:
-                response = client.send(request)
+                async with bulkhead_registry.slot(bulkhead):
+                    response = await client.send(request, stream=True)
+                    try:
+                        body, truncated = await self._read_body(response)
+                    finally:
+                        await response.aclose()
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                delay = retry_policy.get_delay(attempt) if retryable else None
+                if delay is None:
+                    logger.exception(f"Failed to send function execution http request, error={e}")
+                    return FunctionExecutionResult(success=False, error=str(e))
+                await self._wait_before_retry(breaker, attempt, delay, reason=repr(e))
+                continue
+            except UpstreamConcurrencyLimitExceeded:
+                raise
             except Exception as e:
                 logger.exception(f"Failed to send function execution http request, error={e}")
                 return FunctionExecutionResult(success=False, error=str(e))
 
-            try:
-                response.raise_for_status()
-            except httpx.HTTPStatusError as e:
-                logger.exception(f"HTTP error occurred for function execution, error={e}")
-                return FunctionExecutionResult(
-                    success=False, error=self._get_error_message(response, e)
-                )
+            if response.is_server_error:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+            if retryable and response.status_code in RETRYABLE_STATUS_CODES:
+                delay = retry_policy.get_delay(attempt, response)
+                if delay is not None:
+                    await self._wait_before_retry(
+                        breaker, attempt, delay, reason=f"status_code={response.status_code}"
+                    )
+                    continue
+            break
+
+        if truncated:
+            return self._get_truncated_result(response, body)
+
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            logger.exception(f"HTTP error occurred for function execution, error={e}")
+            return FunctionExecutionResult(
+                success=False, error=self._get_error_message(response, body, e)
+            )
+
+        return FunctionExecutionResult(success=True, data=self._get_response_data(response, body))
+
+    @staticmethod
+    async def _wait_before_retry(
+        breaker: HostCircuitBreaker, attempt: int, delay: float, reason: str
+    ) -> None:
+        breaker.stats.retries += 1
+        logger.warning(
+            f"Retrying function execution http request, host={breaker.host}, "
+            f"attempt={attempt}, delay={delay:.2f}s, reason={reason}"
+        )
+        await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _read_body(response: httpx.Response) -> tuple[bytes, bool]:
+        """
+        Read the (decoded) body of a streamed response, up to UPSTREAM_RESPONSE_MAX_BYTES.
+
+        Returns:
+            the body, and whether it exceeded the max size. If it did, the rest of the body is
+            not downloaded and only the first UPSTREAM_RESPONSE_PREVIEW_BYTES are returned.
+        """
+        max_bytes = config.UPSTREAM_RESPONSE_MAX_BYTES
+        preview_bytes = config.UPSTREAM_RESPONSE_PREVIEW_BYTES
+        content_length = RestFunctionExecutor._get_content_length(response)
+        # known to be too large upfront, only download the preview
+        too_large = content_length is not None and content_length > max_bytes
+        limit = preview_bytes if too_large else max_bytes
+
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if len(body) > limit:
+                return bytes(body[:preview_bytes]), True
+        if too_large:
+            # the upstream sent less than announced
+            return bytes(body[:preview_bytes]), True
+        return bytes(body), False
+
+    @staticmethod
+    def _get_content_length(response: httpx.Response) -> int | None:
+        content_length = response.headers.get("content-length", "")
+        return int(content_length) if content_length.isdigit() else None
+
+    def _get_truncated_result(
+        self, response: httpx.Response, preview: bytes
+    ) -> FunctionExecutionResult:
+        max_bytes = config.UPSTREAM_RESPONSE_MAX_BYTES
+        logger.warning(
+            f"Function execution http response too large, aborted, url={response.request.url}, "
+            f"status_code={response.status_code}, max_bytes={max_bytes}"
+        )
+        return FunctionExecutionResult(
+            success=False,
+            error=f"upstream response body exceeds the max size of {max_bytes} bytes",
+            data=TruncatedResponseData(
+                max_bytes=max_bytes,
+                status_code=response.status_code,
+                content_type=response.headers.get("content-type"),
+                content_length=self._get_content_length(response),
+                preview=self._decode(response, preview),
+            ).model_dump(),
+        )
 
-            return FunctionExecutionResult(success=True, data=self._get_response_data(response))
+    @staticmethod
+    def _decode(response: httpx.Response, body: bytes) -> str:
+        return body.decode(response.encoding or "utf-8", errors="replace")
 
-    def _get_response_data(self, response: httpx.Response) -> Any:
-        """Get the response data from the response.
+    def _get_response_data(self, response: httpx.Response, body: bytes) -> Any:
+        """Get the response data from the response body.
         If the response is json, return the json data, otherwise fallback to the text.
         """
         try:
-            response_data = response.json() if response.content else {}
+            response_data = json.loads(body) if body else {}
         except Exception as e:
             logger.exception(f"Error parsing function execution http response, error={e}")
-            response_data = response.text
+            response_data = self._decode(response, body)
 
         return response_data
 
-    def _get_error_message(self, response: httpx.Response, error: HTTPStatusError) -> str:
+    def _get_error_message(
+        self, response: httpx.Response, body: bytes, error: HTTPStatusError
+    ) -> str:
         """Get the error message from the response or fallback to the error message from the HTTPStatusError.
         Usually the response json contains more details about the error.
         """
         try:
-            return str(response.json())
+            return str(json.loads(body))
         except Exception:
             return str(error)
@@ -0,0 +1,449 @@
+"""
+Asynchronous function executions (POST /v1/functions/{name}/execute?mode=async).
+
+Long-running functions (e.g. E2B__RUN_CODE) would otherwise pin an HTTP connection (and hit the
+load balancer idle timeout) for the whole execution. Instead, the execute route submits a job
+and returns its id right away, a pool of background workers executes it, and the caller gets the
+result with GET /v1/jobs/{id} (long-polling) and/or a completion webhook.
+
+Completion webhooks must be https urls resolving to public addresses only (the address is checked
+again right before the call, which is then made to the checked address, without following
+redirects). The body is signed with a per-project key (see get_webhook_signing_key):
+    X-ACI-Webhook-Timestamp: <unix timestamp>
+    X-ACI-Webhook-Signature: sha256=<hex HMAC-SHA256 of "<timestamp>.<body>">
+
+Jobs are queued in Redis if configured (shared by all workers, a job may run on any worker),
+in memory of the current worker otherwise. Jobs and their results expire after
+FUNCTION_JOBS_TTL_SECONDS.
+
+NOTE: a job running on a worker that dies stays "running" until it expires.
+"""
+
+import abc
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import socket
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+from typing import Any
+from uuid import UUID, uuid4
+
+import httpx
+from pydantic import BaseModel
+
+from aci.common.enums import FunctionJobStatus, ResponseProjection
+from aci.common.exceptions import FunctionJobQueueFull, FunctionJobWebhookNotAllowed
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.function import FunctionExecutionResult, FunctionJob
+from aci.server import config
+from aci.server.http_client import get_http_client
+
+logger = get_logger(__name__)
+
+_FINISHED_STATUSES = frozenset({FunctionJobStatus.SUCCEEDED, FunctionJobStatus.FAILED})
+
+
+class FunctionJobSpec(BaseModel):
+    """What a worker needs to execute the job, on behalf of the caller that submitted it."""
+
+    project_id: UUID
+    api_key_name: str | None = None
+    function_name: str
+    function_input: dict
+    linked_account_owner_id: str
+    projection: ResponseProjection | None = None
+    # requested timeout, the deadline starts when the job starts running
+    timeout_seconds: float | None = None
+    webhook_url: str | None = None
+
+
+class _StoredJob(BaseModel):
+    job: FunctionJob
+    spec: FunctionJobSpec
+
+
+def get_webhook_signing_key(project_id: UUID) -> str:
+    """The key the completion webhooks of the project are signed with (HMAC-SHA256)."""
+    return hmac.new(
+        config.FUNCTION_JOBS_WEBHOOK_SIGNING_SECRET.encode(), project_id.bytes, hashlib.sha256
+    ).hexdigest()
+
+
+async def _resolve_webhook_url(webhook_url: str) -> tuple[httpx.URL, str]:
+    """
+    Check the webhook url (https only) and resolve its host, all of its addresses must be public.
+
+    Returns:
+        the url with the host replaced by the checked address, and the original host
+
+    Raises:
+        FunctionJobWebhookNotAllowed: webhooks are not enabled, or the url is not allowed
+    """
+    if not config.FUNCTION_JOBS_WEBHOOK_SIGNING_SECRET:
+        raise FunctionJobWebhookNotAllowed("webhooks are not enabled")
+    url = httpx.URL(webhook_url)
+    if url.scheme != "https" or not url.host:
+        raise FunctionJobWebhookNotAllowed(f"webhook_url={webhook_url} is not an https url")
+    try:
+        address_infos = await asyncio.get_running_loop().getaddrinfo(
+            url.host, url.port or 443, type=socket.SOCK_STREAM
+        )
+    except socket.gaierror:
+        raise FunctionJobWebhookNotAllowed(f"host={url.host} can't be resolved") from None
+    addresses = [ipaddress.ip_address(address_info[4][0]) for address_info in address_infos]
+    for address in addresses:
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        # private, loopback, link-local (cloud metadata), reserved, ...
+        if not address.is_global:
+            raise FunctionJobWebhookNotAllowed(
+                f"host={url.host} resolves to a non public address={address}"
+            )
+    return url.copy_with(host=str(addresses[0])), url.host
+
+
+# executes the function of a job, returns a (failed) result instead of raising
+FunctionJobRunner = Callable[[UUID, FunctionJobSpec], Awaitable[FunctionExecutionResult]]
+
+
+class FunctionJobQueueBase(abc.ABC):
+    def __init__(
+        self,
+        workers: int,
+        ttl_seconds: int,
+        webhook_timeout_seconds: float,
+    ):
+        """
+        Args:
+            workers: number of jobs executed concurrently by this worker
+            ttl_seconds: how long jobs (and their results) are kept after their last update
+            webhook_timeout_seconds: timeout of the completion webhook calls
+        """
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self.webhook_timeout_seconds = webhook_timeout_seconds
+        self._runner: FunctionJobRunner | None = None
+        self._stop_event = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._running = 0
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "webhook_failures": 0}
+
+    async def start(self, runner: FunctionJobRunner) -> None:
+        """Start the workers executing the queued jobs with the given runner."""
+        if self._tasks:
+            return
+        self._runner = runner
+        self._stop_event.clear()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"{self.__class__.__name__} started, workers={self.workers}")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop taking jobs, and give the running ones some time to finish."""
+        self._stop_event.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self._tasks = []
+        logger.info(f"{self.__class__.__name__} stopped")
+
+    async def submit(self, function_name: str, spec: FunctionJobSpec) -> FunctionJob:
+        """
+        Raises:
+            FunctionJobWebhookNotAllowed: the webhook url of the spec is not allowed
+            FunctionJobQueueFull: too many jobs are waiting to be executed
+        """
+        if spec.webhook_url:
+            await _resolve_webhook_url(spec.webhook_url)
+        job = FunctionJob(
+            id=uuid4(),
+            function_name=function_name,
+            status=FunctionJobStatus.PENDING,
+            created_at=datetime.now(UTC),
+        )
+        await self._save(_StoredJob(job=job, spec=spec))
+        await self._push(job.id)
+        self._stats["submitted"] += 1
+        logger.info(f"Submitted function job, job_id={job.id}, function_name={function_name}")
+        return job
+
+    async def get(
+        self, job_id: UUID, project_id: UUID, wait_seconds: float = 0
+    ) -> FunctionJob | None:
+        """
+        Get the job, waiting up to wait_seconds for it to finish (long-polling).
+
+        Returns:
+            the job, None if it doesn't exist (or expired) or belongs to another project
+        """
+        stored = await self._load(job_id)
+        if stored is None or stored.spec.project_id != project_id:
+            return None
+        if stored.job.status not in _FINISHED_STATUSES and wait_seconds > 0:
+            await self._wait_finished(job_id, wait_seconds)
+            stored = await self._load(job_id) or stored
+        return stored.job
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"running": self._running, **self._stats}
+
+    @abc.abstractmethod
+    async def _save(self, stored: _StoredJob) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def _load(self, job_id: UUID) -> _StoredJob | None:
+        pass
+
+    @abc.abstractmethod
+    async def _push(self, job_id: UUID) -> None:
+        """
+        Raises:
+            FunctionJobQueueFull: too many jobs are waiting to be executed
+        """
+        pass
+
+    @abc.abstractmethod
+    async def _pop(self, timeout: float) -> UUID | None:
+        """Take the next job to execute, None if there is none within the timeout."""
+        pass
+
+    @abc.abstractmethod
+    async def _wait_finished(self, job_id: UUID, timeout: float) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def _on_finished(self, job_id: UUID) -> None:
+        """Called once the result of the job is saved."""
+        pass
+
+    async def _work(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                job_id = await self._pop(timeout=1.0)
+                if job_id is not None:
+                    await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # keep the worker alive
+                logger.exception("Unexpected error in function job worker")
+                await asyncio.sleep(1.0)
+
+    async def _run(self, job_id: UUID) -> None:
+        stored = await self._load(job_id)
+        if stored is None:
+            logger.warning(f"Function job expired before being executed, job_id={job_id}")
+            return
+        assert self._runner is not None
+
+        job = stored.job
+        job.status = FunctionJobStatus.RUNNING
+        job.started_at = datetime.now(UTC)
+        await self._save(stored)
+
+        self._running += 1
+        try:
+            result = await self._runner(job_id, stored.spec)
+        except Exception:
+            logger.exception(f"Failed to execute function job, job_id={job_id}")
+            # don't leak internal errors, same as the interceptor middleware for sync executions
+            result = FunctionExecutionResult(success=False, error="Internal server error")
+        finally:
+            self._running -= 1
+
+        job.status = FunctionJobStatus.SUCCEEDED if result.success else FunctionJobStatus.FAILED
+        job.finished_at = datetime.now(UTC)
+        job.result = result
+        self._stats["succeeded" if result.success else "failed"] += 1
+        await self._save(stored)
+        await self._on_finished(job_id)
+        logger.info(f"Function job finished, job_id={job_id}, status={job.status}")
+
+        if stored.spec.webhook_url:
+            await self._call_webhook(stored.spec.webhook_url, stored.spec.project_id, job)
+
+    async def _call_webhook(self, webhook_url: str, project_id: UUID, job: FunctionJob) -> None:
+        try:
+            # resolved (and checked) again, the DNS record may have changed since the submission
+            url, host = await _resolve_webhook_url(webhook_url)
+            body = job.model_dump_json(exclude_none=True).encode()
+            timestamp = str(int(time.time()))
+            signature = hmac.new(
+                get_webhook_signing_key(project_id).encode(),
+                f"{timestamp}.".encode() + body,
+                hashlib.sha256,
+            ).hexdigest()
+            response = await get_http_client().post(
+                url,
+                content=body,
+                headers={
+                    "Host": f"{host}:{url.port}" if url.port else host,
+                    "Content-Type": "application/json",
+                    "X-ACI-Webhook-Timestamp": timestamp,
+                    "X-ACI-Webhook-Signature": f"sha256={signature}",
+                },
+                # the TLS certificate is verified against the original host
+                extensions={"sni_hostname": host},
+                timeout=self.webhook_timeout_seconds,
+                follow_redirects=False,
+            )
+            # redirects are errors too
+            response.raise_for_status()
+        except Exception as e:
+            # best effort, the result can still be fetched with GET /v1/jobs/{id}
+            self._stats["webhook_failures"] += 1
+            logger.warning(
+                f"Failed to call function job webhook, job_id={job.id}, "
+                f"webhook_url={webhook_url}, error={e}"
+            )
+
+
+class InMemoryFunctionJobQueue(FunctionJobQueueBase):
+    """Keeps the jobs in memory, they are only visible to (and executed by) the current worker."""
+
+    def __init__(
+        self,
+        workers: int,
+        max_queued: int,
+        ttl_seconds: int,
+        webhook_timeout_seconds: float,
+    ):
+        super().__init__(workers, ttl_seconds, webhook_timeout_seconds)
+        self._queue: asyncio.Queue[UUID] = asyncio.Queue(maxsize=max_queued)
+        # ordered by expiry, the least recently updated job first
+        self._jobs: OrderedDict[UUID, tuple[float, _StoredJob]] = OrderedDict()
+        self._finished_events: dict[UUID, asyncio.Event] = {}
+
+    async def _save(self, stored: _StoredJob) -> None:
+        now = asyncio.get_running_loop().time()
+        self._jobs[stored.job.id] = (now + self.ttl_seconds, stored)
+        self._jobs.move_to_end(stored.job.id)
+        while self._jobs:
+            job_id, (expires_at, _) = next(iter(self._jobs.items()))
+            if expires_at > now:
+                break
+            del self._jobs[job_id]
+            self._finished_events.pop(job_id, None)
+
+    async def _load(self, job_id: UUID) -> _StoredJob | None:
+        entry = self._jobs.get(job_id)
+        if entry is None or entry[0] <= asyncio.get_running_loop().time():
+            return None
+        return entry[1]
+
+    async def _push(self, job_id: UUID) -> None:
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            self._jobs.pop(job_id, None)
+            raise FunctionJobQueueFull(f"max {self._queue.maxsize} queued jobs") from None
+
+    async def _pop(self, timeout: float) -> UUID | None:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except TimeoutError:
+            return None
+
+    async def _wait_finished(self, job_id: UUID, timeout: float) -> None:
+        event = self._finished_events.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except TimeoutError:
+            pass
+
+    async def _on_finished(self, job_id: UUID) -> None:
+        event = self._finished_events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"queued": self._queue.qsize(), "jobs": len(self._jobs), **super().get_metrics()}
+
+
+class RedisFunctionJobQueue(FunctionJobQueueBase):
+    """
+    Keeps the jobs in Redis: one key per job (with a TTL) and a list of the queued job ids,
+    shared by all workers.
+    """
+
+    def __init__(
+        self,
+        redis_client: Any,
+        key_prefix: str,
+        workers: int,
+        max_queued: int,
+        ttl_seconds: int,
+        poll_interval_seconds: float,
+        webhook_timeout_seconds: float,
+    ):
+        super().__init__(workers, ttl_seconds, webhook_timeout_seconds)
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self.queue_key = f"{key_prefix}:queue"
+        self.max_queued = max_queued
+        self.poll_interval_seconds = poll_interval_seconds
+
+    def _job_key(self, job_id: UUID) -> str:
+        return f"{self.key_prefix}:job:{job_id}"
+
+    async def _save(self, stored: _StoredJob) -> None:
+        await self.redis_client.set(
+            self._job_key(stored.job.id), stored.model_dump_json(), ex=self.ttl_seconds
+        )
+
+    async def _load(self, job_id: UUID) -> _StoredJob | None:
+        data = await self.redis_client.get(self._job_key(job_id))
+        return _StoredJob.model_validate_json(data) if data else None
+
+    async def _push(self, job_id: UUID) -> None:
+        # approximate under concurrent submits, good enough for a back-pressure limit
+        if await self.redis_client.llen(self.queue_key) >= self.max_queued:
+            await self.redis_client.delete(self._job_key(job_id))
+            raise FunctionJobQueueFull(f"max {self.max_queued} queued jobs")
+        await self.redis_client.lpush(self.queue_key, str(job_id))
+
+    async def _pop(self, timeout: float) -> UUID | None:
+        popped = await self.redis_client.brpop([self.queue_key], timeout=timeout)
+        return UUID(popped[1]) if popped else None
+
+    async def _wait_finished(self, job_id: UUID, timeout: float) -> None:
+        # the job may be executed by another worker, so poll it
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            await asyncio.sleep(min(self.poll_interval_seconds, remaining))
+            stored = await self._load(job_id)
+            if stored is None or stored.job.status in _FINISHED_STATUSES:
+                return
+
+    async def _on_finished(self, job_id: UUID) -> None:
+        # waiters poll the job, see _wait_finished
+        pass
+
+
+function_job_queue: FunctionJobQueueBase
+if config.REDIS_HOST:
+    from aci.server.redis_client import redis_client
+
+    function_job_queue = RedisFunctionJobQueue(
+        redis_client=redis_client,
+        key_prefix=config.FUNCTION_JOBS_REDIS_KEY_PREFIX,
+        workers=config.FUNCTION_JOBS_WORKERS,
+        max_queued=config.FUNCTION_JOBS_MAX_QUEUED,
+        ttl_seconds=config.FUNCTION_JOBS_TTL_SECONDS,
+        poll_interval_seconds=config.FUNCTION_JOBS_POLL_INTERVAL_SECONDS,
+        webhook_timeout_seconds=config.FUNCTION_JOBS_WEBHOOK_TIMEOUT_SECONDS,
+    )
+else:
+    function_job_queue = InMemoryFunctionJobQueue(
+        workers=config.FUNCTION_JOBS_WORKERS,
+        max_queued=config.FUNCTION_JOBS_MAX_QUEUED,
+        ttl_seconds=config.FUNCTION_JOBS_TTL_SECONDS,
+        webhook_timeout_seconds=config.FUNCTION_JOBS_WEBHOOK_TIMEOUT_SECONDS,
+    )
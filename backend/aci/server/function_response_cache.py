@@ -0,0 +1,159 @@
+"""
+Opt-in cache of function execution results, for read-only functions (search, list, lookups, ...)
+that agents tend to call repeatedly with the same input.
+
+A function opts in with hints in its protocol_data:
+    "cacheable": true, "cache_ttl": 30  (seconds, optional)
+
+Results are cached per (function name, normalized function input, linked account), only if the
+execution succeeded, in the default aiocache cache (see aci.server.caching), so it's shared by all
+workers when Redis is configured. Concurrent misses for the same key are collapsed with a lock, so
+only one of them calls the upstream API (stampede protection).
+"""
+
+import hashlib
+import json
+from collections.abc import Awaitable, Callable
+from typing import Any
+from uuid import UUID
+
+from aiocache.lock import RedLock
+
+from aci.common.db.sql_models import Function
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.function import FunctionExecutionResult
+from aci.server import config
+from aci.server.caching import get_cache
+
+logger = get_logger(__name__)
+
+
+class FunctionResponseCache:
+    def __init__(
+        self,
+        enabled: bool,
+        default_ttl_seconds: int,
+        max_ttl_seconds: int,
+        max_entry_bytes: int,
+        lock_lease_seconds: float,
+        key_prefix: str,
+    ):
+        """
+        Args:
+            enabled: if False, nothing is cached even for cacheable functions
+            default_ttl_seconds: ttl of cacheable functions without a cache_ttl hint
+            max_ttl_seconds: upper bound of the cache_ttl hint
+            max_entry_bytes: results larger than this (serialized) are not cached
+            lock_lease_seconds: max time concurrent misses wait for the first one to fill the cache
+            key_prefix: prefix of the cache keys
+        """
+        self.enabled = enabled
+        self.default_ttl_seconds = default_ttl_seconds
+        self.max_ttl_seconds = max_ttl_seconds
+        self.max_entry_bytes = max_entry_bytes
+        self.lock_lease_seconds = lock_lease_seconds
+        self.key_prefix = key_prefix
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "too_large": 0, "errors": 0}
+
+    def get_ttl(self, function: Function) -> int | None:
+        """
+        Returns:
+            the cache ttl of the function in seconds, None if its results must not be cached
+        """
+        if not self.enabled:
+            return None
+        protocol_data = function.protocol_data or {}
+        if not protocol_data.get("cacheable"):
+            return None
+        ttl = protocol_data.get("cache_ttl") or self.default_ttl_seconds
+        return max(0, min(int(ttl), self.max_ttl_seconds)) or None
+
+    def build_key(self, function_name: str, function_input: dict, linked_account_id: UUID) -> str:
+        # key order and whitespace of the input don't change the result
+        normalized_input = json.dumps(
+            function_input, sort_keys=True, separators=(",", ":"), default=str
+        )
+        input_hash = hashlib.sha256(normalized_input.encode()).hexdigest()
+        return f"{self.key_prefix}:{function_name}:{linked_account_id}:{input_hash}"
+
+    async def get_or_execute(
+        self,
+        key: str,
+        ttl: int,
+        execute: Callable[[], Awaitable[FunctionExecutionResult]],
+    ) -> tuple[FunctionExecutionResult, bool]:
+        """
+        Get the cached result, or execute the function and cache its result if it succeeded.
+        A cache failure never fails the execution, the function is executed instead.
+
+        Returns:
+            the result, and whether it came from the cache
+        """
+        cache = get_cache()
+        result = await self._get(cache, key)
+        if result is not None:
+            return result, True
+
+        try:
+            lock = RedLock(cache, key, lease=self.lock_lease_seconds)
+            await lock.__aenter__()
+        except Exception:
+            self._stats["errors"] += 1
+            logger.exception(f"Failed to lock function response cache key, key={key}")
+            return await execute(), False
+
+        try:
+            # filled by a concurrent execution while waiting for the lock
+            result = await self._get(cache, key)
+            if result is not None:
+                return result, True
+
+            self._stats["misses"] += 1
+            result = await execute()
+            if result.success:
+                await self._set(cache, key, result, ttl)
+            return result, False
+        finally:
+            try:
+                await lock.__aexit__(None, None, None)
+            except Exception:
+                logger.exception(f"Failed to release function response cache lock, key={key}")
+
+    def get_metrics(self) -> dict[str, Any]:
+        return dict(self._stats)
+
+    async def _get(self, cache: Any, key: str) -> FunctionExecutionResult | None:
+        try:
+            cached = await cache.get(key)
+        except Exception:
+            self._stats["errors"] += 1
+            logger.exception(f"Failed to get function response from cache, key={key}")
+            return None
+        if cached is None:
+            return None
+        self._stats["hits"] += 1
+        return FunctionExecutionResult.model_validate(cached)
+
+    async def _set(self, cache: Any, key: str, result: FunctionExecutionResult, ttl: int) -> None:
+        to_cache = result.model_dump(mode="json")
+        size = len(json.dumps(to_cache))
+        if size > self.max_entry_bytes:
+            self._stats["too_large"] += 1
+            logger.debug(f"Function response too large to cache, key={key}, size={size}")
+            return
+        try:
+            await cache.set(key, to_cache, ttl=ttl)
+            self._stats["stored"] += 1
+        except Exception:
+            self._stats["errors"] += 1
+            logger.exception(f"Failed to set function response in cache, key={key}")
+
+
+function_response_cache = FunctionResponseCache(
+    enabled=config.FUNCTION_RESPONSE_CACHE_ENABLED,
+    default_ttl_seconds=config.FUNCTION_RESPONSE_CACHE_DEFAULT_TTL_SECONDS,
+    max_ttl_seconds=config.FUNCTION_RESPONSE_CACHE_MAX_TTL_SECONDS,
+    max_entry_bytes=config.FUNCTION_RESPONSE_CACHE_MAX_ENTRY_BYTES,
+    lock_lease_seconds=config.FUNCTION_RESPONSE_CACHE_LOCK_LEASE_SECONDS,
+    key_prefix=config.FUNCTION_RESPONSE_CACHE_KEY_PREFIX,
+)
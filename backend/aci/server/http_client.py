@@ -0,0 +1,70 @@
+"""
+Process-wide async HTTP client for outbound function execution requests.
+
+A single httpx.AsyncClient is shared by all REST function executors in the worker so that
+connections (and TLS sessions) to upstream APIs are kept alive and reused across executions,
+instead of paying a new handshake on every call.
+"""
+
+import importlib.util
+
+import httpx
+
+from aci.common.logging_setup import get_logger
+from aci.server import config
+
+logger = get_logger(__name__)
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def _is_http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    http2 = config.HTTP_CLIENT_HTTP2
+    if http2 and not _is_http2_available():
+        # httpx needs the optional "h2" package (httpx[http2]) for HTTP/2 support
+        logger.warning("HTTP/2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=config.HTTP_CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    timeout = httpx.Timeout(
+        connect=config.HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS,
+        read=config.HTTP_CLIENT_READ_TIMEOUT_SECONDS,
+        write=config.HTTP_CLIENT_WRITE_TIMEOUT_SECONDS,
+        pool=config.HTTP_CLIENT_POOL_TIMEOUT_SECONDS,
+    )
+    logger.info(
+        f"Creating shared http client, max_connections={limits.max_connections}, "
+        f"max_keepalive_connections={limits.max_keepalive_connections}, "
+        f"keepalive_expiry={limits.keepalive_expiry}, http2={http2}"
+    )
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared async http client, creating it on first use.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """
+    Close the shared async http client and release all pooled connections.
+    Called from the server lifespan shutdown hook.
+    """
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+        logger.info("Closed shared http client")
+    _http_client = None
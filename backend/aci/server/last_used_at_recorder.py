@@ -0,0 +1,230 @@
+"""
+Write-behind recorder for the last_used_at timestamps of linked accounts and MCP servers.
+
+Updating last_used_at on every execution is an extra UPDATE + COMMIT on a handful of hot rows.
+Instead, executions only record the timestamp here, and the latest timestamp per linked account
+and MCP server is flushed periodically (and on shutdown) with one bulk UPDATE per table.
+"""
+
+import abc
+import asyncio
+from datetime import UTC, datetime
+from typing import Any
+from uuid import UUID
+
+from aci.common.db import crud
+from aci.common.logging_setup import get_logger
+from aci.common.utils import create_db_async_session
+from aci.server import config
+
+logger = get_logger(__name__)
+
+
+def _keep_latest(pending: dict, key: UUID | str, used_at: datetime) -> None:
+    current = pending.get(key)
+    if current is None or current < used_at:
+        pending[key] = used_at
+
+
+class LastUsedAtRecorderBase(abc.ABC):
+    def __init__(self, flush_every_seconds: float):
+        self.flush_every_seconds = flush_every_seconds
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        """Start flushing recorded timestamps in the background."""
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"{self.__class__.__name__} started, flush_every_seconds={self.flush_every_seconds}"
+        )
+
+    async def stop(self) -> None:
+        """Stop the background flush and flush whatever is still pending."""
+        self._stop_event.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.flush()
+        logger.info(f"{self.__class__.__name__} stopped")
+
+    @abc.abstractmethod
+    async def record_linked_account_used(self, linked_account_id: UUID, used_at: datetime) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def record_mcp_server_used(self, mcp_server_id: str, used_at: datetime) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def _take_pending(self) -> tuple[dict[UUID, datetime], dict[str, datetime]]:
+        """Remove and return the pending timestamps of linked accounts and MCP servers."""
+        pass
+
+    @abc.abstractmethod
+    async def _restore_pending(
+        self,
+        linked_accounts: dict[UUID, datetime],
+        mcp_servers: dict[str, datetime],
+    ) -> None:
+        """Put back timestamps that failed to flush, so they are retried by the next flush."""
+        pass
+
+    async def flush(self) -> None:
+        try:
+            linked_accounts, mcp_servers = await self._take_pending()
+        except Exception:
+            logger.exception("Failed to take pending last_used_at")
+            return
+        if not linked_accounts and not mcp_servers:
+            return
+
+        db_session = create_db_async_session(config.DB_FULL_URL)
+        try:
+            await crud.linked_accounts.bulk_update_linked_accounts_last_used_at(
+                db_session, linked_accounts
+            )
+            await crud.mcp_servers.bulk_update_mcp_servers_last_used_at(db_session, mcp_servers)
+            await db_session.commit()
+            logger.debug(
+                f"Flushed last_used_at, linked_accounts={len(linked_accounts)}, "
+                f"mcp_servers={len(mcp_servers)}"
+            )
+        except Exception:
+            logger.exception(
+                f"Failed to flush last_used_at, linked_accounts={len(linked_accounts)}, "
+                f"mcp_servers={len(mcp_servers)}"
+            )
+            await self._restore_pending(linked_accounts, mcp_servers)
+        finally:
+            await db_session.close()
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.flush_every_seconds)
+            except TimeoutError:
+                pass
+            if self._stop_event.is_set():
+                # the final flush is done by stop()
+                break
+            try:
+                await self.flush()
+            except Exception:
+                # keep the flusher alive
+                logger.exception("Unexpected error flushing last_used_at")
+
+
+class InMemoryLastUsedAtRecorder(LastUsedAtRecorderBase):
+    """Keeps the pending timestamps in memory of the current worker."""
+
+    def __init__(self, flush_every_seconds: float):
+        super().__init__(flush_every_seconds)
+        self._linked_accounts: dict[UUID, datetime] = {}
+        self._mcp_servers: dict[str, datetime] = {}
+
+    async def record_linked_account_used(self, linked_account_id: UUID, used_at: datetime) -> None:
+        _keep_latest(self._linked_accounts, linked_account_id, used_at)
+
+    async def record_mcp_server_used(self, mcp_server_id: str, used_at: datetime) -> None:
+        _keep_latest(self._mcp_servers, mcp_server_id, used_at)
+
+    async def _take_pending(self) -> tuple[dict[UUID, datetime], dict[str, datetime]]:
+        linked_accounts, self._linked_accounts = self._linked_accounts, {}
+        mcp_servers, self._mcp_servers = self._mcp_servers, {}
+        return linked_accounts, mcp_servers
+
+    async def _restore_pending(
+        self,
+        linked_accounts: dict[UUID, datetime],
+        mcp_servers: dict[str, datetime],
+    ) -> None:
+        for linked_account_id, used_at in linked_accounts.items():
+            _keep_latest(self._linked_accounts, linked_account_id, used_at)
+        for mcp_server_id, used_at in mcp_servers.items():
+            _keep_latest(self._mcp_servers, mcp_server_id, used_at)
+
+
+class RedisLastUsedAtRecorder(LastUsedAtRecorderBase):
+    """
+    Keeps the pending timestamps in Redis sorted sets (member = id, score = timestamp), shared by
+    all workers, so they are coalesced across workers and survive a worker restart.
+    """
+
+    def __init__(self, redis_client: Any, key_prefix: str, flush_every_seconds: float):
+        super().__init__(flush_every_seconds)
+        self.redis_client = redis_client
+        self.linked_accounts_key = f"{key_prefix}:linked_accounts"
+        self.mcp_servers_key = f"{key_prefix}:mcp_servers"
+
+    async def record_linked_account_used(self, linked_account_id: UUID, used_at: datetime) -> None:
+        await self._record(self.linked_accounts_key, {str(linked_account_id): used_at.timestamp()})
+
+    async def record_mcp_server_used(self, mcp_server_id: str, used_at: datetime) -> None:
+        await self._record(self.mcp_servers_key, {mcp_server_id: used_at.timestamp()})
+
+    async def _record(self, key: str, timestamps: dict[str, float]) -> None:
+        try:
+            # GT: only move timestamps forward
+            await self.redis_client.zadd(key, timestamps, gt=True)
+        except Exception:
+            # last_used_at is best effort, never fail the execution because of it
+            logger.exception(f"Failed to record last_used_at in Redis, key={key}")
+
+    async def _take_pending(self) -> tuple[dict[UUID, datetime], dict[str, datetime]]:
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.zrange(self.linked_accounts_key, 0, -1, withscores=True)
+            pipe.zrange(self.mcp_servers_key, 0, -1, withscores=True)
+            pipe.delete(self.linked_accounts_key, self.mcp_servers_key)
+            linked_accounts, mcp_servers, _ = await pipe.execute()
+
+        return (
+            {
+                UUID(linked_account_id): datetime.fromtimestamp(score, UTC)
+                for linked_account_id, score in linked_accounts
+            },
+            {
+                mcp_server_id: datetime.fromtimestamp(score, UTC)
+                for mcp_server_id, score in mcp_servers
+            },
+        )
+
+    async def _restore_pending(
+        self,
+        linked_accounts: dict[UUID, datetime],
+        mcp_servers: dict[str, datetime],
+    ) -> None:
+        if linked_accounts:
+            await self._record(
+                self.linked_accounts_key,
+                {
+                    str(linked_account_id): used_at.timestamp()
+                    for linked_account_id, used_at in linked_accounts.items()
+                },
+            )
+        if mcp_servers:
+            await self._record(
+                self.mcp_servers_key,
+                {
+                    mcp_server_id: used_at.timestamp()
+                    for mcp_server_id, used_at in mcp_servers.items()
+                },
+            )
+
+
+last_used_at_recorder: LastUsedAtRecorderBase
+if config.LAST_USED_AT_RECORDER_BACKEND == "redis" and config.REDIS_HOST:
+    from aci.server.redis_client import redis_client
+
+    last_used_at_recorder = RedisLastUsedAtRecorder(
+        redis_client=redis_client,
+        key_prefix=config.LAST_USED_AT_RECORDER_REDIS_KEY_PREFIX,
+        flush_every_seconds=config.LAST_USED_AT_FLUSH_EVERY_SECONDS,
+    )
+else:
+    last_used_at_recorder = InMemoryLastUsedAtRecorder(
+        flush_every_seconds=config.LAST_USED_AT_FLUSH_EVERY_SECONDS,
+    )
@@ -15,12 +15,22 @@ from aci.common.exceptions import ACIException
 from aci.common.logging_setup import setup_logging
 from aci.server import config
 from aci.server.acl import get_propelauth
+from aci.server.api_key_cache import api_key_cache
 from aci.server.caching import configure_cache_from_env
+from aci.server.connector_execution_engine import connector_execution_engine
+from aci.server.connector_registry import connector_registry
 from aci.server.dependency_check import check_dependencies
+from aci.server.e2b_sandbox_pool import e2b_sandbox_pool
 from aci.server.execution_logs.execution_log_appender import log_appender
+from aci.server.function_jobs import function_job_queue
+from aci.server.http_client import close_http_client
+from aci.server.last_used_at_recorder import last_used_at_recorder
 from aci.server.log_schema_filter import LogSchemaFilter
 from aci.server.middleware.interceptor import InterceptorMiddleware, RequestContextFilter
 from aci.server.middleware.ratelimit import RateLimitMiddleware
+from aci.server.oauth2_client_pool import oauth2_client_pool
+from aci.server.oauth2_token_refresher import oauth2_token_refresher
+from aci.server.quota_service import quota_counter
 from aci.server.routes import (
     analytics,
     api_keys,
@@ -32,6 +42,7 @@ from aci.server.routes import (
     execution_logs,
     functions,
     health,
+    jobs,
     linked_accounts,
     mcp_servers,
     organizations,
@@ -54,7 +65,7 @@ setup_logging(
     # ),
     filters=[RequestContextFilter(), LogSchemaFilter()],
     environment=config.ENVIRONMENT,
-    level=getattr(logging, config.LOGGING_LEVEL)
+    level=getattr(logging, config.LOGGING_LEVEL),
 )
 
 stripe.api_key = config.STRIPE_SECRET_KEY
@@ -68,9 +79,26 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 async def lifespan(app: FastAPI):
     # Startup
     await log_appender.start()
+    await api_key_cache.start()
+    await last_used_at_recorder.start()
+    await quota_counter.start()
+    await oauth2_token_refresher.start()
+    await function_job_queue.start(functions.run_function_job)
+    await connector_registry.start()
+    await e2b_sandbox_pool.start()
     yield
     # Shutdown
+    # stopped first, finishing jobs still log executions and use the http client
+    await function_job_queue.stop()
+    await e2b_sandbox_pool.stop()
+    await oauth2_token_refresher.stop()
+    await last_used_at_recorder.stop()
+    await quota_counter.stop()
     await log_appender.stop()
+    await api_key_cache.stop()
+    await close_http_client()
+    await oauth2_client_pool.close()
+    connector_execution_engine.shutdown()
 
 
 # TODO: move to config
@@ -208,6 +236,12 @@ app.include_router(
     tags=[config.ROUTER_PREFIX_EXECUTION_LOGS.split("/")[-1]],
 )
 
+app.include_router(
+    jobs.router,
+    prefix=config.ROUTER_PREFIX_JOBS,
+    tags=[config.ROUTER_PREFIX_JOBS.split("/")[-1]],
+)
+
 # No auth required for webhooks, as they are called by external services
 app.include_router(
     webhooks.router,
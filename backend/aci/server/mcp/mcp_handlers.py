@@ -21,17 +21,20 @@ from aci.common.db import crud
 from aci.common.db.sql_models import Function, MCPServer
 from aci.common.enums import ExecutionStatus, MCPAuthType
 from aci.common.exceptions import FunctionNotFound, AppConfigurationNotFound, AppConfigurationDisabled, \
-    LinkedAccountNotFound, LinkedAccountDisabled
+    LinkedAccountNotFound, LinkedAccountDisabled, FunctionExecutionTimeout
 from aci.common.logging_setup import get_logger
 from aci.common.schemas.function import FunctionExecutionResult
 from aci.server import config
-from aci.server import security_credentials_manager as scm
 from aci.server.context import request_id_ctx_var
 from aci.server.dependencies import APIKeyContext
+from aci.server.execution_context_resolver import execution_context_resolver
+from aci.server.execution_deadline import apply_function_timeout, execution_deadline
 from aci.server.execution_logs.execution_log_appender import log_appender
-from aci.server.function_executors import get_executor
+from aci.server.fair_share_scheduler import fair_share_scheduler
+from aci.server.function_execution import execute_with_credentials
+from aci.server.last_used_at_recorder import last_used_at_recorder
 from aci.server.quota_service import consume_monthly_quota
-from aci.server.security_credentials_manager import SecurityCredentialsResponse
+from aci.server.response_projection import response_projector
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -65,6 +68,8 @@ class MCPAppServer:
         self.server: Server | None = None
         self.tools: List[types.Tool] = []
         self.project_id = project_id
+        # organization of the project, for the fair share admission
+        self.org_id: UUID | None = None
         self.session_manager = None
         self._session_manager_started = False
 
@@ -84,6 +89,8 @@ class MCPAppServer:
 
         app_configuration = await mcp_server.awaitable_attrs.app_configuration
         self.project_id = app_configuration.project_id
+        project = await crud.projects.get_project(db_session, app_configuration.project_id)
+        self.org_id = project.org_id if project else None
         self.app_name = app_configuration.app.name
         self.app_id = app_configuration.app.id
 
@@ -129,24 +136,54 @@ class MCPAppServer:
             logger.info(f"Calling tool {name} with arguments: {arguments}")
 
             context = mcp_request_ctx_var.get()
+            project_id = self.project_id
+            app_name = self.app_name
+            if context is None or project_id is None or app_name is None:
+                # all set before any tool call, by handle_mcp_request and initialize
+                raise RuntimeError("MCP tool called without a request context or project")
             start = time.perf_counter()
             created_at = datetime.now(UTC)
 
-            await consume_monthly_quota(context.db_session, self.project_id, 1)
+            await consume_monthly_quota(context.db_session, project_id, 1)
 
             found_tool = next(
                 (tool for tool in self.tools if tool.name == name), None
             )
 
-            function, result = await execute_function(
-                db_session=context.db_session,
-                function_name=name,
-                function_input=arguments,
-                app_config_id=self.app_config_id,
-                mcp_server_id=self.mcp_server_id,
-                linked_account_owner_id=context.linked_account_owner_id or "default",
-                project_id=found_tool.meta.get("project_id", None) if found_tool else None,
-            )
+            # don't hold a database connection while waiting to be admitted
+            await context.db_session.commit()
+            # MCP tool calls have no way to request a timeout, see aci.server.execution_deadline
+            try:
+                async with (
+                    execution_deadline(None),
+                    fair_share_scheduler.admit(project_id, self.org_id),
+                ):
+                    function, result, cached = await execute_function(
+                        db_session=context.db_session,
+                        function_name=name,
+                        function_input=arguments,
+                        app_config_id=self.app_config_id,
+                        mcp_server_id=self.mcp_server_id,
+                        linked_account_owner_id=context.linked_account_owner_id or "default",
+                        project_id=found_tool.meta.get("project_id", None) if found_tool else None,
+                    )
+            except FunctionExecutionTimeout as e:
+                # the quota is consumed and the upstream may have been called, log it like a failure
+                await log_appender.enqueue(
+                    function_name=name,
+                    app_name=app_name,
+                    project_id=project_id,
+                    status=ExecutionStatus.FAILED,
+                    execution_time=int((time.perf_counter() - start) * 1000),
+                    linked_account_owner_id=context.linked_account_owner_id,
+                    app_configuration_id=str(self.app_config_id),
+                    api_key_name=context.api_key_name,
+                    request=arguments,
+                    response=f"{e.title}, {e.message}",
+                    created_at=created_at,
+                    execution_id=context.execution_id,
+                )
+                raise
 
             end = time.perf_counter()
             execution_time = int((end - start) * 1000)
@@ -154,8 +191,8 @@ class MCPAppServer:
 
             await log_appender.enqueue(
                 function_name=name,
-                app_name=self.app_name,
-                project_id=self.project_id,
+                app_name=app_name,
+                project_id=project_id,
                 status=ExecutionStatus.SUCCESS if result.success else ExecutionStatus.FAILED,
                 execution_time=execution_time,
                 linked_account_owner_id=context.linked_account_owner_id,
@@ -165,6 +202,7 @@ class MCPAppServer:
                 response=result.data if result.success else result.error,
                 created_at=created_at,
                 execution_id=execution_id,
+                cached=cached,
             )
 
             # Format the result for MCP
@@ -228,23 +266,26 @@ async def execute_function(
         mcp_server_id: str,
         linked_account_owner_id: str,
         project_id: str | None = None,
-) -> tuple[Function, FunctionExecutionResult]:
-    # Get the function
-    function = await crud.functions.get_function(
+) -> tuple[Function, FunctionExecutionResult, bool]:
+    # Get the function, app configuration and linked account in one go
+    execution_context = await execution_context_resolver.resolve_for_app_configuration(
         db_session,
+        app_config_id,
         function_name,
-        False,
-        True,
-        UUID(project_id) if project_id else None,
+        linked_account_owner_id,
+        project_id=UUID(project_id) if project_id else None,
     )
-    if not function:
+    if not execution_context:
         logger.error(
             f"Failed to execute function, function not found, function_name={function_name}"
         )
         raise FunctionNotFound(f"function={function_name} not found")
+    function = execution_context.function
+    app_configuration = execution_context.app_configuration
+    linked_account = execution_context.linked_account
+    apply_function_timeout(function)
 
     # Check if the App (that this function belongs to) is configured
-    app_configuration = await crud.app_configurations.get_app_configuration_by_id(db_session, app_config_id)
     if not app_configuration:
         logger.error(
             f"Failed to execute function, app configuration not found, "
@@ -264,12 +305,6 @@ async def execute_function(
         )
 
     # Check if the linked account status (configured, enabled, etc.)
-    linked_account = await crud.linked_accounts.get_linked_account(
-        db_session,
-        app_configuration.project_id,
-        function.app.name,
-        linked_account_owner_id,
-    )
     if not linked_account:
         logger.error(
             f"Failed to execute function, linked account not found, "
@@ -290,48 +325,22 @@ async def execute_function(
             f"please enable the account for this app here: {config.DEV_PORTAL_URL}/appconfigs/{function.app.name}"
         )
 
-    security_credentials_response: SecurityCredentialsResponse = await scm.get_security_credentials(
-        app_configuration.app, app_configuration, linked_account
-    )
-
-    await scm.update_security_credentials(
-        db_session, function.app, linked_account, security_credentials_response
-    )
-
-    logger.info(
-        f"Fetched security credentials for function execution, function_name={function_name}, "
-        f"app_name={function.app.name}, linked_account_owner_id={linked_account_owner_id}, "
-        f"linked_account_id={linked_account.id}, is_updated={security_credentials_response.is_updated}, "
-        f"is_app_default_credentials={security_credentials_response.is_app_default_credentials}"
-    )
+    # Nothing below needs the database unless the credentials get refreshed, so end the (read-only)
+    # transaction here and give the connection back to the pool, instead of holding it while waiting
+    # on the token refresh and the upstream call.
+    # NOTE: db_session must not expire objects on commit (expire_on_commit=False)
     await db_session.commit()
 
-    function_executor = get_executor(function.protocol, linked_account)
-    logger.info(
-        f"Instantiated function executor, function_executor={type(function_executor)}, "
-        f"function={function_name}"
+    execution_result, cached = await execute_with_credentials(
+        db_session, function, function_input, app_configuration, linked_account
     )
 
-    # Execute the function
-    execution_result = function_executor.execute(
-        function,
-        function_input,
-        security_credentials_response.scheme,
-        security_credentials_response.credentials,
-    )
+    # MCP tool calls have no way to request a projection, the server default is used
+    execution_result = response_projector.project(function, execution_result)
 
     last_used_at: datetime = datetime.now(UTC)
-    await crud.linked_accounts.update_linked_account_last_used_at(
-        db_session,
-        last_used_at,
-        linked_account,
-    )
-    await crud.mcp_servers.update_mcp_server_last_used_at(
-        db_session,
-        mcp_server_id,
-        last_used_at,
-    )
-    await db_session.commit()
+    await last_used_at_recorder.record_linked_account_used(linked_account.id, last_used_at)
+    await last_used_at_recorder.record_mcp_server_used(mcp_server_id, last_used_at)
 
     if not execution_result.success:
         logger.error(
@@ -339,7 +348,7 @@ async def execute_function(
             f"error={execution_result.error}"
         )
 
-    return function, execution_result
+    return function, execution_result, cached
 
 
 @dataclass
@@ -2,9 +2,10 @@ import logging
 import uuid
 from datetime import UTC, datetime
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from aci.common.logging_setup import get_logger
 from aci.server import config
@@ -18,19 +19,31 @@ from aci.server.context import (
 logger = get_logger(__name__)
 
 
-class InterceptorMiddleware(BaseHTTPMiddleware):
+class InterceptorMiddleware:
     """
     Middleware for logging structured analytics data for every request/response.
     It generates a unique request ID and logs some baseline details.
     It also extracts and sets request context from the API key.
+
+    NOTE: pure ASGI middleware (not BaseHTTPMiddleware), the request runs in the same task as the
+    middleware (so the context vars set here are visible to the endpoint) and the response is
+    streamed through without being wrapped.
     """
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         start_time = datetime.now(UTC)
         request_id = str(uuid.uuid4())
         request_id_ctx_var.set(request_id)
         # TODO: Get request context from bearer token(propelauth)
 
+        request = Request(scope)
         # Get request context from x-api-key header
         api_key = request.headers.get(config.ACI_API_KEY_HEADER)
         project_id = request.headers.get(config.ACI_PROJECT_ID_HEADER)
@@ -46,10 +59,11 @@ class InterceptorMiddleware(BaseHTTPMiddleware):
 
         # Skip logging for health check endpoints
         is_health_check = request.url.path == config.ROUTER_PREFIX_HEALTH
+        should_log = not is_health_check or config.ENVIRONMENT != "local"
 
-        if not is_health_check or config.ENVIRONMENT != "local":
+        if should_log:
             request_log_data = {
-                "http_version": request.scope.get("http_version", "unknown"),
+                "http_version": scope.get("http_version", "unknown"),
                 "http_method": request.method,
                 "http_path": request.url.path,
                 "url": str(request.url),
@@ -61,38 +75,55 @@ class InterceptorMiddleware(BaseHTTPMiddleware):
                 "user_agent": request.headers.get("User-Agent", "unknown"),
                 "x_forwarded_proto": request.headers.get("X-Forwarded-Proto", "unknown"),
             }
-            request_body = await self._get_request_body(request)
-            if request_body:
-                request_log_data["request_body"] = request_body
+            if request.method == "POST":
+                # the body is read for the log, then replayed to the app
+                messages = await self._read_body_messages(receive)
+                receive = self._replay(messages, receive)
+                request_body = self._get_request_body(
+                    b"".join(message.get("body", b"") for message in messages)
+                )
+                if request_body:
+                    request_log_data["request_body"] = request_body
             logger.info("Received request", extra=request_log_data)
 
+        response_start: Message | None = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_start
+            if message["type"] == "http.response.start":
+                response_start = message
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
             logger.exception(
                 f"Error processing request, error={e}",
                 extra={"duration": (datetime.now(UTC) - start_time).total_seconds()},
             )
-            return JSONResponse(
+            if response_start is not None:
+                # too late for an error response, the response is already being sent
+                raise
+            response = JSONResponse(
                 status_code=500,
                 content={"error": "Internal server error"},
             )
+            await response(scope, receive, send)
+            return
 
-        if not is_health_check or config.ENVIRONMENT != "local":
+        if should_log and response_start is not None:
+            response_headers = MutableHeaders(scope=response_start)
             response_log_data = {
                 "http_method": request.method,
                 "http_path": request.url.path,
                 "url": str(request.url),
-                "status_code": response.status_code,
+                "status_code": response_start["status"],
                 "duration": (datetime.now(UTC) - start_time).total_seconds(),
-                "content_length": response.headers.get("content-length"),  # type is str
+                "content_length": response_headers.get("content-length"),  # type is str
             }
             logger.info("Response sent", extra=response_log_data)
 
-        response.headers["X-Request-ID"] = request_id
-
-        return response
-
     def _get_client_ip(self, request: Request) -> str:
         """
         Get the actual client IP if the server is running behind a proxy.
@@ -106,12 +137,30 @@ class InterceptorMiddleware(BaseHTTPMiddleware):
         else:
             return request.client.host if request.client else "unknown"
 
+    @staticmethod
+    async def _read_body_messages(receive: Receive) -> list[Message]:
+        messages = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request" or not message.get("more_body", False):
+                return messages
+
+    @staticmethod
+    def _replay(messages: list[Message], receive: Receive) -> Receive:
+        """Receive the buffered messages first, then the next ones (e.g. http.disconnect)."""
+        pending = list(messages)
+
+        async def replay_receive() -> Message:
+            if pending:
+                return pending.pop(0)
+            return await receive()
+
+        return replay_receive
+
     # TODO: move to a separate file and refactor in more elegant/reliable way
-    async def _get_request_body(self, request: Request) -> str | None:
-        if request.method != "POST":
-            return None
+    def _get_request_body(self, request_body_bytes: bytes) -> str | None:
         try:
-            request_body_bytes = await request.body()
             # TODO: reconsider size limit
             if len(request_body_bytes) > config.MAX_LOG_FIELD_SIZE:
                 return (
@@ -1,77 +1,70 @@
 import json
+import math
 
 from fastapi import status
-from limits import RateLimitItem, RateLimitItemPerDay, RateLimitItemPerSecond
-from limits.aio.storage import MemoryStorage, RedisStorage, Storage
-from limits.aio.strategies import MovingWindowRateLimiter
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
 from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from aci.common.logging_setup import get_logger
-from aci.server.config import (
-    RATE_LIMIT_IP_PER_DAY,
-    RATE_LIMIT_IP_PER_SECOND,
-    REDIS_HOST,
-    REDIS_PORT,
-    REDIS_DB,
-    REDIS_PASSWORD,
-)
+from aci.server.config import RATE_LIMIT_IP_PER_DAY, RATE_LIMIT_IP_PER_SECOND
+from aci.server.rate_limiter import RateLimit, rate_limiter
 
 logger = get_logger(__name__)
 
 
-# TODO: replace with redis storage
-class RateLimitMiddleware(BaseHTTPMiddleware):
+class RateLimitMiddleware:
+    """
+    IP based rate limiting. Pure ASGI middleware (not BaseHTTPMiddleware), the rate limit headers
+    are added to the response start message, the response itself is streamed through untouched.
+
+    All the limits (and the stats of the headers) are checked with a single call to the rate
+    limiter, see aci.server.rate_limiter. API key and project limits are checked where the API key
+    is verified (get_api_key_context).
+    """
+
     def __init__(self, app: ASGIApp) -> None:
-        super().__init__(app)
-        self.storage = self._get_storage()
-        self.limiter = MovingWindowRateLimiter(self.storage)
-        self.rate_limits: dict[str, RateLimitItem] = {
-            "ip-per-second": RateLimitItemPerSecond(amount=RATE_LIMIT_IP_PER_SECOND),
-            "ip-per-day": RateLimitItemPerDay(amount=RATE_LIMIT_IP_PER_DAY),
-        }
+        self.app = app
+        self.rate_limits: list[RateLimit] = [
+            RateLimit(name="ip-per-second", amount=RATE_LIMIT_IP_PER_SECOND, window_seconds=1),
+            RateLimit(name="ip-per-day", amount=RATE_LIMIT_IP_PER_DAY, window_seconds=86400),
+        ]
 
-    @staticmethod
-    def _get_storage() -> Storage:
-        if REDIS_HOST:
-            logger.info(f"Using RedisStorage for rate limiting, host={REDIS_HOST}")
-            uri = f"async+redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}" \
-                if REDIS_PASSWORD \
-                else f"async+redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
-            return RedisStorage(uri, implementation="redispy")
-        else:
-            logger.info("Using MemoryStorage for rate limiting")
-            return MemoryStorage()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        # Determine the rate limit key based on authentication method
+        request = Request(scope)
         rate_limit_key = self._get_rate_limit_key(request)
-        for rate_limit_name, rate_limit in self.rate_limits.items():
-            if not await self.limiter.hit(rate_limit, rate_limit_key):
-                # NOTE: raising a custom ACIException here doesn't work as expected
-                logger.warning(
-                    f"Rate limit exceeded, "
-                    f"rate_limit_name={rate_limit_name}, "
-                    f"rate_limit_key={rate_limit_key}"
-                )
-                return Response(
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                    content=json.dumps({"error": f"Rate limit exceeded: {rate_limit_name}"}),
-                    headers=await self._get_rate_limit_headers(rate_limit_key),
-                )
+        result = await rate_limiter.hit(
+            [(rate_limit_key, rate_limit) for rate_limit in self.rate_limits]
+        )
+        headers = result.headers()
+        if not result.allowed:
+            # NOTE: raising a custom ACIException here doesn't work as expected
+            logger.warning(
+                f"Rate limit exceeded, "
+                f"rate_limit_name={result.exceeded}, "
+                f"rate_limit_key={rate_limit_key}"
+            )
+            headers["Retry-After"] = str(math.ceil(result.retry_after))
+            response = Response(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content=json.dumps({"error": f"Rate limit exceeded: {result.exceeded}"}),
+                headers=headers,
+            )
+            await response(scope, receive, send)
+            return
 
-        response = await call_next(request)
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
 
-        # Add rate limit headers for all limits
-        headers = await self._get_rate_limit_headers(rate_limit_key)
-        response.headers.update(headers)
+        await self.app(scope, receive, send_wrapper)
 
-        return response
-
-    # TODO: only do ip based rate limiting in middleware
-    # consider api key based rate limiting in dependencies where api key is validated
     def _get_rate_limit_key(self, request: Request) -> str:
         # Note: client.host will be set correctly (if running behind proxy like ALB) because of ProxyHeadersMiddleware.
         if request.client and request.client.host:
@@ -79,13 +72,3 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         else:
             logger.error("Failed to generate rate limit key, request.client.host not set")
             return "ip:127.0.0.1"
-
-    async def _get_rate_limit_headers(self, key: str) -> dict:
-        headers = {}
-        for rate_limit_name, rate_limit in self.rate_limits.items():
-            window_stats = await self.limiter.get_window_stats(rate_limit, key)
-
-            headers[f"X-RateLimit-Limit-{rate_limit_name}"] = str(rate_limit.amount)
-            headers[f"X-RateLimit-Remaining-{rate_limit_name}"] = str(window_stats.remaining)
-            headers[f"X-RateLimit-Reset-{rate_limit_name}"] = str(window_stats.reset_time)
-        return headers
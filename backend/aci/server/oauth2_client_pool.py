@@ -0,0 +1,140 @@
+"""
+Pool of OAuth2 clients used for the token endpoint calls (code exchange and token refresh).
+
+Each AsyncOAuth2Client owns an httpx connection pool, so one client is kept per
+(access_token_url, client_id, token_endpoint_auth_method) and reused across requests, keeping
+connections (and TLS sessions) to the providers' token endpoints alive.
+
+NOTE: authlib stores the last token response on the client (client.token). Pooled clients are
+only used with explicit arguments (code, refresh_token), that state is never read back.
+"""
+
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+from authlib.integrations.httpx_client import AsyncOAuth2Client
+
+from aci.common.logging_setup import get_logger
+from aci.server import config
+
+logger = get_logger(__name__)
+
+_ClientKey = tuple[str, str, str | None]
+
+
+@dataclass
+class _PooledClient:
+    client: AsyncOAuth2Client
+    client_secret: str
+    leases: int = 0
+    # evicted or replaced, closed once the last lease is released
+    retired: bool = False
+
+
+class OAuth2ClientPool:
+    def __init__(self, max_size: int, keepalive_expiry_seconds: float):
+        """
+        Args:
+            max_size: max number of pooled clients, the least recently used one is closed first
+            keepalive_expiry_seconds: how long idle connections to a token endpoint are kept alive
+        """
+        self.max_size = max_size
+        self.keepalive_expiry_seconds = keepalive_expiry_seconds
+        self._clients: OrderedDict[_ClientKey, _PooledClient] = OrderedDict()
+        self._stats = {"created": 0, "reused": 0, "evicted": 0}
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        access_token_url: str,
+        client_id: str,
+        client_secret: str,
+        token_endpoint_auth_method: str | None,
+    ) -> AsyncIterator[AsyncOAuth2Client]:
+        """
+        Lease the pooled client for the given token endpoint and OAuth2 client. A client evicted
+        while leased is only closed once released.
+        """
+        pooled = await self._get_or_create(
+            (access_token_url, client_id, token_endpoint_auth_method), client_secret
+        )
+        pooled.leases += 1
+        try:
+            yield pooled.client
+        finally:
+            pooled.leases -= 1
+            if pooled.retired and pooled.leases == 0:
+                await self._close(pooled)
+
+    async def close(self) -> None:
+        """Close all pooled clients. Called from the server lifespan shutdown hook."""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for pooled in clients:
+            pooled.retired = True
+            await self._close(pooled)
+        if clients:
+            logger.info(f"Closed pooled OAuth2 clients, count={len(clients)}")
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"size": len(self._clients), **self._stats}
+
+    async def _get_or_create(self, key: _ClientKey, client_secret: str) -> _PooledClient:
+        pooled = self._clients.get(key)
+        if pooled is not None:
+            if pooled.client_secret == client_secret:
+                self._clients.move_to_end(key)
+                self._stats["reused"] += 1
+                return pooled
+            # the client secret was rotated in the app configuration
+            del self._clients[key]
+            await self._retire(pooled)
+
+        access_token_url, client_id, token_endpoint_auth_method = key
+        # NOTE: don't pass in scope here, otherwise it will be sent during refresh token request which is not needed
+        pooled = _PooledClient(
+            client=AsyncOAuth2Client(
+                client_id=client_id,
+                client_secret=client_secret,
+                token_endpoint_auth_method=token_endpoint_auth_method,
+                code_challenge_method="S256",  # only S256 is supported
+                # TODO: use update_token callback to save tokens to the database
+                update_token=None,
+                limits=httpx.Limits(keepalive_expiry=self.keepalive_expiry_seconds),
+            ),
+            client_secret=client_secret,
+        )
+        self._clients[key] = pooled
+        self._stats["created"] += 1
+        logger.debug(
+            f"Created pooled OAuth2 client, access_token_url={access_token_url}, "
+            f"client_id={client_id}, token_endpoint_auth_method={token_endpoint_auth_method}"
+        )
+
+        while len(self._clients) > self.max_size:
+            _, evicted = self._clients.popitem(last=False)
+            self._stats["evicted"] += 1
+            await self._retire(evicted)
+        return pooled
+
+    async def _retire(self, pooled: _PooledClient) -> None:
+        pooled.retired = True
+        if pooled.leases == 0:
+            await self._close(pooled)
+
+    @staticmethod
+    async def _close(pooled: _PooledClient) -> None:
+        try:
+            await pooled.client.aclose()
+        except Exception:
+            logger.exception("Failed to close pooled OAuth2 client")
+
+
+oauth2_client_pool = OAuth2ClientPool(
+    max_size=config.OAUTH2_CLIENT_POOL_MAX_SIZE,
+    keepalive_expiry_seconds=config.OAUTH2_CLIENT_KEEPALIVE_EXPIRY_SECONDS,
+)
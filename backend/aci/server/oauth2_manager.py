@@ -1,6 +1,7 @@
 import random
 import string
 import time
+from contextlib import AbstractAsyncContextManager
 from typing import Any, cast
 
 from authlib.integrations.httpx_client import AsyncOAuth2Client
@@ -8,6 +9,7 @@ from authlib.integrations.httpx_client import AsyncOAuth2Client
 from aci.common.exceptions import OAuth2Error
 from aci.common.logging_setup import get_logger
 from aci.common.schemas.security_scheme import OAuth2SchemeCredentials
+from aci.server.oauth2_client_pool import oauth2_client_pool
 
 UNICODE_ASCII_CHARACTER_SET = string.ascii_letters + string.digits
 logger = get_logger(__name__)
@@ -49,16 +51,13 @@ class OAuth2Manager:
         self.refresh_token_url = refresh_token_url
         self.token_endpoint_auth_method = token_endpoint_auth_method
 
-        # TODO: need to close the client after use
-        # Add an aclose() helper (or implement __aenter__/__aexit__) and make callers invoke it during shutdown.
-        # NOTE: don't pass in scope here, otherwise it will be sent during refresh token request which is not needed
-        self.oauth2_client = AsyncOAuth2Client(
-            client_id=client_id,
-            client_secret=client_secret,
-            token_endpoint_auth_method=token_endpoint_auth_method,
-            code_challenge_method="S256",  # only S256 is supported
-            # TODO: use update_token callback to save tokens to the database
-            update_token=None,
+    def _lease_client(self) -> AbstractAsyncContextManager[AsyncOAuth2Client]:
+        """Lease the pooled client for this token endpoint, see OAuth2ClientPool"""
+        return oauth2_client_pool.lease(
+            access_token_url=self.access_token_url,
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            token_endpoint_auth_method=self.token_endpoint_auth_method,
         )
 
     # TODO: some app may not support "code_verifier"?
@@ -98,16 +97,17 @@ class OAuth2Manager:
         # - "scope" can be specified here
         # - "response_type" can be specified here (default is "code")
         # - and additional options can be specified here (like access_type, prompt, etc.)
-        authorization_url, _ = self.oauth2_client.create_authorization_url(
-            url=self.authorize_url,
-            redirect_uri=redirect_uri,
-            state=state,
-            code_verifier=code_verifier,
-            access_type=access_type,
-            prompt=prompt,
-            scope=self.scope,
-            **app_specific_params,
-        )
+        async with self._lease_client() as oauth2_client:
+            authorization_url, _ = oauth2_client.create_authorization_url(
+                url=self.authorize_url,
+                redirect_uri=redirect_uri,
+                state=state,
+                code_verifier=code_verifier,
+                access_type=access_type,
+                prompt=prompt,
+                scope=self.scope,
+                **app_specific_params,
+            )
 
         return str(authorization_url)
 
@@ -130,16 +130,17 @@ class OAuth2Manager:
             Token response dictionary
         """
         try:
-            token = cast(
-                dict[str, Any],
-                await self.oauth2_client.fetch_token(
-                    self.access_token_url,
-                    redirect_uri=redirect_uri,
-                    code=code,
-                    code_verifier=code_verifier,
-                    scope=self.scope,
-                ),
-            )
+            async with self._lease_client() as oauth2_client:
+                token = cast(
+                    dict[str, Any],
+                    await oauth2_client.fetch_token(
+                        self.access_token_url,
+                        redirect_uri=redirect_uri,
+                        code=code,
+                        code_verifier=code_verifier,
+                        scope=self.scope,
+                    ),
+                )
             return token
         except Exception as e:
             logger.error(f"Failed to fetch access token, app_name={self.app_name}, error={e}")
@@ -150,12 +151,13 @@ class OAuth2Manager:
         refresh_token: str,
     ) -> dict[str, Any]:
         try:
-            token = cast(
-                dict[str, Any],
-                await self.oauth2_client.refresh_token(
-                    self.refresh_token_url, refresh_token=refresh_token
-                ),
-            )
+            async with self._lease_client() as oauth2_client:
+                token = cast(
+                    dict[str, Any],
+                    await oauth2_client.refresh_token(
+                        self.refresh_token_url, refresh_token=refresh_token
+                    ),
+                )
             return token
         except Exception as e:
             logger.error(f"Failed to refresh access token, app_name={self.app_name}, error={e}")
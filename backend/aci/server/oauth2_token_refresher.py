@@ -0,0 +1,379 @@
+"""
+OAuth2 access token refresh for linked accounts.
+
+- Refreshes are deduplicated per linked account: concurrent requests in the worker share one
+  in-flight refresh, and a Redis lock (if Redis is configured) serializes refreshes across nodes.
+  This matters for providers with single-use refresh tokens, where concurrent refreshes would
+  invalidate each other.
+- The refreshed credentials are saved while still holding the lock, and the credentials are
+  re-read from the database once the lock is acquired, so a refresh done by someone else in the
+  meantime is picked up instead of being repeated.
+- Tokens are considered expired a configurable leeway before their actual expiry.
+- Tokens of recently used linked accounts are refreshed proactively in the background shortly
+  before they expire, so requests normally don't pay the refresh latency.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+from redis.exceptions import LockError
+
+from aci.common.db import crud
+from aci.common.exceptions import LinkedAccountNotFound, OAuth2Error
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.security_scheme import OAuth2Scheme, OAuth2SchemeCredentials
+from aci.common.utils import create_db_async_session
+from aci.server import config
+from aci.server.connector_instance_cache import connector_instance_cache
+from aci.server.oauth2_manager import OAuth2Manager
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _ScheduledRefresh:
+    app_name: str
+    oauth2_scheme: OAuth2Scheme
+    expires_at: int
+
+
+class OAuth2TokenRefresher:
+    def __init__(
+        self,
+        redis_client: Any | None,
+        leeway_seconds: int,
+        lock_timeout_seconds: int,
+        lock_key_prefix: str,
+        proactive_refresh_window_seconds: int,
+        proactive_refresh_interval_seconds: float,
+        proactive_refresh_max_concurrency: int,
+        proactive_refresh_max_tracked: int,
+    ):
+        """
+        Args:
+            redis_client: used for the cross-node refresh lock, None to only deduplicate in process
+            leeway_seconds: a token is considered expired this long before its actual expiry
+            lock_timeout_seconds: max time a refresh holds / waits for the Redis lock
+            lock_key_prefix: prefix of the Redis lock keys
+            proactive_refresh_window_seconds: the background refresh picks tokens expiring within
+                this window
+            proactive_refresh_interval_seconds: how often the background refresh runs
+            proactive_refresh_max_concurrency: max refreshes run at the same time by the background
+                refresh
+            proactive_refresh_max_tracked: max number of linked accounts tracked for the background
+                refresh
+        """
+        self.redis_client = redis_client
+        self.leeway_seconds = leeway_seconds
+        self.lock_timeout_seconds = lock_timeout_seconds
+        self.lock_key_prefix = lock_key_prefix
+        self.proactive_refresh_window_seconds = proactive_refresh_window_seconds
+        self.proactive_refresh_interval_seconds = proactive_refresh_interval_seconds
+        self.proactive_refresh_max_concurrency = proactive_refresh_max_concurrency
+        self.proactive_refresh_max_tracked = proactive_refresh_max_tracked
+
+        self._in_flight: dict[UUID, asyncio.Task[OAuth2SchemeCredentials]] = {}
+        self._scheduled: dict[UUID, _ScheduledRefresh] = {}
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stats = {
+            "refreshed": 0,
+            "refreshed_proactively": 0,
+            "already_refreshed": 0,
+            "coalesced": 0,
+            "failed": 0,
+        }
+
+    def is_expired(
+        self, credentials: OAuth2SchemeCredentials, leeway_seconds: int | None = None
+    ) -> bool:
+        if credentials.expires_at is None:
+            return False
+        if leeway_seconds is None:
+            leeway_seconds = self.leeway_seconds
+        return credentials.expires_at < int(time.time()) + leeway_seconds
+
+    def track(
+        self,
+        linked_account_id: UUID,
+        app_name: str,
+        oauth2_scheme: OAuth2Scheme,
+        credentials: OAuth2SchemeCredentials,
+    ) -> None:
+        """
+        Track the token of a linked account that was just used, so it gets refreshed in the
+        background before it expires.
+        """
+        if credentials.expires_at is None or not credentials.refresh_token:
+            return
+        if (
+            linked_account_id not in self._scheduled
+            and len(self._scheduled) >= self.proactive_refresh_max_tracked
+        ):
+            return
+        self._scheduled[linked_account_id] = _ScheduledRefresh(
+            app_name=app_name,
+            oauth2_scheme=oauth2_scheme,
+            expires_at=credentials.expires_at,
+        )
+
+    async def refresh(
+        self,
+        app_name: str,
+        oauth2_scheme: OAuth2Scheme,
+        linked_account_id: UUID,
+        leeway_seconds: int | None = None,
+    ) -> OAuth2SchemeCredentials:
+        """
+        Refresh and save the access token of a linked account, unless it was refreshed in the
+        meantime. Concurrent calls for the same linked account share a single refresh.
+
+        Returns:
+            the up-to-date credentials, already saved to the database
+        """
+        task = self._in_flight.get(linked_account_id)
+        if task is None:
+            task = asyncio.create_task(
+                self._refresh_with_lock(app_name, oauth2_scheme, linked_account_id, leeway_seconds)
+            )
+            self._in_flight[linked_account_id] = task
+
+            def _done(finished_task: asyncio.Task) -> None:
+                if self._in_flight.get(linked_account_id) is finished_task:
+                    del self._in_flight[linked_account_id]
+
+            task.add_done_callback(_done)
+        else:
+            self._stats["coalesced"] += 1
+            logger.info(f"Joining in-flight token refresh, linked_account_id={linked_account_id}")
+
+        # shield: a cancelled caller must not cancel the refresh shared with other callers
+        return await asyncio.shield(task)
+
+    async def _refresh_with_lock(
+        self,
+        app_name: str,
+        oauth2_scheme: OAuth2Scheme,
+        linked_account_id: UUID,
+        leeway_seconds: int | None,
+    ) -> OAuth2SchemeCredentials:
+        if self.redis_client is None:
+            return await self._refresh(app_name, oauth2_scheme, linked_account_id, leeway_seconds)
+
+        lock = self.redis_client.lock(
+            f"{self.lock_key_prefix}:{linked_account_id}",
+            timeout=self.lock_timeout_seconds,
+            blocking_timeout=self.lock_timeout_seconds,
+        )
+        acquired = await lock.acquire()
+        if not acquired:
+            # still re-reads the credentials first, so most likely the other node's refresh is used
+            logger.warning(
+                f"Timed out waiting for token refresh lock, refreshing anyway, "
+                f"linked_account_id={linked_account_id}"
+            )
+        try:
+            return await self._refresh(app_name, oauth2_scheme, linked_account_id, leeway_seconds)
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except LockError:
+                    logger.warning(
+                        f"Token refresh lock expired before release, linked_account_id={linked_account_id}"
+                    )
+
+    async def _refresh(
+        self,
+        app_name: str,
+        oauth2_scheme: OAuth2Scheme,
+        linked_account_id: UUID,
+        leeway_seconds: int | None,
+    ) -> OAuth2SchemeCredentials:
+        db_session = create_db_async_session(config.DB_FULL_URL, expire_on_commit=False)
+        try:
+            linked_account = await crud.linked_accounts.get_linked_account_by_id(
+                db_session, linked_account_id
+            )
+            if not linked_account:
+                raise LinkedAccountNotFound(f"linked account={linked_account_id} not found")
+            credentials = OAuth2SchemeCredentials.model_validate(
+                linked_account.security_credentials
+            )
+            if not self.is_expired(credentials, leeway_seconds):
+                # refreshed by another request or node while waiting for the lock
+                self._stats["already_refreshed"] += 1
+                return credentials
+            # don't hold the connection during the refresh request
+            await db_session.commit()
+
+            try:
+                token_response = await _refresh_oauth2_access_token(
+                    app_name, oauth2_scheme, credentials
+                )
+                credentials = _apply_token_response(credentials, token_response)
+            except Exception:
+                self._stats["failed"] += 1
+                logger.exception(
+                    f"Failed to refresh access token, app={app_name}, linked_account_id={linked_account_id}"
+                )
+                raise
+
+            await crud.linked_accounts.update_linked_account_credentials(
+                db_session, linked_account, credentials
+            )
+            await db_session.commit()
+            connector_instance_cache.invalidate(linked_account_id)
+            self._stats["refreshed"] += 1
+            logger.info(
+                f"Refreshed access token, app={app_name}, linked_account_id={linked_account_id}, "
+                f"expires_at={credentials.expires_at}"
+            )
+            return credentials
+        finally:
+            await db_session.close()
+
+    async def start(self) -> None:
+        """Start the background refresh of tokens about to expire."""
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"OAuth2 token refresher started, "
+            f"proactive_refresh_window_seconds={self.proactive_refresh_window_seconds}, "
+            f"proactive_refresh_interval_seconds={self.proactive_refresh_interval_seconds}"
+        )
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task:
+            await self._task
+            self._task = None
+        logger.info("OAuth2 token refresher stopped")
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stop_event.wait(), timeout=self.proactive_refresh_interval_seconds
+                )
+            except TimeoutError:
+                pass
+            if self._stop_event.is_set():
+                break
+            try:
+                await self.refresh_due_tokens()
+            except Exception:
+                # keep the background refresh alive
+                logger.exception("Unexpected error refreshing tokens proactively")
+
+    async def refresh_due_tokens(self) -> None:
+        """
+        Refresh the tracked tokens expiring within the proactive refresh window.
+        A token is only refreshed once per use, it's tracked again the next time it's used.
+        """
+        due_before = int(time.time()) + self.proactive_refresh_window_seconds
+        due = {
+            linked_account_id: scheduled
+            for linked_account_id, scheduled in self._scheduled.items()
+            if scheduled.expires_at < due_before
+        }
+        if not due:
+            return
+        for linked_account_id in due:
+            del self._scheduled[linked_account_id]
+
+        logger.info(f"Refreshing tokens proactively, count={len(due)}")
+        semaphore = asyncio.Semaphore(self.proactive_refresh_max_concurrency)
+
+        async def refresh_one(linked_account_id: UUID, scheduled: _ScheduledRefresh) -> None:
+            async with semaphore:
+                try:
+                    await self.refresh(
+                        scheduled.app_name,
+                        scheduled.oauth2_scheme,
+                        linked_account_id,
+                        leeway_seconds=self.proactive_refresh_window_seconds,
+                    )
+                    self._stats["refreshed_proactively"] += 1
+                except Exception:
+                    # the request path will retry the refresh when the token is used again
+                    logger.warning(
+                        f"Proactive token refresh failed, linked_account_id={linked_account_id}"
+                    )
+
+        await asyncio.gather(*[refresh_one(*item) for item in due.items()])
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "tracked": len(self._scheduled),
+            **self._stats,
+        }
+
+
+def _apply_token_response(
+    credentials: OAuth2SchemeCredentials, token_response: dict
+) -> OAuth2SchemeCredentials:
+    expires_at: int | None = None
+    if "expires_at" in token_response:
+        expires_at = int(token_response["expires_at"])
+    elif "expires_in" in token_response:
+        expires_at = int(time.time()) + int(token_response["expires_in"])
+
+    if not token_response.get("access_token") or not expires_at:
+        logger.error(f"Failed to refresh access token, token_response={token_response}")
+        raise OAuth2Error("failed to refresh access token")
+
+    fields_to_update = {
+        "access_token": token_response["access_token"],
+        "expires_at": expires_at,
+    }
+    # NOTE: some app's refresh token can only be used once, so we need to update the refresh token (if returned)
+    if token_response.get("refresh_token"):
+        fields_to_update["refresh_token"] = token_response["refresh_token"]
+
+    return credentials.model_copy(update=fields_to_update)
+
+
+async def _refresh_oauth2_access_token(
+    app_name: str, oauth2_scheme: OAuth2Scheme, oauth2_scheme_credentials: OAuth2SchemeCredentials
+) -> dict:
+    refresh_token = oauth2_scheme_credentials.refresh_token
+    if not refresh_token:
+        raise OAuth2Error("no refresh token found")
+
+    # NOTE: it's important to use oauth2_scheme_credentials's client_id, client_secret, scope because
+    # these fields might have changed for the app configuration after the linked account was created
+    oauth2_manager = OAuth2Manager(
+        app_name=app_name,
+        client_id=oauth2_scheme_credentials.client_id,
+        client_secret=oauth2_scheme_credentials.client_secret,
+        scope=oauth2_scheme_credentials.scope,
+        authorize_url=oauth2_scheme.authorize_url,
+        access_token_url=oauth2_scheme.access_token_url,
+        refresh_token_url=oauth2_scheme.refresh_token_url,
+        token_endpoint_auth_method=oauth2_scheme.token_endpoint_auth_method,
+    )
+
+    return await oauth2_manager.refresh_token(refresh_token)
+
+
+_redis_client: Any | None = None
+if config.REDIS_HOST:
+    from aci.server.redis_client import redis_client as _redis_client
+
+oauth2_token_refresher = OAuth2TokenRefresher(
+    redis_client=_redis_client,
+    leeway_seconds=config.OAUTH2_TOKEN_REFRESH_LEEWAY_SECONDS,
+    lock_timeout_seconds=config.OAUTH2_TOKEN_REFRESH_LOCK_TIMEOUT_SECONDS,
+    lock_key_prefix=config.OAUTH2_TOKEN_REFRESH_LOCK_KEY_PREFIX,
+    proactive_refresh_window_seconds=config.OAUTH2_PROACTIVE_REFRESH_WINDOW_SECONDS,
+    proactive_refresh_interval_seconds=config.OAUTH2_PROACTIVE_REFRESH_INTERVAL_SECONDS,
+    proactive_refresh_max_concurrency=config.OAUTH2_PROACTIVE_REFRESH_MAX_CONCURRENCY,
+    proactive_refresh_max_tracked=config.OAUTH2_PROACTIVE_REFRESH_MAX_TRACKED,
+)
@@ -1,24 +1,50 @@
+"""
+Monthly quota of the projects.
+
+Usage is counted in Redis (or in memory, per worker, without Redis): one Lua script call checks
+the limit (plus the soft window) and increments the usage of the month atomically, so concurrent
+workers never lose increments. The usage is seeded from the projects table the first time a project
+is seen in a month (and, in memory, every time its limit is read again).
+
+Every consumption is also added to a pending delta per project, flushed to
+projects.monthly_quota_used / total_quota_used in the background by one bulk UPDATE every few
+seconds (see QuotaCounterBase.reconcile). Deltas being flushed stay visible to the seeding (as
+"flushing" deltas) until the UPDATE is committed. If the counter is unavailable (e.g. Redis is down), the
+quota is enforced by a single atomic UPDATE of the project instead, and the usage is added to the
+counter if it is seeded.
+"""
+
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Optional
+import abc
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Any
 from uuid import UUID
 from zoneinfo import ZoneInfo
 
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from aci.common.exceptions import ProjectNotFound, MonthlyQuotaExceeded
-from aci.server.caching import get_cache
+from aci.common.db import crud
+from aci.common.exceptions import MonthlyQuotaExceeded, ProjectNotFound
+from aci.common.logging_setup import get_logger
+from aci.common.utils import create_db_async_session
+from aci.server import config
+
+logger = get_logger(__name__)
+
+# timezone of the quota months, the same for counting and flushing the usage
+QUOTA_TIMEZONE = "Asia/Bangkok"
 
 
 # ---------- Time helpers ----------
-def month_start(dt: datetime, tz: str = "Asia/Bangkok") -> datetime:
+def month_start(dt: datetime, tz: str = QUOTA_TIMEZONE) -> datetime:
     t = dt.astimezone(ZoneInfo(tz))
     return t.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
 
-def month_end_exclusive(dt: datetime, tz: str = "Asia/Bangkok") -> datetime:
+def month_end_exclusive(dt: datetime, tz: str = QUOTA_TIMEZONE) -> datetime:
     s = month_start(dt, tz)
     # Next month start
     if s.month == 12:
@@ -26,23 +52,19 @@ def month_end_exclusive(dt: datetime, tz: str = "Asia/Bangkok") -> datetime:
     return s.replace(month=s.month + 1)
 
 
-def seconds_until_month_end(now: Optional[datetime] = None, tz: str = "Asia/Bangkok") -> int:
+def seconds_until_month_end(now: datetime | None = None, tz: str = QUOTA_TIMEZONE) -> int:
     now = now or datetime.now(ZoneInfo(tz))
     end = month_end_exclusive(now, tz)
     return int((end - now).total_seconds())
 
 
-def cache_key(project_id: UUID, month_key: str) -> str:
-    return f"quota:{project_id}:{month_key}"
-
-
-def month_key_str(now: Optional[datetime] = None, tz: str = "Asia/Bangkok") -> str:
+def month_key_str(now: datetime | None = None, tz: str = QUOTA_TIMEZONE) -> str:
     now = now or datetime.now(ZoneInfo(tz))
     return now.strftime("%Y%m")  # e.g. 202508
 
 
 # ---------- DB logic ----------
-# This single UPDATE:
+# Fallback when the counter is unavailable. This single UPDATE:
 #  - rolls the month if needed
 #  - computes the would-be new usage
 #  - checks it does not exceed limit
@@ -63,6 +85,7 @@ SQL_INCREMENT = text("""
                      RETURNING monthly_quota_used, monthly_quota_limit
                      """)
 
+# Seeds the counters
 SQL_FETCH_LIMIT = text("""
                        SELECT monthly_quota_limit, monthly_quota_used, monthly_quota_month
                        FROM projects
@@ -70,91 +93,490 @@ SQL_FETCH_LIMIT = text("""
                        """)
 
 
-# ---------- Public API ----------
-async def consume_monthly_quota(
-        db_session: AsyncSession,
-        project_id: UUID,
-        consume_count: int = 1,
-        *,
-        tz: str = "Asia/Bangkok",
-        # allow small temporary overage in cache before DB verification:
-        soft_window: Optional[int] = None,  # e.g., 100 or int(0.05*limit). If None, compute 5% later.
-) -> None:
-    """
-    Fast path via Redis cache; hard enforcement via single atomic UPDATE in PostgreSQL.
-    Raises QuotaExceeded if the hard cap would be surpassed.
-    """
 
-    if consume_count <= 0:
-        return  # no-op
 
-    now = datetime.now(ZoneInfo(tz))
-    mstart = month_start(now, tz)
-    month_key = month_key_str(now, tz)
-    ckey = cache_key(project_id, month_key)
-    ttl = seconds_until_month_end(now, tz)
+# ---------- Counters ----------
+# KEYS: usage of the project in the month, limit of the project, pending deltas of the month
+# ARGV: consume count, soft window (< 0 for the default 5% of the limit), project id
+# Returns {allowed (1/0, -1 if not seeded), usage, limit}
+_CONSUME_SCRIPT = """
+local used = redis.call('GET', KEYS[1])
+local limit = redis.call('GET', KEYS[2])
+if not used or not limit then
+    return {-1, 0, 0}
+end
+used = tonumber(used)
+limit = tonumber(limit)
+local consume = tonumber(ARGV[1])
+local soft_window = tonumber(ARGV[2])
+if soft_window < 0 then
+    soft_window = math.max(10, math.floor(limit / 20))
+end
+if used + consume > limit + soft_window then
+    return {0, used, limit}
+end
+used = redis.call('INCRBY', KEYS[1], consume)
+redis.call('HINCRBY', KEYS[3], ARGV[3], consume)
+return {1, used, limit}
+"""
 
-    cache = get_cache()
+# KEYS: same as _CONSUME_SCRIPT, then the deltas of the month being flushed
+# ARGV: usage of the project in the month in the database, limit, project id, ttl of the usage,
+# ttl of the limit
+# The usage not committed to the database yet (pending or being flushed) is added, and the usage is
+# only set if missing (another worker may have seeded it and counted since)
+_SEED_SCRIPT = """
+local pending = tonumber(redis.call('HGET', KEYS[3], ARGV[3]) or '0')
+    + tonumber(redis.call('HGET', KEYS[4], ARGV[3]) or '0')
+redis.call('SET', KEYS[1], tonumber(ARGV[1]) + pending, 'NX', 'EX', ARGV[4])
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[5])
+return 1
+"""
 
-    # Try to read the cached limit to compute soft window. If absent, we’ll fetch it.
-    limit: Optional[int] = None
-    limit_key = f"{ckey}:limit"
+# KEYS: usage of the project in the month
+# ARGV: usage already written to the database
+# Not created if missing, the seeding reads the usage from the database
+_ADD_USAGE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return 1
+"""
 
-    # Try cache first
-    try:
-        limit = await cache.get(limit_key)
-    except Exception:
-        pass  # cache is best-effort
+# KEYS: pending deltas of the month, deltas of the month being flushed
+# Moves the pending deltas to the ones being flushed and returns them (project id, delta, ...)
+_TAKE_PENDING_SCRIPT = """
+local pending = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+for i = 1, #pending, 2 do
+    redis.call('HINCRBY', KEYS[2], pending[i], pending[i + 1])
+end
+return pending
+"""
 
-    # If no cached limit, do a small read to get it (and seed cache)
-    if limit is None:
-        row = (await db_session.execute(SQL_FETCH_LIMIT, {"project_id": str(project_id)})).mappings().first()
-        if row is None:
-            raise ProjectNotFound(f"project {project_id} not found")
-        limit = int(row["monthly_quota_limit"])
-        # seed limit in cache with month TTL
+# KEYS: deltas of the month being flushed, pending deltas of the month
+# ARGV: 1 to put the deltas back in the pending ones (the flush failed), 0 to drop them (committed),
+# then project id, delta, ...
+_RELEASE_PENDING_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    if redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1])) <= 0 then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+    if ARGV[1] == '1' then
+        redis.call('HINCRBY', KEYS[2], ARGV[i], ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+
+def _soft_window_or_default(limit: int, soft_window: int | None) -> int:
+    # Default soft window = 5% of limit (min 10), unless provided
+    return max(10, limit // 20) if soft_window is None else soft_window
+
+
+class QuotaCounterBase(abc.ABC):
+    def __init__(
+            self,
+            limit_ttl_seconds: int,
+            reconcile_interval_seconds: float,
+            reconcile_max_batch: int,
+    ):
+        """
+        Args:
+            limit_ttl_seconds: how long the limit of a project is used before being read again
+            reconcile_interval_seconds: how often the pending usage is flushed to the database
+            reconcile_max_batch: max projects updated per statement
+        """
+        self.limit_ttl_seconds = limit_ttl_seconds
+        self.reconcile_interval_seconds = reconcile_interval_seconds
+        self.reconcile_max_batch = reconcile_max_batch
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # (project id, month) -> seeding of the counter in progress
+        self._seeding: dict[tuple[UUID, str], asyncio.Future] = {}
+        self._stats = {
+            "consumed": 0,
+            "rejected": 0,
+            "seeded": 0,
+            "db_fallbacks": 0,
+            "flushed_projects": 0,
+            "flush_errors": 0,
+        }
+
+    async def consume(
+            self,
+            db_session: AsyncSession,
+            project_id: UUID,
+            consume_count: int,
+            soft_window: int | None,
+    ) -> None:
+        """
+        Raises:
+            MonthlyQuotaExceeded: the usage would go over the limit plus the soft window
+            ProjectNotFound: the project doesn't exist
+        """
+        now = datetime.now(ZoneInfo(QUOTA_TIMEZONE))
+        month_key = month_key_str(now)
         try:
-            await cache.set(limit_key, limit, ttl=ttl)
+            result = await self._consume(project_id, month_key, consume_count, soft_window)
+            if result is None:
+                # concurrent requests of the project wait for the same seeding
+                key = (project_id, month_key)
+                seeding = self._seeding.get(key)
+                if seeding is None:
+                    seeding = asyncio.ensure_future(self._seed_from_db(project_id, month_key, now))
+                    self._seeding[key] = seeding
+                    seeding.add_done_callback(lambda _: self._seeding.pop(key, None))
+                await asyncio.shield(seeding)
+                result = await self._consume(project_id, month_key, consume_count, soft_window)
+            if result is None:
+                raise RuntimeError("quota counter not seeded")
+        except (ProjectNotFound, MonthlyQuotaExceeded):
+            raise
         except Exception:
-            pass
+            logger.exception(f"Failed to consume quota from the counter, project_id={project_id}")
+            self._stats["db_fallbacks"] += 1
+            await _consume_in_db(db_session, project_id, consume_count, month_start(now).date())
+            self._stats["consumed"] += 1
+            try:
+                # already in the database, only the counter is behind
+                await self._add_usage(project_id, month_key, consume_count)
+            except Exception:
+                logger.exception(f"Failed to add quota usage to the counter, project_id={project_id}")
+            return
 
-    # Default soft window = 5% of limit (min 10), unless provided
-    if soft_window is None:
-        soft_window = max(10, limit // 20)  # 5%
-
-    # --- Cache fast path ---
-    # We maintain a cache counter for this month. It can go slightly beyond limit (soft window),
-    # but DB will strictly enforce the cap.
-    cached_after: Optional[int] = None
-    try:
-        # Initialize if missing
-        current = await cache.get(ckey)
-        if current is None:
-            # seed from DB monthly_quota_used for better accuracy
-            row = (await db_session.execute(SQL_FETCH_LIMIT, {"project_id": str(project_id)})).mappings().first()
-            if row is None:
-                raise ProjectNotFound(f"project {project_id} not found")
-            # If DB month differs, usage should be 0 (the SQL increment handles roll anyway)
-            # but for cache we start at 0; DB will reconcile.
-            current = 0
-            await cache.set(ckey, current, ttl=ttl)
-        # increment in cache
-        cached_after = int(current) + int(consume_count)
-        await cache.set(ckey, cached_after, ttl=ttl)
-
-        # If we’re still <= (limit + soft_window), we can accept fast path and *defer* DB write.
-        # But to keep drift bounded, we write-through whenever we cross 10% of limit steps.
-        write_through = (cached_after % max(1, limit // 10) == 0)
-        if cached_after <= (limit + soft_window) and not write_through:
-            return  # accept optimistic increment; DB will catch up later
-    except Exception:
-        # Cache failure – fall back to DB immediately.
+        allowed, _, _ = result
+        if not allowed:
+            self._stats["rejected"] += 1
+            raise MonthlyQuotaExceeded(f"Monthly quota exceeded for project {project_id}")
+        self._stats["consumed"] += 1
+
+    async def start(self) -> None:
+        """Start flushing the pending usage in the background."""
+        if self._task and not self._task.done():
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"{self.__class__.__name__} started, "
+            f"reconcile_interval_seconds={self.reconcile_interval_seconds}"
+        )
+
+    async def stop(self) -> None:
+        """Stop the background flush and flush whatever is still pending."""
+        self._stop_event.set()
+        if self._task:
+            await self._task
+            self._task = None
+        await self.reconcile()
+        logger.info(f"{self.__class__.__name__} stopped")
+
+    async def reconcile(self) -> None:
+        """Flush the pending usage of the current and previous months to the projects table."""
+        this_month = month_start(datetime.now(ZoneInfo(QUOTA_TIMEZONE)))
+        # usage of the previous month consumed right before the month rolled
+        previous_month = month_start(this_month - timedelta(days=1))
+        for month in (previous_month, this_month):
+            month_key = month_key_str(month)
+            try:
+                pending = await self._take_pending(month_key)
+            except Exception:
+                logger.exception(f"Failed to take pending quota usage, month={month_key}")
+                continue
+            items = list(pending.items())
+            for i in range(0, len(items), self.reconcile_max_batch):
+                batch = dict(items[i: i + self.reconcile_max_batch])
+                await self._flush(month.date(), month_key, batch)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return dict(self._stats)
+
+    async def _flush(self, month: date, month_key: str, pending: dict[UUID, int]) -> None:
+        db_session = create_db_async_session(config.DB_FULL_URL)
+        try:
+            await crud.projects.bulk_add_monthly_quota_used(db_session, month, pending)
+            await db_session.commit()
+        except Exception:
+            self._stats["flush_errors"] += 1
+            logger.exception(
+                f"Failed to flush quota usage, month={month_key}, projects={len(pending)}"
+            )
+            try:
+                await self._restore_pending(month_key, pending)
+            except Exception:
+                logger.exception(f"Failed to restore pending quota usage, month={month_key}")
+            return
+        finally:
+            await db_session.close()
+
+        self._stats["flushed_projects"] += len(pending)
+        logger.debug(f"Flushed quota usage, month={month_key}, projects={len(pending)}")
+        try:
+            await self._complete_pending(month_key, pending)
+        except Exception:
+            # seedings count the deltas twice until the month ends, but nothing is lost
+            logger.exception(f"Failed to complete flushed quota usage, month={month_key}")
+
+    async def _seed_from_db(self, project_id: UUID, month_key: str, now: datetime) -> None:
+        # own session, the seeding is shared by the concurrent requests of the project and outlives
+        # the one that started it if it is cancelled
+        db_session = create_db_async_session(config.DB_FULL_URL)
+        try:
+            used, limit = await self._fetch_usage(db_session, project_id, month_start(now).date())
+        finally:
+            await db_session.close()
+        await self._seed(project_id, month_key, used, limit, seconds_until_month_end(now))
+        self._stats["seeded"] += 1
+
+    async def _fetch_usage(
+            self, db_session: AsyncSession, project_id: UUID, month: date
+    ) -> tuple[int, int]:
+        """The usage of the project in the month and its limit, from the database."""
+        result = await db_session.execute(SQL_FETCH_LIMIT, {"project_id": str(project_id)})
+        row = result.mappings().first()
+        if row is None:
+            raise ProjectNotFound(f"project {project_id} not found")
+        # the usage of an older month doesn't count
+        used = int(row["monthly_quota_used"]) if row["monthly_quota_month"] == month else 0
+        return used, int(row["monthly_quota_limit"])
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(
+                    self._stop_event.wait(), timeout=self.reconcile_interval_seconds
+                )
+            except TimeoutError:
+                pass
+            if self._stop_event.is_set():
+                # the final flush is done by stop()
+                break
+            try:
+                await self.reconcile()
+            except Exception:
+                # keep the reconciler alive
+                logger.exception("Unexpected error flushing quota usage")
+
+    @abc.abstractmethod
+    async def _consume(
+            self, project_id: UUID, month_key: str, consume_count: int, soft_window: int | None
+    ) -> tuple[bool, int, int] | None:
+        """
+        Check the limit and count the usage atomically.
+
+        Returns:
+            (allowed, usage, limit), None if the counter of the project isn't seeded
+        """
+        pass
+
+    @abc.abstractmethod
+    async def _seed(
+            self, project_id: UUID, month_key: str, used: int, limit: int, month_ttl: int
+    ) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def _add_usage(self, project_id: UUID, month_key: str, consume_count: int) -> None:
+        """Count usage already written to the database in the counter, if it is seeded."""
+        pass
+
+    @abc.abstractmethod
+    async def _take_pending(self, month_key: str) -> dict[UUID, int]:
+        """
+        Return the usage of the month not flushed to the database yet, and mark it as being flushed
+        (still counted by the seeding until _complete_pending or _restore_pending).
+        """
+        pass
+
+    @abc.abstractmethod
+    async def _complete_pending(self, month_key: str, pending: dict[UUID, int]) -> None:
+        """Drop usage being flushed once it is committed to the database."""
+        pass
+
+    @abc.abstractmethod
+    async def _restore_pending(self, month_key: str, pending: dict[UUID, int]) -> None:
+        """Put back usage that failed to flush, so it is retried by the next flush."""
         pass
 
-    # --- DB hard enforcement (atomic) ---
+
+class InMemoryQuotaCounter(QuotaCounterBase):
+    """
+    Counters of the current worker. The usage is seeded again from the database (plus the usage of
+    this worker not flushed yet) when the limit expires, which bounds how long the usage of the
+    other workers is missed.
+    """
+
+    def __init__(
+            self,
+            limit_ttl_seconds: int,
+            reconcile_interval_seconds: float,
+            reconcile_max_batch: int,
+    ):
+        super().__init__(limit_ttl_seconds, reconcile_interval_seconds, reconcile_max_batch)
+        # (project id, month) -> [expires at, usage, limit]
+        self._counters: dict[tuple[UUID, str], list] = {}
+        # month -> project id -> usage not flushed yet
+        self._pending: dict[str, dict[UUID, int]] = {}
+        # month -> project id -> usage being flushed
+        self._flushing: dict[str, dict[UUID, int]] = {}
+        self._month_key: str | None = None
+
+    async def _consume(
+            self, project_id: UUID, month_key: str, consume_count: int, soft_window: int | None
+    ) -> tuple[bool, int, int] | None:
+        # no await below, the check and the increment are atomic like the Lua script
+        counter = self._counters.get((project_id, month_key))
+        if counter is None or counter[0] <= asyncio.get_running_loop().time():
+            return None
+        _, used, limit = counter
+        if used + consume_count > limit + _soft_window_or_default(limit, soft_window):
+            return False, used, limit
+        counter[1] = used + consume_count
+        pending = self._pending.setdefault(month_key, {})
+        pending[project_id] = pending.get(project_id, 0) + consume_count
+        return True, counter[1], limit
+
+    async def _seed(
+            self, project_id: UUID, month_key: str, used: int, limit: int, month_ttl: int
+    ) -> None:
+        if month_key != self._month_key:
+            # the month rolled, drop the counters of the previous month
+            self._counters.clear()
+            self._month_key = month_key
+        pending = self._pending.get(month_key, {}).get(project_id, 0)
+        flushing = self._flushing.get(month_key, {}).get(project_id, 0)
+        expires_at = asyncio.get_running_loop().time() + min(self.limit_ttl_seconds, month_ttl)
+        self._counters[(project_id, month_key)] = [expires_at, used + pending + flushing, limit]
+
+    async def _add_usage(self, project_id: UUID, month_key: str, consume_count: int) -> None:
+        counter = self._counters.get((project_id, month_key))
+        if counter is not None:
+            counter[1] += consume_count
+
+    async def _take_pending(self, month_key: str) -> dict[UUID, int]:
+        pending = self._pending.pop(month_key, {})
+        if pending:
+            _add_counts(self._flushing.setdefault(month_key, {}), pending, 1)
+        return pending
+
+    async def _complete_pending(self, month_key: str, pending: dict[UUID, int]) -> None:
+        _add_counts(self._flushing.setdefault(month_key, {}), pending, -1)
+        if not self._flushing[month_key]:
+            del self._flushing[month_key]
+
+    async def _restore_pending(self, month_key: str, pending: dict[UUID, int]) -> None:
+        await self._complete_pending(month_key, pending)
+        _add_counts(self._pending.setdefault(month_key, {}), pending, 1)
+
+
+class RedisQuotaCounter(QuotaCounterBase):
+    """Counters shared by all workers, one Redis call per consumption."""
+
+    def __init__(
+            self,
+            redis_client: Any,
+            key_prefix: str,
+            limit_ttl_seconds: int,
+            reconcile_interval_seconds: float,
+            reconcile_max_batch: int,
+    ):
+        super().__init__(limit_ttl_seconds, reconcile_interval_seconds, reconcile_max_batch)
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self._consume_script = redis_client.register_script(_CONSUME_SCRIPT)
+        self._seed_script = redis_client.register_script(_SEED_SCRIPT)
+        self._add_usage_script = redis_client.register_script(_ADD_USAGE_SCRIPT)
+        self._take_pending_script = redis_client.register_script(_TAKE_PENDING_SCRIPT)
+        self._release_pending_script = redis_client.register_script(_RELEASE_PENDING_SCRIPT)
+
+    async def _consume(
+            self, project_id: UUID, month_key: str, consume_count: int, soft_window: int | None
+    ) -> tuple[bool, int, int] | None:
+        allowed, used, limit = await self._consume_script(
+            keys=self._keys(project_id, month_key),
+            args=[consume_count, -1 if soft_window is None else soft_window, str(project_id)],
+        )
+        if allowed == -1:
+            return None
+        return allowed == 1, int(used), int(limit)
+
+    async def _seed(
+            self, project_id: UUID, month_key: str, used: int, limit: int, month_ttl: int
+    ) -> None:
+        await self._seed_script(
+            keys=[*self._keys(project_id, month_key), self._flushing_key(month_key)],
+            # the usage outlives the month a bit, for late flushes
+            args=[
+                used,
+                limit,
+                str(project_id),
+                month_ttl + 3600,
+                min(self.limit_ttl_seconds, month_ttl),
+            ],
+        )
+
+    async def _add_usage(self, project_id: UUID, month_key: str, consume_count: int) -> None:
+        await self._add_usage_script(
+            keys=self._keys(project_id, month_key)[:1], args=[consume_count]
+        )
+
+    async def _take_pending(self, month_key: str) -> dict[UUID, int]:
+        pending = await self._take_pending_script(
+            keys=[self._pending_key(month_key), self._flushing_key(month_key)]
+        )
+        return {
+            UUID(project_id): int(count)
+            for project_id, count in zip(pending[::2], pending[1::2], strict=True)
+            if int(count)
+        }
+
+    async def _complete_pending(self, month_key: str, pending: dict[UUID, int]) -> None:
+        await self._release_pending(month_key, pending, restore=False)
+
+    async def _restore_pending(self, month_key: str, pending: dict[UUID, int]) -> None:
+        await self._release_pending(month_key, pending, restore=True)
+
+    async def _release_pending(
+            self, month_key: str, pending: dict[UUID, int], restore: bool
+    ) -> None:
+        args: list[Any] = [1 if restore else 0]
+        for project_id, count in pending.items():
+            args += [str(project_id), count]
+        await self._release_pending_script(
+            keys=[self._flushing_key(month_key), self._pending_key(month_key)], args=args
+        )
+
+    def _keys(self, project_id: UUID, month_key: str) -> list[str]:
+        return [
+            f"{self.key_prefix}:used:{project_id}:{month_key}",
+            f"{self.key_prefix}:limit:{project_id}:{month_key}",
+            self._pending_key(month_key),
+        ]
+
+    def _pending_key(self, month_key: str) -> str:
+        return f"{self.key_prefix}:pending:{month_key}"
+
+    def _flushing_key(self, month_key: str) -> str:
+        return f"{self.key_prefix}:flushing:{month_key}"
+
+
+def _add_counts(counts: dict[UUID, int], deltas: dict[UUID, int], sign: int) -> None:
+    for project_id, delta in deltas.items():
+        count = counts.get(project_id, 0) + sign * delta
+        if count:
+            counts[project_id] = count
+        else:
+            counts.pop(project_id, None)
+
+
+async def _consume_in_db(
+        db_session: AsyncSession, project_id: UUID, consume_count: int, month: date
+) -> None:
+    """Hard enforcement via the single atomic UPDATE, when the counter is unavailable."""
     params = {
         "project_id": str(project_id),
-        "cur_month": mstart.date().isoformat(),
+        "cur_month": month.isoformat(),
         "consume": int(consume_count),
     }
     res = await db_session.execute(SQL_INCREMENT, params)
@@ -162,27 +584,53 @@ async def consume_monthly_quota(
 
     if row is None:
         # Determine if this is “not found” vs “quota exceeded”.
-        # Quick existence check:
-        exists = (await db_session.execute(SQL_FETCH_LIMIT, {"project_id": str(project_id)})).mappings().first()
-        if not exists:
-            raise ProjectNotFound(f"project {project_id} not found")
-        # Hard cap hit
+        result = await db_session.execute(SQL_FETCH_LIMIT, {"project_id": str(project_id)})
+        exists = result.mappings().first()
         # Roll back any uncommitted changes (safe to call)
         await db_session.rollback()
-        # Clamp cache to limit to avoid further optimistic overages
-        try:
-            await cache.set(ckey, limit, ttl=ttl)
-        except Exception:
-            pass
+        if not exists:
+            raise ProjectNotFound(f"project {project_id} not found")
         raise MonthlyQuotaExceeded(f"Monthly quota exceeded for project {project_id}")
 
-    # Success: sync cache to the *DB-authoritative* value
-    new_used = int(row["monthly_quota_used"])
-    try:
-        await cache.set(ckey, new_used, ttl=ttl)
-        await cache.set(limit_key, int(row["monthly_quota_limit"]), ttl=ttl)
-    except Exception:
-        pass
-
     # Commit since we wrote
     await db_session.commit()
+
+
+# ---------- Public API ----------
+async def consume_monthly_quota(
+        db_session: AsyncSession,
+        project_id: UUID,
+        consume_count: int = 1,
+        *,
+        # allow small temporary overage before the limit is enforced:
+        soft_window: int | None = None,  # e.g., 100 or int(0.05*limit). If None, 5% (min 10).
+) -> None:
+    """
+    Atomic check and increment of the monthly usage in the quota counter (one Redis call), flushed
+    to the database in the background.
+    Raises MonthlyQuotaExceeded if the limit (plus the soft window) would be surpassed.
+    """
+
+    if consume_count <= 0:
+        return  # no-op
+
+    await quota_counter.consume(db_session, project_id, consume_count, soft_window)
+
+
+quota_counter: QuotaCounterBase
+if config.REDIS_HOST:
+    from aci.server.redis_client import redis_client
+
+    quota_counter = RedisQuotaCounter(
+        redis_client=redis_client,
+        key_prefix=config.QUOTA_COUNTER_REDIS_KEY_PREFIX,
+        limit_ttl_seconds=config.QUOTA_COUNTER_LIMIT_TTL_SECONDS,
+        reconcile_interval_seconds=config.QUOTA_RECONCILE_INTERVAL_SECONDS,
+        reconcile_max_batch=config.QUOTA_RECONCILE_MAX_BATCH,
+    )
+else:
+    quota_counter = InMemoryQuotaCounter(
+        limit_ttl_seconds=config.QUOTA_COUNTER_LIMIT_TTL_SECONDS,
+        reconcile_interval_seconds=config.QUOTA_RECONCILE_INTERVAL_SECONDS,
+        reconcile_max_batch=config.QUOTA_RECONCILE_MAX_BATCH,
+    )
@@ -0,0 +1,438 @@
+"""
+Sliding window rate limiter, checking and counting all the limits of a request at once.
+
+Each limit is a sliding window counter: the requests of the current fixed window plus the requests
+of the previous window weighted by how much of it still overlaps the sliding window, i.e.
+    estimate = previous * (window - elapsed) / window + current
+A request is allowed if it fits in every limit, and is only counted (in every limit) if allowed.
+Two counters per key and limit, whatever the rate.
+
+With Redis, the check and the increments of all the limits (and the counts for the X-RateLimit-*
+headers) are a single Lua script call, so a request costs one round trip. Without Redis, the same
+counters are kept in-process.
+
+Clients over a limit are also blocked locally until the limit would allow them again (counters
+only grow within a window, so this is never longer than what Redis would answer), so that a client
+hammering the API is shed without touching Redis.
+
+Limits:
+- per IP (RateLimitMiddleware), from SERVER_RATE_LIMIT_IP_PER_*
+- per API key and per project (get_api_key_context), from the rate_limits feature of the plan of
+  the project's organization, or the defaults of the plan (SERVER_RATE_LIMIT_PLAN_TIERS)
+"""
+
+import abc
+import math
+import time
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aci.common.db.sql_models import Project
+from aci.common.exceptions import RateLimitExceeded
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.plans import PlanRateLimits
+from aci.server import billing, config
+
+logger = get_logger(__name__)
+
+_WINDOW_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# KEYS: current and previous window counters of each limit
+# ARGV: limit and window (ms) of each limit, then the current time (ms)
+# Returns the index (1-based) of the first exceeded limit (0 if allowed), then the current and
+# previous counts of each limit (the current count includes this request if allowed)
+_HIT_SCRIPT = """
+local n = #KEYS / 2
+local now = tonumber(ARGV[2 * n + 1])
+local counts = {}
+local exceeded = 0
+for i = 1, n do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i])
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    counts[i] = {current, previous}
+    local estimate = previous * (window - now % window) / window + current
+    if exceeded == 0 and estimate + 1 > limit then
+        exceeded = i
+    end
+end
+local result = {exceeded}
+for i = 1, n do
+    local current = counts[i][1]
+    if exceeded == 0 then
+        current = redis.call('INCR', KEYS[2 * i - 1])
+        if current == 1 then
+            -- the counter is the previous window of the next window
+            redis.call('PEXPIRE', KEYS[2 * i - 1], 2 * tonumber(ARGV[2 * i]))
+        end
+    end
+    table.insert(result, current)
+    table.insert(result, counts[i][2])
+end
+return result
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    name: str
+    amount: int
+    window_seconds: int
+
+
+@dataclass
+class RateLimitStats:
+    name: str
+    amount: int
+    remaining: int
+    # epoch seconds
+    reset_time: float
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    # name of the first exceeded limit, if not allowed
+    exceeded: str | None
+    # seconds until the exceeded limit allows a request again
+    retry_after: float
+    stats: list[RateLimitStats]
+
+    def headers(self) -> dict[str, str]:
+        headers = {}
+        for stats in self.stats:
+            headers[f"X-RateLimit-Limit-{stats.name}"] = str(stats.amount)
+            headers[f"X-RateLimit-Remaining-{stats.name}"] = str(stats.remaining)
+            headers[f"X-RateLimit-Reset-{stats.name}"] = str(stats.reset_time)
+        return headers
+
+
+class RateLimiterBase(abc.ABC):
+    def __init__(
+        self,
+        plan_tiers: dict[str, dict[str, int]],
+        tier_cache_ttl_seconds: float,
+        local_max_size: int,
+    ):
+        """
+        Args:
+            plan_tiers: default per API key / per project limits per plan name (see
+                PlanRateLimits), for plans without a rate_limits feature
+            tier_cache_ttl_seconds: how long the limits of an organization's plan are cached
+            local_max_size: max number of clients blocked locally (and of counters, in memory)
+        """
+        self.plan_tiers = {name: PlanRateLimits(**tier) for name, tier in plan_tiers.items()}
+        self.tier_cache_ttl_seconds = tier_cache_ttl_seconds
+        self.local_max_size = local_max_size
+        # (key, limit name) -> blocked until (epoch seconds)
+        self._blocked: dict[tuple[str, str], float] = {}
+        # org id -> (expires at, per API key limits, per project limits)
+        self._tiers: dict[UUID, tuple[float, list[RateLimit], list[RateLimit]]] = {}
+        self._stats = {"allowed": 0, "limited": 0, "shed_locally": 0, "errors": 0}
+
+    async def hit(self, limits: list[tuple[str, RateLimit]]) -> RateLimitResult:
+        """
+        Count a request against all the limits, if it fits in all of them.
+
+        Args:
+            limits: the key (e.g. "ip:1.2.3.4") and limit of each limit to check
+        """
+        now = time.time()
+        for key, rate_limit in limits:
+            blocked_until = self._blocked.get((key, rate_limit.name))
+            if blocked_until is None:
+                continue
+            if blocked_until <= now:
+                del self._blocked[(key, rate_limit.name)]
+                continue
+            self._stats["shed_locally"] += 1
+            # only the stats of the exceeded limit are known without asking the counters
+            return RateLimitResult(
+                allowed=False,
+                exceeded=rate_limit.name,
+                retry_after=blocked_until - now,
+                stats=[RateLimitStats(rate_limit.name, rate_limit.amount, 0, blocked_until)],
+            )
+        if not limits:
+            return RateLimitResult(allowed=True, exceeded=None, retry_after=0, stats=[])
+
+        try:
+            exceeded, counts = await self._hit(limits, now)
+        except Exception:
+            # fail open, rate limiting must not take the API down
+            self._stats["errors"] += 1
+            logger.exception("Failed to check rate limits, allowing request")
+            return RateLimitResult(allowed=True, exceeded=None, retry_after=0, stats=[])
+
+        stats = []
+        retry_after = 0.0
+        for index, ((key, rate_limit), (current, previous)) in enumerate(
+            zip(limits, counts, strict=True)
+        ):
+            window = rate_limit.window_seconds
+            elapsed = now % window
+            estimate = previous * (window - elapsed) / window + current
+            stats.append(
+                RateLimitStats(
+                    name=rate_limit.name,
+                    amount=rate_limit.amount,
+                    remaining=max(math.floor(rate_limit.amount - estimate), 0),
+                    reset_time=now - elapsed + window,
+                )
+            )
+            if index == exceeded:
+                retry_after = _get_retry_after(rate_limit, current, previous, elapsed)
+                self._block(key, rate_limit.name, now + retry_after)
+
+        if exceeded is None:
+            self._stats["allowed"] += 1
+            return RateLimitResult(allowed=True, exceeded=None, retry_after=0, stats=stats)
+        self._stats["limited"] += 1
+        return RateLimitResult(
+            allowed=False,
+            exceeded=limits[exceeded][1].name,
+            retry_after=retry_after,
+            stats=stats,
+        )
+
+    async def hit_api_key(
+        self, db_session: AsyncSession, api_key_id: UUID, project: Project
+    ) -> RateLimitResult:
+        """
+        Count a request of the API key against the limits of the API key and of its project.
+
+        Raises:
+            RateLimitExceeded: the API key or the project is over one of its limits
+        """
+        api_key_limits, project_limits = await self._get_tier(db_session, project.org_id)
+        result = await self.hit(
+            [(f"api_key:{api_key_id}", rate_limit) for rate_limit in api_key_limits]
+            + [(f"project:{project.id}", rate_limit) for rate_limit in project_limits]
+        )
+        if not result.allowed:
+            logger.warning(
+                f"Rate limit exceeded, rate_limit_name={result.exceeded}, "
+                f"api_key_id={api_key_id}, project_id={project.id}"
+            )
+            raise RateLimitExceeded(
+                f"{result.exceeded}, retry after {math.ceil(result.retry_after)}s"
+            )
+        return result
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"blocked_locally": len(self._blocked), "tiers": len(self._tiers), **self._stats}
+
+    @abc.abstractmethod
+    async def _hit(
+        self, limits: list[tuple[str, RateLimit]], now: float
+    ) -> tuple[int | None, list[tuple[int, int]]]:
+        """
+        Check all the limits and count the request in all of them if none is exceeded.
+
+        Returns:
+            The index of the first exceeded limit (None if allowed), and the current and previous
+            window counts of each limit (the current count includes the request if allowed)
+        """
+        pass
+
+    def _block(self, key: str, name: str, until: float) -> None:
+        self._blocked[(key, name)] = until
+        if len(self._blocked) > self.local_max_size:
+            now = time.time()
+            for blocked_key in [
+                k for k, blocked_until in self._blocked.items() if blocked_until <= now
+            ]:
+                del self._blocked[blocked_key]
+            while len(self._blocked) > self.local_max_size:
+                del self._blocked[next(iter(self._blocked))]
+
+    async def _get_tier(
+        self, db_session: AsyncSession, org_id: UUID
+    ) -> tuple[list[RateLimit], list[RateLimit]]:
+        cached = self._tiers.get(org_id)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            return cached[1], cached[2]
+
+        plan_rate_limits = None
+        try:
+            plan = await billing.get_active_plan_by_org_id(db_session, org_id)
+            if plan.features.get("rate_limits"):
+                plan_rate_limits = PlanRateLimits(**plan.features["rate_limits"])
+            else:
+                plan_rate_limits = self.plan_tiers.get(plan.name)
+        except Exception:
+            # never fail the request because of the plan, only the IP limits apply
+            logger.exception(f"Failed to get the rate limits of the plan, org_id={org_id}")
+
+        api_key_limits, project_limits = _to_rate_limits(plan_rate_limits)
+        self._tiers[org_id] = (now + self.tier_cache_ttl_seconds, api_key_limits, project_limits)
+        if len(self._tiers) > self.local_max_size:
+            for key in [
+                key for key, (expires_at, _, _) in self._tiers.items() if expires_at <= now
+            ]:
+                del self._tiers[key]
+            while len(self._tiers) > self.local_max_size:
+                del self._tiers[next(iter(self._tiers))]
+        return api_key_limits, project_limits
+
+    @staticmethod
+    def _counter_keys(key: str, rate_limit: RateLimit, now: float) -> tuple[str, str]:
+        """Names of the current and previous window counters of the key and limit."""
+        window_index = int(now // rate_limit.window_seconds)
+        prefix = f"{key}:{rate_limit.name}"
+        return f"{prefix}:{window_index}", f"{prefix}:{window_index - 1}"
+
+
+class InMemoryRateLimiter(RateLimiterBase):
+    """Limits per worker, for deployments without Redis."""
+
+    def __init__(
+        self,
+        plan_tiers: dict[str, dict[str, int]],
+        tier_cache_ttl_seconds: float,
+        local_max_size: int,
+    ):
+        super().__init__(plan_tiers, tier_cache_ttl_seconds, local_max_size)
+        # counter name -> (expires at, count)
+        self._counters: dict[str, tuple[float, int]] = {}
+
+    async def _hit(
+        self, limits: list[tuple[str, RateLimit]], now: float
+    ) -> tuple[int | None, list[tuple[int, int]]]:
+        # no await below, the check and the increments are atomic like the Lua script
+        counter_keys = [self._counter_keys(key, rate_limit, now) for key, rate_limit in limits]
+        counts = [
+            (self._get_count(current_key, now), self._get_count(previous_key, now))
+            for current_key, previous_key in counter_keys
+        ]
+        for index, ((_, rate_limit), (current, previous)) in enumerate(
+            zip(limits, counts, strict=True)
+        ):
+            window = rate_limit.window_seconds
+            estimate = previous * (window - now % window) / window + current
+            if estimate + 1 > rate_limit.amount:
+                return index, counts
+
+        incremented = []
+        for (_, rate_limit), (current_key, _), (current, previous) in zip(
+            limits, counter_keys, counts, strict=True
+        ):
+            # the counter is the previous window of the next window
+            expires_at = now + 2 * rate_limit.window_seconds
+            if current_key in self._counters:
+                expires_at = self._counters[current_key][0]
+            self._counters[current_key] = (expires_at, current + 1)
+            incremented.append((current + 1, previous))
+        self._evict(now)
+        return None, incremented
+
+    def _get_count(self, counter_key: str, now: float) -> int:
+        entry = self._counters.get(counter_key)
+        if entry is None:
+            return 0
+        if entry[0] <= now:
+            del self._counters[counter_key]
+            return 0
+        return entry[1]
+
+    def _evict(self, now: float) -> None:
+        if len(self._counters) <= self.local_max_size:
+            return
+        for key in [key for key, (expires_at, _) in self._counters.items() if expires_at <= now]:
+            del self._counters[key]
+        while len(self._counters) > self.local_max_size:
+            del self._counters[next(iter(self._counters))]
+
+
+class RedisRateLimiter(RateLimiterBase):
+    """Limits shared by all workers, one Redis call per request."""
+
+    def __init__(
+        self,
+        redis_client: Any,
+        key_prefix: str,
+        plan_tiers: dict[str, dict[str, int]],
+        tier_cache_ttl_seconds: float,
+        local_max_size: int,
+    ):
+        """
+        Args:
+            redis_client: the Redis client
+            key_prefix: prefix of the Redis keys of the counters
+        """
+        super().__init__(plan_tiers, tier_cache_ttl_seconds, local_max_size)
+        self.key_prefix = key_prefix
+        self._script = redis_client.register_script(_HIT_SCRIPT)
+
+    async def _hit(
+        self, limits: list[tuple[str, RateLimit]], now: float
+    ) -> tuple[int | None, list[tuple[int, int]]]:
+        keys = []
+        args = []
+        for key, rate_limit in limits:
+            current_key, previous_key = self._counter_keys(key, rate_limit, now)
+            keys += [f"{self.key_prefix}:{current_key}", f"{self.key_prefix}:{previous_key}"]
+            args += [rate_limit.amount, rate_limit.window_seconds * 1000]
+        args.append(int(now * 1000))
+
+        result = await self._script(keys=keys, args=args)
+        exceeded = int(result[0])
+        counts = [(int(result[i]), int(result[i + 1])) for i in range(1, len(result), 2)]
+        return (exceeded - 1 if exceeded else None), counts
+
+
+def _get_retry_after(rate_limit: RateLimit, current: int, previous: int, elapsed: float) -> float:
+    """Seconds until the sliding window estimate of the limit allows one more request."""
+    window = rate_limit.window_seconds
+    if current + 1 <= rate_limit.amount:
+        # the weight of the previous window has to decrease enough
+        needed = window * (1 - (rate_limit.amount - 1 - current) / previous) if previous else 0
+        return max(needed - elapsed, 0.0)
+    # wait for the next window, in which the current window is the previous one
+    needed = window * max(1 - (rate_limit.amount - 1) / current, 0.0) if current else 0.0
+    return window - elapsed + needed
+
+
+def _to_rate_limits(
+    plan_rate_limits: PlanRateLimits | None,
+) -> tuple[list[RateLimit], list[RateLimit]]:
+    """Per API key and per project limits, e.g. api_key_per_second -> api-key-per-second."""
+    api_key_limits: list[RateLimit] = []
+    project_limits: list[RateLimit] = []
+    if plan_rate_limits is None:
+        return api_key_limits, project_limits
+    for field_name, amount in plan_rate_limits.model_dump().items():
+        if amount is None:
+            continue
+        scope, unit = field_name.rsplit("_per_", 1)
+        rate_limit = RateLimit(
+            name=field_name.replace("_", "-"),
+            amount=amount,
+            window_seconds=_WINDOW_SECONDS[unit],
+        )
+        (api_key_limits if scope == "api_key" else project_limits).append(rate_limit)
+    return api_key_limits, project_limits
+
+
+rate_limiter: RateLimiterBase
+if config.REDIS_HOST:
+    from aci.server.redis_client import redis_client
+
+    rate_limiter = RedisRateLimiter(
+        redis_client=redis_client,
+        key_prefix=config.RATE_LIMIT_REDIS_KEY_PREFIX,
+        plan_tiers=config.RATE_LIMIT_PLAN_TIERS,
+        tier_cache_ttl_seconds=config.RATE_LIMIT_TIER_CACHE_TTL_SECONDS,
+        local_max_size=config.RATE_LIMIT_LOCAL_MAX_SIZE,
+    )
+else:
+    rate_limiter = InMemoryRateLimiter(
+        plan_tiers=config.RATE_LIMIT_PLAN_TIERS,
+        tier_cache_ttl_seconds=config.RATE_LIMIT_TIER_CACHE_TTL_SECONDS,
+        local_max_size=config.RATE_LIMIT_LOCAL_MAX_SIZE,
+    )
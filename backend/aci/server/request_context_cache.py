@@ -0,0 +1,121 @@
+"""
+Cache of the request contexts of the dev portal (JWT authenticated) routes.
+
+A single dev portal page load fires many API calls in parallel, each of them validating the JWT,
+loading the project and checking that it belongs to the organization of the user. The result of
+that is cached per (token, project id, organization id), so that only the first call pays for it.
+
+Entries never outlive the token (TTL bounded by the "exp" claim of the JWT, tokens without one are
+not cached), and are dropped when their project is updated or deleted. The cache is per worker,
+the other workers pick up project changes within the TTL.
+
+NOTE: like for API keys (see aci.server.api_key_cache), the project of a cached request context is
+a snapshot not attached to the session of the request, only its columns can be used.
+"""
+
+import base64
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+from propelauth_py.user import User
+
+from aci.common.db.sql_models import Project
+from aci.common.logging_setup import get_logger
+from aci.server import config
+from aci.server.api_key_cache import ProjectSnapshot
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _Entry:
+    expires_at: float
+    user: User
+    project: ProjectSnapshot
+
+
+class RequestContextCache:
+    def __init__(self, enabled: bool, ttl_seconds: float, max_size: int):
+        """
+        Args:
+            enabled: if False, nothing is cached
+            ttl_seconds: max ttl of the entries, lower if the token expires before
+            max_size: max number of entries, least recently used first out
+        """
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        # (token hash, project id, organization id) -> entry
+        self._entries: OrderedDict[tuple[str, UUID, UUID | None], _Entry] = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "invalidated": 0}
+
+    def get(self, token: str, project_id: UUID, org_id: UUID | None) -> tuple[User, Project] | None:
+        """
+        Returns:
+            The user of the token and the project, if the request context was cached
+        """
+        if not self.enabled:
+            return None
+        key = (_hash(token), project_id, org_id)
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self._stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return entry.user, entry.project.to_project()
+
+    def set(
+        self, token: str, project_id: UUID, org_id: UUID | None, user: User, project: Project
+    ) -> None:
+        """Cache a request context, the token must have been validated."""
+        if not self.enabled:
+            return
+        token_expires_at = _get_expiry(token)
+        if token_expires_at is None:
+            return
+        expires_at = min(time.time() + self.ttl_seconds, token_expires_at)
+        key = (_hash(token), project_id, org_id)
+        self._entries[key] = _Entry(expires_at, user, ProjectSnapshot.model_validate(project))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_project(self, project_id: UUID) -> None:
+        """Drop the request contexts of a project, e.g. when it's updated or deleted."""
+        keys = [key for key in self._entries if key[1] == project_id]
+        for key in keys:
+            del self._entries[key]
+        self._stats["invalidated"] += len(keys)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"size": len(self._entries), **self._stats}
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _get_expiry(token: str) -> float | None:
+    """The "exp" claim of a JWT (already validated, the signature isn't checked here)."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except Exception:
+        logger.warning("Failed to get the expiry of the token, not caching the request context")
+        return None
+
+
+request_context_cache = RequestContextCache(
+    enabled=config.REQUEST_CONTEXT_CACHE_ENABLED,
+    ttl_seconds=config.REQUEST_CONTEXT_CACHE_TTL_SECONDS,
+    max_size=config.REQUEST_CONTEXT_CACHE_MAX_SIZE,
+)
@@ -0,0 +1,152 @@
+"""
+Server-side pruning of function execution results, so that agents only get the fields they need
+instead of the full (often huge) upstream payload.
+
+Projections (requested with ?projection=... on the execute routes):
+- full: the result as returned by the upstream
+- schema: only the fields declared in the function response schema (Function.response)
+- minimal: only the fields listed in the "response_projection" of the function protocol_data, e.g.
+    "response_projection": ["id", "name", "items.id", "items.title"]
+  paths are dot separated, lists are traversed transparently. Falls back to the schema projection
+  if the function has no response_projection.
+
+Projections are compiled once per function (and re-compiled when the function is updated) into a
+tree of the fields to keep, see _compile_schema and _compile_paths.
+"""
+
+from collections import OrderedDict
+from typing import Any
+from uuid import UUID
+
+from aci.common.db.sql_models import Function
+from aci.common.enums import ResponseProjection
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.function import FunctionExecutionResult
+from aci.server import config
+
+logger = get_logger(__name__)
+
+# field name -> subtree of the fields to keep, None keeps the value as is
+_ProjectionTree = dict[str, "_ProjectionTree | None"]
+
+
+class ResponseProjector:
+    def __init__(self, default_projection: ResponseProjection, max_compiled: int):
+        """
+        Args:
+            default_projection: projection used when the caller doesn't request one
+            max_compiled: max number of compiled projections kept, least recently used first out
+        """
+        self.default_projection = default_projection
+        self.max_compiled = max_compiled
+        self._compiled: OrderedDict[
+            tuple[UUID, ResponseProjection], tuple[Any, _ProjectionTree | None]
+        ] = OrderedDict()
+        self._stats = {"compiled": 0, "projected": 0}
+
+    def project(
+        self,
+        function: Function,
+        result: FunctionExecutionResult,
+        projection: ResponseProjection | None = None,
+    ) -> FunctionExecutionResult:
+        """
+        Project the data of a successful result, failed results are returned as is.
+        Returns a new result, the given one (which may be shared with the response cache) is not
+        modified.
+        """
+        projection = projection or self.default_projection
+        if projection == ResponseProjection.FULL or not result.success or result.data is None:
+            return result
+
+        tree = self._get_tree(function, projection)
+        if tree is None:
+            return result
+
+        self._stats["projected"] += 1
+        return result.model_copy(update={"data": _apply(result.data, tree)})
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"size": len(self._compiled), **self._stats}
+
+    def _get_tree(
+        self, function: Function, projection: ResponseProjection
+    ) -> _ProjectionTree | None:
+        key = (function.id, projection)
+        version = function.updated_at
+        compiled = self._compiled.get(key)
+        if compiled is not None and compiled[0] == version:
+            self._compiled.move_to_end(key)
+            return compiled[1]
+
+        tree = _compile(function, projection)
+        self._compiled[key] = (version, tree)
+        self._compiled.move_to_end(key)
+        self._stats["compiled"] += 1
+        logger.debug(
+            f"Compiled response projection, function_name={function.name}, "
+            f"projection={projection}, tree={tree}"
+        )
+        while len(self._compiled) > self.max_compiled:
+            self._compiled.popitem(last=False)
+        return tree
+
+
+def _compile(function: Function, projection: ResponseProjection) -> _ProjectionTree | None:
+    if projection == ResponseProjection.MINIMAL:
+        paths = (function.protocol_data or {}).get("response_projection")
+        if paths:
+            return _compile_paths(paths)
+    return _compile_schema(function.response or {})
+
+
+def _compile_paths(paths: list[str]) -> _ProjectionTree:
+    tree: _ProjectionTree = {}
+    for path in paths:
+        node = tree
+        *parents, leaf = path.split(".")
+        for name in parents:
+            child = node.setdefault(name, {})
+            # a parent kept as a whole already includes the path
+            if child is None:
+                break
+            node = child
+        else:
+            node[leaf] = None
+    return tree
+
+
+def _compile_schema(schema: dict) -> _ProjectionTree | None:
+    """
+    Compile a JSON schema into the tree of its declared properties. Values whose schema doesn't
+    restrict the properties (no "properties", additionalProperties, combinators, ...) are kept.
+    """
+    if schema.get("type") == "array" or "items" in schema:
+        items = schema.get("items")
+        return _compile_schema(items) if isinstance(items, dict) else None
+
+    # unlike plain JSON schema validation, objects don't allow additional properties unless
+    # explicitly declared, otherwise nothing would ever be pruned
+    properties = schema.get("properties")
+    if not properties or schema.get("additionalProperties", False) is not False:
+        return None
+    return {
+        name: _compile_schema(subschema) if isinstance(subschema, dict) else None
+        for name, subschema in properties.items()
+    }
+
+
+def _apply(data: Any, tree: _ProjectionTree | None) -> Any:
+    if tree is None:
+        return data
+    if isinstance(data, list):
+        return [_apply(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {name: _apply(data[name], subtree) for name, subtree in tree.items() if name in data}
+    return data
+
+
+response_projector = ResponseProjector(
+    default_projection=ResponseProjection(config.FUNCTION_RESPONSE_PROJECTION_DEFAULT),
+    max_compiled=config.FUNCTION_RESPONSE_PROJECTION_MAX_COMPILED,
+)
@@ -8,6 +8,7 @@ from aci.common.logging_setup import get_logger
 from aci.common.schemas.api_key import APIKeyCreate, APIKeyPublic, APIKeyUpdate
 from aci.common.schemas.common import Paged
 from aci.server import acl
+from aci.server.api_key_cache import api_key_cache
 from aci.server.dependencies import RequestContext, get_request_context
 
 # Create router instance
@@ -131,6 +132,8 @@ async def update_api_key(
 
     api_key_public = APIKeyPublic.model_validate(updated_api_key)
     await context.db_session.commit()
+    # e.g. a disabled API key must stop working right away
+    await api_key_cache.invalidate([updated_api_key.key_hmac])
     return api_key_public
 
 
@@ -153,7 +156,11 @@ async def delete_api_key(
             detail=f"API key with name '{api_key_name}' not found"
         )
 
-    await crud.api_keys.delete_api_key_by_name(context.db_session, context.project.id, api_key_name)
+    key_hmac = await crud.api_keys.delete_api_key_by_name(
+        context.db_session, context.project.id, api_key_name
+    )
     await context.db_session.commit()
+    if key_hmac:
+        await api_key_cache.invalidate([key_hmac])
 
     logger.info(f"Deleted API key, api_key_name={api_key_name}, user_id={context.user.user_id}")
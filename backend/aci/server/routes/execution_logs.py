@@ -110,6 +110,7 @@ async def get_execution_logs(
             execution_time=log.execution_time,
             created_at=log.created_at,
             project_id=log.project_id,
+            cached=log.cached,
         )
         for log in execution_logs
     ]
@@ -219,6 +220,7 @@ async def get_execution_log_detail(
         execution_time=execution_log.execution_time,
         created_at=execution_log.created_at,
         project_id=execution_log.project_id,
+        cached=execution_log.cached,
         request=execution_detail.request if execution_detail else None,
         response=execution_detail.response if execution_detail else None,
     )
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import time
 import uuid
@@ -5,26 +6,42 @@ from datetime import UTC, datetime
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, status
+from pydantic import HttpUrl
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from aci.common.db import crud
 from aci.common.db.sql_models import Function, Project
-from aci.common.enums import FunctionDefinitionFormat, Visibility, ExecutionStatus
+from aci.common.enums import (
+    ExecutionStatus,
+    FunctionDefinitionFormat,
+    FunctionExecutionMode,
+    ResponseProjection,
+    Visibility,
+)
 from aci.common.exceptions import (
+    ACIException,
     AppConfigurationDisabled,
     AppConfigurationNotFound,
+    FunctionExecutionTimeout,
     FunctionNotFound,
     LinkedAccountDisabled,
     LinkedAccountNotFound,
+    UnexpectedError,
 )
 from aci.common.logging_setup import get_logger
+from aci.common.utils import create_db_async_session, parse_app_name_from_function_name
 from aci.common.schemas.function import (
     AnthropicFunctionDefinition,
     BasicFunctionDefinition,
     FunctionDetails,
     FunctionExecute,
+    FunctionExecuteBatch,
+    FunctionExecuteBatchItem,
+    FunctionExecuteBatchItemResult,
+    FunctionExecuteBatchResult,
     FunctionExecutionResult,
+    FunctionJob,
     FunctionsList,
     FunctionsSearch,
     OpenAIFunctionDefinition,
@@ -32,11 +49,20 @@ from aci.common.schemas.function import (
 )
 from aci.server import config, utils
 from aci.server import dependencies as deps
-from aci.server import security_credentials_manager as scm
 from aci.server.context import request_id_ctx_var
-from aci.server.execution_logs.execution_log_appender import log_appender
-from aci.server.function_executors import get_executor
-from aci.server.security_credentials_manager import SecurityCredentialsResponse
+from aci.server.execution_context_resolver import execution_context_resolver
+from aci.server.execution_deadline import (
+    apply_function_timeout,
+    cancel_on_disconnect,
+    execution_deadline,
+)
+from aci.server.execution_logs.execution_log_appender import LogEvent, log_appender
+from aci.server.fair_share_scheduler import fair_share_scheduler
+from aci.server.function_execution import execute_with_credentials
+from aci.server.function_jobs import FunctionJobSpec, function_job_queue
+from aci.server.last_used_at_recorder import last_used_at_recorder
+from aci.server.quota_service import consume_monthly_quota
+from aci.server.response_projection import response_projector
 from aci.server.utils import format_function_definition
 
 router = APIRouter()
@@ -172,50 +198,339 @@ async def get_function_definition(
 # (enabled, configured, accessible, etc.)?
 @router.post(
     "/{function_name}/execute",
-    response_model=FunctionExecutionResult,
+    response_model=FunctionExecutionResult | FunctionJob,
     response_model_exclude_none=True,
 )
 async def execute(
         context: Annotated[deps.RequestContext2, Depends(deps.validate_monthly_quota)],
         function_name: str,
         body: FunctionExecute,
+        request: Request,
+        response: Response,
+        projection: ResponseProjection | None = Query(  # noqa: B008
+            default=None,
+            description="The projection of the result data: 'full', 'schema' (only the fields of "
+                        "the function response schema) or 'minimal'. Defaults to the server default.",
+        ),
+        mode: FunctionExecutionMode = Query(  # noqa: B008
+            default=FunctionExecutionMode.SYNC,
+            description="'async' returns a job right away (202) instead of waiting for the result, "
+                        f"the result can then be fetched with GET {config.ROUTER_PREFIX_JOBS}/{{job_id}}.",
+        ),
+        webhook_url: HttpUrl | None = Query(  # noqa: B008
+            default=None,
+            description="With mode=async, the finished job is POSTed to this url (https only, "
+                        "signed with the key of GET "
+                        f"{config.ROUTER_PREFIX_JOBS}/webhook-signing-key).",
+        ),
+        request_timeout: float | None = Header(
+            default=None,
+            alias=config.REQUEST_TIMEOUT_HEADER,
+            gt=0,
+            description="Deadline of the execution in seconds, the execution is cancelled past it. "
+                        "Defaults to the timeout of the function or the server default.",
+        ),
+) -> FunctionExecutionResult | FunctionJob:
+    if mode == FunctionExecutionMode.ASYNC:
+        job = await function_job_queue.submit(
+            function_name,
+            FunctionJobSpec(
+                project_id=context.project.id,
+                api_key_name=context.api_key_name,
+                function_name=function_name,
+                function_input=body.function_input,
+                linked_account_owner_id=body.linked_account_owner_id,
+                projection=projection,
+                timeout_seconds=request_timeout,
+                webhook_url=str(webhook_url) if webhook_url else None,
+            ),
+        )
+        response.status_code = status.HTTP_202_ACCEPTED
+        return job
+
+    execution_id = request_id_ctx_var.get(None)
+    # stop working for clients that are gone
+    return await cancel_on_disconnect(
+        request,
+        _execute_and_log(
+            db_session=context.db_session,
+            project=context.project,
+            api_key_name=context.api_key_name,
+            function_name=function_name,
+            function_input=body.function_input,
+            linked_account_owner_id=body.linked_account_owner_id,
+            projection=projection,
+            timeout_seconds=request_timeout,
+            execution_id=UUID(execution_id) if execution_id else uuid.uuid4(),
+        ),
+    )
+
+
+async def run_function_job(job_id: UUID, spec: FunctionJobSpec) -> FunctionExecutionResult:
+    """Execute the function of an async job (see aci.server.function_jobs), logged like the sync route."""
+    db_session = create_db_async_session(config.DB_FULL_URL, expire_on_commit=False)
+    try:
+        project = await crud.projects.get_project(db_session, spec.project_id)
+        if project is None:
+            return FunctionExecutionResult(success=False, error=f"project={spec.project_id} not found")
+        return await _execute_and_log(
+            db_session=db_session,
+            project=project,
+            api_key_name=spec.api_key_name,
+            function_name=spec.function_name,
+            function_input=spec.function_input,
+            linked_account_owner_id=spec.linked_account_owner_id,
+            projection=spec.projection,
+            timeout_seconds=spec.timeout_seconds,
+            # the execution log has the id of the job
+            execution_id=job_id,
+        )
+    except ACIException as e:
+        logger.warning(f"Failed to execute function job, job_id={job_id}, error={e}")
+        return FunctionExecutionResult(success=False, error=_format_error(e))
+    finally:
+        await db_session.close()
+
+
+async def _execute_and_log(
+        db_session: AsyncSession,
+        project: Project,
+        api_key_name: str | None,
+        function_name: str,
+        function_input: dict,
+        linked_account_owner_id: str,
+        projection: ResponseProjection | None,
+        timeout_seconds: float | None,
+        execution_id: UUID,
 ) -> FunctionExecutionResult:
     start_time = datetime.now(UTC)
 
     start = time.perf_counter()
     created_at = datetime.now(UTC)
 
-    result, app_name, linked_account_owner_id, app_configuration_id = await execute_function(
-        db_session=context.db_session,
-        project=context.project,
-        function_name=function_name,
-        function_input=body.function_input,
-        linked_account_owner_id=body.linked_account_owner_id,
-        project_id=context.project.id,
-    )
+    # don't hold a database connection while waiting to be admitted
+    await db_session.commit()
+    try:
+        async with (
+            execution_deadline(timeout_seconds),
+            fair_share_scheduler.admit(project.id, project.org_id),
+        ):
+            result, app_name, linked_account_owner_id, app_configuration_id, cached = await execute_function(
+                db_session=db_session,
+                project=project,
+                function_name=function_name,
+                function_input=function_input,
+                linked_account_owner_id=linked_account_owner_id,
+                project_id=project.id,
+                projection=projection,
+            )
+    except FunctionExecutionTimeout as e:
+        # the quota is consumed and the upstream may have been called, log it like a failure
+        await log_appender.enqueue(
+            function_name=function_name,
+            app_name=parse_app_name_from_function_name(function_name),
+            project_id=project.id,
+            status=ExecutionStatus.FAILED,
+            execution_time=int((time.perf_counter() - start) * 1000),
+            linked_account_owner_id=linked_account_owner_id,
+            api_key_name=api_key_name,
+            request=function_input,
+            response=_format_error(e),
+            created_at=created_at,
+            execution_id=execution_id,
+        )
+        raise
 
     end = time.perf_counter()
     execution_time = int((end - start) * 1000)
-    execution_id = request_id_ctx_var.get(None)
-    execution_id = UUID(execution_id) if execution_id else uuid.uuid4()
 
     await log_appender.enqueue(
         function_name=function_name,
         app_name=app_name,
-        project_id=context.project.id,
+        project_id=project.id,
         status=ExecutionStatus.SUCCESS if result.success else ExecutionStatus.FAILED,
         execution_time=execution_time,
         linked_account_owner_id=linked_account_owner_id,
         app_configuration_id=str(app_configuration_id),
-        api_key_name=context.api_key_name,
-        request=body.function_input,
+        api_key_name=api_key_name,
+        request=function_input,
         response=result.data if result.success else result.error,
         created_at=created_at,
         execution_id=execution_id,
+        cached=cached,
     )
 
     end_time = datetime.now(UTC)
 
+    _log_function_execution(
+        function_name, linked_account_owner_id, function_input, result, start_time, end_time
+    )
+    return result
+
+
+@router.post(
+    "/execute-batch",
+    response_model=FunctionExecuteBatchResult,
+    response_model_exclude_none=True,
+)
+async def execute_batch(
+        context: Annotated[deps.RequestContext2, Depends(deps.get_request_context2_for_quota)],
+        body: FunctionExecuteBatch,
+        request: Request,
+        projection: ResponseProjection | None = Query(  # noqa: B008
+            default=None,
+            description="The projection of the result data of every item, see the execute route.",
+        ),
+        request_timeout: float | None = Header(
+            default=None,
+            alias=config.REQUEST_TIMEOUT_HEADER,
+            gt=0,
+            description="Deadline of each item in seconds, see the execute route.",
+        ),
+) -> FunctionExecuteBatchResult:
+    """
+    Execute several functions concurrently in one request, e.g. all tool calls of one LLM turn.
+    Quota is consumed once for all items. Results are returned in the same order as the items, a
+    failing item doesn't fail the others.
+    """
+    await consume_monthly_quota(context.db_session, context.project.id, len(body.items))
+
+    semaphore = asyncio.Semaphore(config.FUNCTION_EXECUTE_BATCH_MAX_CONCURRENCY)
+    outcomes = await cancel_on_disconnect(
+        request,
+        asyncio.gather(
+            *[
+                _execute_batch_item(context, item, semaphore, projection, request_timeout)
+                for item in body.items
+            ]
+        ),
+    )
+
+    # items that could not be executed at all (e.g. function not found) are not logged,
+    # same as for the single execute route, timed out items are
+    log_events = [log_event for _, log_event in outcomes if log_event is not None]
+    if log_events:
+        await log_appender.enqueue_many(log_events)
+
+    return FunctionExecuteBatchResult(results=[item_result for item_result, _ in outcomes])
+
+
+async def _execute_batch_item(
+        context: deps.RequestContext2,
+        item: FunctionExecuteBatchItem,
+        semaphore: asyncio.Semaphore,
+        projection: ResponseProjection | None,
+        timeout_seconds: float | None,
+) -> tuple[FunctionExecuteBatchItemResult, LogEvent | None]:
+    async with semaphore:
+        start_time = datetime.now(UTC)
+        start = time.perf_counter()
+        # a session can't be used by concurrent tasks, so each item gets its own
+        db_session = create_db_async_session(config.DB_FULL_URL, expire_on_commit=False)
+        try:
+            async with (
+                execution_deadline(timeout_seconds),
+                fair_share_scheduler.admit(context.project.id, context.project.org_id),
+            ):
+                (
+                    result,
+                    app_name,
+                    linked_account_owner_id,
+                    app_configuration_id,
+                    cached,
+                ) = await execute_function(
+                    db_session=db_session,
+                    project=context.project,
+                    function_name=item.function_name,
+                    function_input=item.function_input,
+                    linked_account_owner_id=item.linked_account_owner_id,
+                    project_id=context.project.id,
+                    projection=projection,
+                )
+        except Exception as e:
+            if isinstance(e, ACIException):
+                error = e
+            else:
+                logger.exception(
+                    f"Unexpected error executing batch item, function_name={item.function_name}"
+                )
+                error = UnexpectedError()
+            logger.warning(
+                f"Failed to execute batch item, function_name={item.function_name}, error={error}"
+            )
+            item_result = FunctionExecuteBatchItemResult(
+                function_name=item.function_name,
+                status=ExecutionStatus.FAILED,
+                success=False,
+                error=_format_error(error),
+                error_code=error.error_code,
+            )
+            if not isinstance(error, FunctionExecutionTimeout):
+                return item_result, None
+            # the quota is consumed and the upstream may have been called, log it like a failure
+            log_event = LogEvent(
+                id=uuid.uuid4(),
+                function_name=item.function_name,
+                app_name=parse_app_name_from_function_name(item.function_name),
+                api_key_name=context.api_key_name,
+                linked_account_owner_id=item.linked_account_owner_id,
+                app_configuration_id=None,
+                status=ExecutionStatus.FAILED,
+                execution_time=int((time.perf_counter() - start) * 1000),
+                created_at=start_time,
+                project_id=context.project.id,
+                request=item.function_input,
+                response=item_result.error,
+            )
+            return item_result, log_event
+        finally:
+            await db_session.close()
+
+        execution_time = int((time.perf_counter() - start) * 1000)
+        end_time = datetime.now(UTC)
+        _log_function_execution(
+            item.function_name, item.linked_account_owner_id, item.function_input, result, start_time, end_time
+        )
+
+    status = ExecutionStatus.SUCCESS if result.success else ExecutionStatus.FAILED
+    log_event = LogEvent(
+        id=uuid.uuid4(),
+        function_name=item.function_name,
+        app_name=app_name,
+        api_key_name=context.api_key_name,
+        linked_account_owner_id=linked_account_owner_id,
+        app_configuration_id=app_configuration_id,
+        status=status,
+        execution_time=execution_time,
+        created_at=start_time,
+        project_id=context.project.id,
+        request=item.function_input,
+        response=result.data if result.success else result.error,
+        cached=cached,
+    )
+    item_result = FunctionExecuteBatchItemResult(
+        function_name=item.function_name,
+        status=status,
+        success=result.success,
+        data=result.data,
+        error=result.error,
+    )
+    return item_result, log_event
+
+
+def _format_error(error: ACIException) -> str:
+    # same error format as the global exception handler
+    return f"{error.title}, {error.message}" if error.message else error.title
+
+
+def _log_function_execution(
+        function_name: str,
+        linked_account_owner_id: str,
+        function_input: dict,
+        result: FunctionExecutionResult,
+        start_time: datetime,
+        end_time: datetime,
+) -> None:
     # TODO: reconsider the implementation handling large log fields
     try:
         execute_result_data = utils.truncate_if_too_large(
@@ -227,7 +542,7 @@ async def execute(
 
     try:
         function_input_data = utils.truncate_if_too_large(
-            json.dumps(body.function_input, default=str), config.MAX_LOG_FIELD_SIZE
+            json.dumps(function_input, default=str), config.MAX_LOG_FIELD_SIZE
         )
     except Exception:
         logger.exception("Failed to dump function_input_data")
@@ -239,7 +554,7 @@ async def execute(
             "function_execution": {
                 "app_name": function_name.split("__")[0] if "__" in function_name else "unknown",
                 "function_name": function_name,
-                "linked_account_owner_id": body.linked_account_owner_id,
+                "linked_account_owner_id": linked_account_owner_id,
                 "function_execution_start_time": start_time,
                 "function_execution_end_time": end_time,
                 "function_execution_duration": (end_time - start_time).total_seconds(),
@@ -251,7 +566,6 @@ async def execute(
             }
         },
     )
-    return result
 
 
 async def execute_function(
@@ -261,19 +575,22 @@ async def execute_function(
         function_input: dict,
         linked_account_owner_id: str,
         project_id: UUID | None = None,
-) -> tuple[FunctionExecutionResult, str, str, UUID]:
+        projection: ResponseProjection | None = None,
+) -> tuple[FunctionExecutionResult, str, str, UUID, bool]:
     """
     Execute a function with the given parameters.
 
     Args:
-        db_session: Database session
+        db_session: Database session, must not expire objects on commit
         project: Project object
         function_name: Name of the function to execute
         function_input: Input parameters for the function
         linked_account_owner_id: ID of the linked account owner
+        projection: projection of the result data, defaults to the server default
 
     Returns:
-        FunctionExecutionResult: Result of the function execution
+        FunctionExecutionResult: Result of the function execution, then the app name, linked account
+        owner id, app configuration id, and whether the result was served from the response cache
 
     Raises:
         FunctionNotFound: If the function is not found
@@ -282,31 +599,25 @@ async def execute_function(
         LinkedAccountNotFound: If the linked account is not found
         LinkedAccountDisabled: If the linked account is disabled
     """
-    # Get the function
-    function = await crud.functions.get_function(
+    # Get the function, app configuration and linked account in one go
+    execution_context = await execution_context_resolver.resolve_for_project(
         db_session,
+        project,
         function_name,
-        project.visibility_access == Visibility.PUBLIC,
-        True,
+        linked_account_owner_id,
+        project_id=project_id,
     )
-    if not function:
-        # Try to get the function by name from user apps
-        function = await crud.functions.get_user_function_by_name(
-            db_session,
-            function_name,
-            project_id=project_id,
+    if not execution_context:
+        logger.error(
+            f"Failed to execute function, function not found, function_name={function_name}"
         )
-
-        if not function:
-            logger.error(
-                f"Failed to execute function, function not found, function_name={function_name}"
-            )
-            raise FunctionNotFound(f"function={function_name} not found")
+        raise FunctionNotFound(f"function={function_name} not found")
+    function = execution_context.function
+    app_configuration = execution_context.app_configuration
+    linked_account = execution_context.linked_account
+    apply_function_timeout(function)
 
     # Check if the App (that this function belongs to) is configured
-    app_configuration = await crud.app_configurations.get_app_configuration(
-        db_session, project.id, function.app.name
-    )
     if not app_configuration:
         logger.error(
             f"Failed to execute function, app configuration not found, "
@@ -326,12 +637,6 @@ async def execute_function(
         )
 
     # Check if the linked account status (configured, enabled, etc.)
-    linked_account = await crud.linked_accounts.get_linked_account(
-        db_session,
-        project.id,
-        function.app.name,
-        linked_account_owner_id,
-    )
     if not linked_account:
         logger.error(
             f"Failed to execute function, linked account not found, "
@@ -352,43 +657,20 @@ async def execute_function(
             f"please enable the account for this app here: {config.DEV_PORTAL_URL}/appconfigs/{function.app.name}"
         )
 
-    security_credentials_response: SecurityCredentialsResponse = await scm.get_security_credentials(
-        app_configuration.app, app_configuration, linked_account
-    )
-
-    await scm.update_security_credentials(
-        db_session, function.app, linked_account, security_credentials_response
-    )
-
-    logger.info(
-        f"Fetched security credentials for function execution, function_name={function_name}, "
-        f"app_name={function.app.name}, linked_account_owner_id={linked_account_owner_id}, "
-        f"linked_account_id={linked_account.id}, is_updated={security_credentials_response.is_updated}, "
-        f"is_app_default_credentials={security_credentials_response.is_app_default_credentials}"
-    )
+    # Nothing below needs the database unless the credentials get refreshed, so end the (read-only)
+    # transaction here and give the connection back to the pool, instead of holding it while waiting
+    # on the token refresh and the upstream call.
+    # NOTE: db_session must not expire objects on commit (expire_on_commit=False)
     await db_session.commit()
 
-    function_executor = get_executor(function.protocol, linked_account)
-    logger.info(
-        f"Instantiated function executor, function_executor={type(function_executor)}, "
-        f"function={function_name}"
+    execution_result, cached = await execute_with_credentials(
+        db_session, function, function_input, app_configuration, linked_account
     )
 
-    # Execute the function
-    execution_result = function_executor.execute(
-        function,
-        function_input,
-        security_credentials_response.scheme,
-        security_credentials_response.credentials,
-    )
+    # projected after the cache, which holds the full results shared by all projections
+    execution_result = response_projector.project(function, execution_result, projection)
 
-    last_used_at: datetime = datetime.now(UTC)
-    await crud.linked_accounts.update_linked_account_last_used_at(
-        db_session,
-        last_used_at,
-        linked_account,
-    )
-    await db_session.commit()
+    await last_used_at_recorder.record_linked_account_used(linked_account.id, datetime.now(UTC))
 
     if not execution_result.success:
         logger.error(
@@ -396,4 +678,4 @@ async def execute_function(
             f"error={execution_result.error}"
         )
 
-    return execution_result, function.app.name, linked_account_owner_id, app_configuration.id
+    return execution_result, function.app.name, linked_account_owner_id, app_configuration.id, cached
@@ -1,6 +1,26 @@
-from fastapi import APIRouter
+from typing import Any
+
+from fastapi import APIRouter, Depends
 
 from aci.common.logging_setup import get_logger
+from aci.common.utils import TimedAsyncQueuePool, get_db_async_engine
+from aci.server import config
+from aci.server.api_key_cache import api_key_cache
+from aci.server.connector_execution_engine import connector_execution_engine
+from aci.server.connector_instance_cache import connector_instance_cache
+from aci.server.connector_registry import connector_registry
+from aci.server.dependencies import validate_metrics_token
+from aci.server.e2b_sandbox_pool import e2b_sandbox_pool
+from aci.server.fair_share_scheduler import fair_share_scheduler
+from aci.server.function_jobs import function_job_queue
+from aci.server.function_response_cache import function_response_cache
+from aci.server.oauth2_client_pool import oauth2_client_pool
+from aci.server.oauth2_token_refresher import oauth2_token_refresher
+from aci.server.quota_service import quota_counter
+from aci.server.rate_limiter import rate_limiter
+from aci.server.request_context_cache import request_context_cache
+from aci.server.response_projection import response_projector
+from aci.server.upstream_resilience import bulkhead_registry, circuit_breaker_registry
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -10,3 +30,38 @@ router = APIRouter()
 @router.get("", include_in_schema=False)
 async def health() -> bool:
     return True
+
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(validate_metrics_token)])
+async def metrics() -> dict[str, Any]:
+    """
+    In-process runtime metrics of the worker serving the request. Internal only, requires the
+    metrics token (config.METRICS_TOKEN) in the X-METRICS-TOKEN header.
+    """
+    db_pool = get_db_async_engine(config.DB_FULL_URL).pool
+    return {
+        "db_pool": {
+            "size": db_pool.size(),
+            "checked_out": db_pool.checkedout(),
+            "overflow": db_pool.overflow(),
+            **db_pool.get_wait_metrics(),
+        }
+        if isinstance(db_pool, TimedAsyncQueuePool)
+        else {},
+        "api_key_cache": api_key_cache.get_metrics(),
+        "connector_execution": connector_execution_engine.get_metrics(),
+        "connector_instances": connector_instance_cache.get_metrics(),
+        "connector_registry": connector_registry.get_metrics(),
+        "e2b_sandbox_pool": e2b_sandbox_pool.get_metrics(),
+        "oauth2_token_refresh": oauth2_token_refresher.get_metrics(),
+        "oauth2_client_pool": oauth2_client_pool.get_metrics(),
+        "upstream_circuits": circuit_breaker_registry.get_metrics(),
+        "upstream_bulkheads": bulkhead_registry.get_metrics(),
+        "request_context_cache": request_context_cache.get_metrics(),
+        "function_response_cache": function_response_cache.get_metrics(),
+        "response_projection": response_projector.get_metrics(),
+        "function_jobs": function_job_queue.get_metrics(),
+        "fair_share": fair_share_scheduler.get_metrics(),
+        "rate_limiter": rate_limiter.get_metrics(),
+        "quota_counter": quota_counter.get_metrics(),
+    }
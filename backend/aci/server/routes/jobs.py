@@ -0,0 +1,49 @@
+from typing import Annotated
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Query
+
+from aci.common.exceptions import FunctionJobNotFound, FunctionJobWebhookNotAllowed
+from aci.common.logging_setup import get_logger
+from aci.common.schemas.function import FunctionJob, FunctionJobWebhookSigningKey
+from aci.server import config
+from aci.server import dependencies as deps
+from aci.server.function_jobs import function_job_queue, get_webhook_signing_key
+
+router = APIRouter()
+logger = get_logger(__name__)
+
+
+# NOTE: declared before /{job_id}, which would match it otherwise
+@router.get("/webhook-signing-key", response_model=FunctionJobWebhookSigningKey)
+async def get_webhook_signing_key_of_project(
+        context: Annotated[deps.RequestContext2, Depends(deps.get_request_context2)],
+) -> FunctionJobWebhookSigningKey:
+    """Get the key the completion webhooks of the project's function jobs are signed with."""
+    if not config.FUNCTION_JOBS_WEBHOOK_SIGNING_SECRET:
+        raise FunctionJobWebhookNotAllowed("webhooks are not enabled")
+    return FunctionJobWebhookSigningKey(signing_key=get_webhook_signing_key(context.project.id))
+
+
+@router.get("/{job_id}", response_model=FunctionJob, response_model_exclude_none=True)
+async def get_job(
+        context: Annotated[deps.RequestContext2, Depends(deps.get_request_context2)],
+        job_id: UUID,
+        wait_seconds: int = Query(
+            default=0,
+            ge=0,
+            le=config.FUNCTION_JOBS_MAX_WAIT_SECONDS,
+            description="Wait up to this many seconds for the job to finish before returning it "
+                        "(long-polling).",
+        ),
+) -> FunctionJob:
+    """Get a job of an async function execution (?mode=async), with its result once finished."""
+    project_id = context.project.id
+    # don't hold a database connection while long-polling
+    await context.db_session.close()
+
+    job = await function_job_queue.get(job_id, project_id, wait_seconds)
+    if job is None:
+        logger.error(f"Function job not found, job_id={job_id}, project_id={project_id}")
+        raise FunctionJobNotFound(f"job={job_id} not found")
+    return job
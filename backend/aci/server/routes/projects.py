@@ -12,7 +12,9 @@ from aci.common.exceptions import (
 from aci.common.logging_setup import get_logger
 from aci.common.schemas.project import ProjectCreate, ProjectPublic, ProjectUpdate
 from aci.server import acl, quota_manager
+from aci.server.api_key_cache import api_key_cache
 from aci.server.dependencies import RequestContext, get_request_context
+from aci.server.request_context_cache import request_context_cache
 
 # Create router instance
 router = APIRouter()
@@ -88,8 +90,11 @@ async def delete_project(
         )
         raise ProjectIsLastInOrgError()
 
+    key_hmacs = await crud.api_keys.get_api_key_hmacs_by_project(context.db_session, project_id)
     await crud.projects.delete_project(context.db_session, project_id)
     await context.db_session.commit()
+    await api_key_cache.invalidate(key_hmacs)
+    request_context_cache.invalidate_project(project_id)
 
 
 @router.patch("/{project_id}", response_model=ProjectPublic, include_in_schema=True)
@@ -114,5 +119,9 @@ async def update_project(
     updated_project = await crud.projects.update_project(context.db_session, project, body)
 
     project_public = ProjectPublic.model_validate(updated_project)
+    key_hmacs = await crud.api_keys.get_api_key_hmacs_by_project(context.db_session, project_id)
     await context.db_session.commit()
+    # API keys and request contexts are cached with a snapshot of their project
+    await api_key_cache.invalidate(key_hmacs)
+    request_context_cache.invalidate_project(project_id)
     return project_public
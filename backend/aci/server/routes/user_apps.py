@@ -16,6 +16,7 @@ from aci.common.schemas.function import BasicFunctionDefinition, FunctionDetails
 from aci.common.schemas.security_scheme import SecuritySchemesPublic
 from aci.server import acl
 from aci.server.dependencies import RequestContext, get_request_context
+from aci.server.function_executors.function_input_validator import function_input_validator_cache
 from aci.server.utils import format_function_definition
 
 logger = get_logger(__name__)
@@ -245,8 +246,11 @@ async def create_user_app_functions(
             remove_previous,
             context.project.id,
         )
+        function_ids = [function.id for function in functions]
         functions = [format_function_definition(function, format=FunctionDefinitionFormat.BASIC) for function in functions]
         await context.db_session.commit()
+        for function_id in function_ids:
+            function_input_validator_cache.invalidate(function_id)
         return functions
     except ConflictError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
@@ -8,6 +8,7 @@ from aci.common.exceptions import ConflictError, FunctionNotFound
 from aci.common.logging_setup import get_logger
 from aci.common.schemas.function import BasicFunctionDefinition, FunctionDetails, FunctionUpdate
 from aci.server.dependencies import get_request_context, RequestContext
+from aci.server.function_executors.function_input_validator import function_input_validator_cache
 from aci.server.utils import format_function_definition
 
 logger = get_logger(__name__)
@@ -84,13 +85,14 @@ async def update_user_function(
     Update a user function by function name.
     """
     try:
-        await crud.functions.update_user_function(
+        function = await crud.functions.update_user_function(
             context.db_session,
             function_name,
             function_update,
             context.project.id,
         )
         await context.db_session.commit()
+        function_input_validator_cache.invalidate(function.id)
         logger.info(f"Updated user function: {function_name} for project id: {context.project.id}")
     except FunctionNotFound as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
@@ -1,12 +1,11 @@
-import time
-
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
 from aci.common.db import crud
 from aci.common.db.sql_models import App, AppConfiguration, LinkedAccount
 from aci.common.enums import SecurityScheme
-from aci.common.exceptions import NoImplementationFound, OAuth2Error
+from aci.common.exceptions import NoImplementationFound
 from aci.common.logging_setup import get_logger
 from aci.common.schemas.security_scheme import (
     APIKeyScheme,
@@ -17,7 +16,8 @@ from aci.common.schemas.security_scheme import (
     OAuth2SchemeCredentials,
     SecuritySchemeOverrides,
 )
-from aci.server.oauth2_manager import OAuth2Manager
+from aci.server.connector_instance_cache import connector_instance_cache
+from aci.server.oauth2_token_refresher import oauth2_token_refresher
 
 logger = get_logger(__name__)
 
@@ -80,6 +80,7 @@ async def update_security_credentials(
             linked_account,
             security_credentials=security_credentials_response.credentials,
         )
+        connector_instance_cache.invalidate(linked_account.id)
 
     await db_session.refresh(linked_account)
 
@@ -88,79 +89,38 @@ async def _get_oauth2_credentials(
     app: App, app_configuration: AppConfiguration, linked_account: LinkedAccount
 ) -> SecurityCredentialsResponse:
     """Get OAuth2 credentials from linked account or app's default credentials.
-    If the access token is expired, it will be refreshed.
+    If the access token is expired (or about to), it will be refreshed. The refreshed credentials
+    are saved by the refresher itself, so is_updated is always False.
     """
-    is_updated = False
     oauth2_scheme = get_app_configuration_oauth2_scheme(app_configuration.app, app_configuration)
     oauth2_scheme_credentials = OAuth2SchemeCredentials.model_validate(
         linked_account.security_credentials
     )
-    if _access_token_is_expired(oauth2_scheme_credentials):
+    if oauth2_token_refresher.is_expired(oauth2_scheme_credentials):
         logger.warning(
             f"Access token expired, trying to refresh linked_account_id={linked_account.id}, "
             f"security_scheme={linked_account.security_scheme}, app={app.name}"
         )
-        token_response = await _refresh_oauth2_access_token(
-            app.name, oauth2_scheme, oauth2_scheme_credentials
+        oauth2_scheme_credentials = await oauth2_token_refresher.refresh(
+            app.name, oauth2_scheme, linked_account.id
         )
-        # TODO: refactor parsing to _refresh_oauth2_access_token
-        expires_at: int | None = None
-        if "expires_at" in token_response:
-            expires_at = int(token_response["expires_at"])
-        elif "expires_in" in token_response:
-            expires_at = int(time.time()) + int(token_response["expires_in"])
-
-        if not token_response.get("access_token") or not expires_at:
-            logger.error(
-                f"Failed to refresh access token, token_response={token_response}, "
-                f"app={app.name}, linked_account_id={linked_account.id}, "
-                f"security_scheme={linked_account.security_scheme}"
-            )
-            raise OAuth2Error("failed to refresh access token")
-
-        fields_to_update = {
-            "access_token": token_response["access_token"],
-            "expires_at": expires_at,
-        }
-        # NOTE: some app's refresh token can only be used once, so we need to update the refresh token (if returned)
-        if token_response.get("refresh_token"):
-            fields_to_update["refresh_token"] = token_response["refresh_token"]
-
-        oauth2_scheme_credentials = oauth2_scheme_credentials.model_copy(
-            update=fields_to_update,
+        # keep the caller's (possibly detached) linked account in sync with the saved credentials
+        set_committed_value(
+            linked_account,
+            "security_credentials",
+            oauth2_scheme_credentials.model_dump(mode="json"),
         )
-        is_updated = True
 
+    oauth2_token_refresher.track(
+        linked_account.id, app.name, oauth2_scheme, oauth2_scheme_credentials
+    )
     return SecurityCredentialsResponse(
         scheme=oauth2_scheme,
         credentials=oauth2_scheme_credentials,
         is_app_default_credentials=False,  # Should never support default credentials for oauth2
-        is_updated=is_updated,
-    )
-
-
-async def _refresh_oauth2_access_token(
-    app_name: str, oauth2_scheme: OAuth2Scheme, oauth2_scheme_credentials: OAuth2SchemeCredentials
-) -> dict:
-    refresh_token = oauth2_scheme_credentials.refresh_token
-    if not refresh_token:
-        raise OAuth2Error("no refresh token found")
-
-    # NOTE: it's important to use oauth2_scheme_credentials's client_id, client_secret, scope because
-    # these fields might have changed for the app configuration after the linked account was created
-    oauth2_manager = OAuth2Manager(
-        app_name=app_name,
-        client_id=oauth2_scheme_credentials.client_id,
-        client_secret=oauth2_scheme_credentials.client_secret,
-        scope=oauth2_scheme_credentials.scope,
-        authorize_url=oauth2_scheme.authorize_url,
-        access_token_url=oauth2_scheme.access_token_url,
-        refresh_token_url=oauth2_scheme.refresh_token_url,
-        token_endpoint_auth_method=oauth2_scheme.token_endpoint_auth_method,
+        is_updated=False,
     )
 
-    return await oauth2_manager.refresh_token(refresh_token)
-
 
 def _get_api_key_credentials(
     app: App, linked_account: LinkedAccount
@@ -209,13 +169,6 @@ def _get_no_auth_credentials(
     )
 
 
-# TODO: consider adding leeway for expiration
-def _access_token_is_expired(oauth2_credentials: OAuth2SchemeCredentials) -> bool:
-    if oauth2_credentials.expires_at is None:
-        return False
-    return oauth2_credentials.expires_at < int(time.time())
-
-
 def get_app_configuration_oauth2_scheme(
     app: App, app_configuration: AppConfiguration
 ) -> OAuth2Scheme:
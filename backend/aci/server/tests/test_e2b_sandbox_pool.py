@@ -0,0 +1,244 @@
+import asyncio
+import itertools
+import time
+from typing import Any
+
+import pytest
+
+from aci.server.e2b_sandbox_pool import E2bSandboxPool
+
+_ids = itertools.count()
+
+
+class FakeSandbox:
+    def __init__(self, api_key: str):
+        self.id = next(_ids)
+        self.api_key = api_key
+        self.contexts = 0
+        self.killed = False
+
+    def create_code_context(self) -> int:
+        self.contexts += 1
+        return self.contexts
+
+    def run_code(self, code: str, context: Any = None) -> tuple[int, str, Any]:
+        return self.id, code, context
+
+    def kill(self) -> None:
+        self.killed = True
+
+
+class FakeSandboxFactory:
+    def __init__(self) -> None:
+        self.created: list[FakeSandbox] = []
+
+    def __call__(self, api_key: str) -> FakeSandbox:
+        sandbox = FakeSandbox(api_key)
+        self.created.append(sandbox)
+        return sandbox
+
+
+def test_lease_reuses_released_sandbox_with_fresh_context() -> None:
+    sandbox_factory = FakeSandboxFactory()
+    created = sandbox_factory.created
+    pool = E2bSandboxPool(
+        sandbox_factory=sandbox_factory,
+        enabled=True,
+        min_idle=0,
+        max_idle=4,
+        max_uses=10,
+        max_age_seconds=60,
+        idle_ttl_seconds=60,
+        eviction_interval_seconds=60,
+        warmup_workers=1,
+    )
+
+    with pool.lease("key") as leased:
+        first = leased.run_code("x = 1")
+    with pool.lease("key") as leased:
+        second = leased.run_code("print(x)")
+
+    assert len(created) == 1
+    assert not created[0].killed
+    # same sandbox, new code context
+    assert first[0] == second[0]
+    assert first[2] != second[2]
+    metrics = pool.get_metrics()
+    assert metrics["created"] == 1
+    assert metrics["warm_hits"] == 1
+    assert metrics["idle"] == 1
+
+
+def test_sandboxes_are_not_shared_across_api_keys() -> None:
+    sandbox_factory = FakeSandboxFactory()
+    created = sandbox_factory.created
+    pool = E2bSandboxPool(
+        sandbox_factory=sandbox_factory,
+        enabled=True,
+        min_idle=0,
+        max_idle=4,
+        max_uses=10,
+        max_age_seconds=60,
+        idle_ttl_seconds=60,
+        eviction_interval_seconds=60,
+        warmup_workers=1,
+    )
+
+    with pool.lease("key-1"):
+        pass
+    with pool.lease("key-2") as leased:
+        assert leased.sandbox.api_key == "key-2"
+
+    assert len(created) == 2
+    assert pool.get_metrics()["api_keys"] == 2
+
+
+def test_failed_sandbox_is_killed() -> None:
+    sandbox_factory = FakeSandboxFactory()
+    created = sandbox_factory.created
+    pool = E2bSandboxPool(
+        sandbox_factory=sandbox_factory,
+        enabled=True,
+        min_idle=0,
+        max_idle=4,
+        max_uses=10,
+        max_age_seconds=60,
+        idle_ttl_seconds=60,
+        eviction_interval_seconds=60,
+        warmup_workers=1,
+    )
+
+    with pytest.raises(RuntimeError), pool.lease("key"):
+        raise RuntimeError("sandbox timeout")
+
+    assert created[0].killed
+    assert pool.get_metrics()["idle"] == 0
+    assert pool.get_metrics()["recycled"] == 1
+
+
+def test_sandbox_is_recycled_after_max_uses() -> None:
+    sandbox_factory = FakeSandboxFactory()
+    created = sandbox_factory.created
+    pool = E2bSandboxPool(
+        sandbox_factory=sandbox_factory,
+        enabled=True,
+        min_idle=0,
+        max_idle=4,
+        max_uses=2,
+        max_age_seconds=60,
+        idle_ttl_seconds=60,
+        eviction_interval_seconds=60,
+        warmup_workers=1,
+    )
+
+    for _ in range(3):
+        with pool.lease("key"):
+            pass
+
+    assert len(created) == 2
+    assert created[0].killed
+    assert not created[1].killed
+    assert pool.get_metrics()["recycled"] == 1
+
+
+def test_sandbox_is_recycled_after_max_age() -> None:
+    sandbox_factory = FakeSandboxFactory()
+    created = sandbox_factory.created
+    pool = E2bSandboxPool(
+        sandbox_factory=sandbox_factory,
+        enabled=True,
+        min_idle=0,
+        max_idle=4,
+        max_uses=10,
+        max_age_seconds=0.05,
+        idle_ttl_seconds=60,
+        eviction_interval_seconds=60,
+        warmup_workers=1,
+    )
+
+    with pool.lease("key"):
+        pass
+    assert pool.get_metrics()["idle"] == 1
+    time.sleep(0.06)
+    with pool.lease("key") as leased:
+        assert leased.sandbox is created[1]
+
+    assert created[0].killed
+    assert pool.get_metrics()["recycled"] == 1
+
+
+def test_max_idle_sandboxes_are_kept() -> None:
+    sandbox_factory = FakeSandboxFactory()
+    created = sandbox_factory.created
+    pool = E2bSandboxPool(
+        sandbox_factory=sandbox_factory,
+        enabled=True,
+        min_idle=0,
+        max_idle=1,
+        max_uses=10,
+        max_age_seconds=60,
+        idle_ttl_seconds=60,
+        eviction_interval_seconds=60,
+        warmup_workers=1,
+    )
+
+    with pool.lease("key"), pool.lease("key"):
+        pass
+
+    assert len(created) == 2
+    assert sum(sandbox.killed for sandbox in created) == 1
+    assert pool.get_metrics()["idle"] == 1
+
+
+def test_idle_sandboxes_are_evicted() -> None:
+    sandbox_factory = FakeSandboxFactory()
+    created = sandbox_factory.created
+    pool = E2bSandboxPool(
+        sandbox_factory=sandbox_factory,
+        enabled=True,
+        min_idle=0,
+        max_idle=4,
+        max_uses=10,
+        max_age_seconds=60,
+        idle_ttl_seconds=0.05,
+        eviction_interval_seconds=60,
+        warmup_workers=1,
+    )
+
+    with pool.lease("key"):
+        pass
+    asyncio.run(pool._evict_idle())
+    assert pool.get_metrics()["idle"] == 1
+
+    time.sleep(0.06)
+    asyncio.run(pool._evict_idle())
+
+    assert created[0].killed
+    metrics = pool.get_metrics()
+    assert metrics["evicted"] == 1
+    assert metrics["idle"] == 0
+    assert metrics["api_keys"] == 0
+
+
+def test_disabled_pool_creates_and_kills_a_sandbox_per_lease() -> None:
+    sandbox_factory = FakeSandboxFactory()
+    created = sandbox_factory.created
+    pool = E2bSandboxPool(
+        sandbox_factory=sandbox_factory,
+        enabled=False,
+        min_idle=0,
+        max_idle=4,
+        max_uses=10,
+        max_age_seconds=60,
+        idle_ttl_seconds=60,
+        eviction_interval_seconds=60,
+        warmup_workers=1,
+    )
+
+    for _ in range(2):
+        with pool.lease("key"):
+            pass
+
+    assert len(created) == 2
+    assert all(sandbox.killed for sandbox in created)
+    assert pool.get_metrics()["idle"] == 0
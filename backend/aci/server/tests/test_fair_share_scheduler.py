@@ -0,0 +1,204 @@
+import asyncio
+import contextlib
+import uuid
+from uuid import UUID
+
+import pytest
+
+from aci.common.exceptions import TooManyConcurrentExecutions
+from aci.server.fair_share_scheduler import FairShareScheduler
+
+
+@pytest.fixture(autouse=True)
+def weights(monkeypatch: pytest.MonkeyPatch) -> dict[UUID, float]:
+    """Weight of the projects, 1 if not set, instead of the weight of their plan (no database)."""
+    project_weights: dict[UUID, float] = {}
+
+    async def get_weight(
+        scheduler: FairShareScheduler, project_id: UUID, org_id: UUID | None
+    ) -> float:
+        return project_weights.get(project_id, 1.0)
+
+    monkeypatch.setattr(FairShareScheduler, "_get_weight", get_weight)
+    return project_weights
+
+
+def test_slots_go_to_the_smallest_virtual_finish_tag_first(weights: dict[UUID, float]) -> None:
+    blocker, light, heavy = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    weights[heavy] = 2.0
+    scheduler = FairShareScheduler(
+        enabled=True,
+        max_concurrency=1,
+        max_in_flight_per_project=10,
+        max_queued_per_project=10,
+        queue_timeout_seconds=5,
+        plan_weights={},
+        default_weight=1.0,
+        weight_cache_ttl_seconds=60,
+        weight_cache_size=100,
+    )
+    admitted: list[UUID] = []
+
+    async def execute(project_id: UUID) -> None:
+        async with scheduler.admit(project_id):
+            admitted.append(project_id)
+
+    async def main() -> None:
+        async with scheduler.admit(blocker):
+            # tags: light 1, 2, 3 and heavy 0.5, 1, 1.5
+            tasks = [asyncio.create_task(execute(light)) for _ in range(3)]
+            tasks += [asyncio.create_task(execute(heavy)) for _ in range(3)]
+            await asyncio.sleep(0)
+            assert scheduler.get_metrics()["waiting"] == 6
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    # equal tags are admitted in the order they were queued
+    assert admitted == [heavy, light, heavy, heavy, light, light]
+    metrics = scheduler.get_metrics()
+    assert metrics["in_flight"] == 0
+    assert metrics["projects"] == 0
+
+
+def test_project_over_its_in_flight_limit_does_not_block_the_others() -> None:
+    busy, other = uuid.uuid4(), uuid.uuid4()
+    scheduler = FairShareScheduler(
+        enabled=True,
+        max_concurrency=2,
+        max_in_flight_per_project=1,
+        max_queued_per_project=10,
+        queue_timeout_seconds=5,
+        plan_weights={},
+        default_weight=1.0,
+        weight_cache_ttl_seconds=60,
+        weight_cache_size=100,
+    )
+    admitted: list[UUID] = []
+
+    async def execute(project_id: UUID) -> None:
+        async with scheduler.admit(project_id):
+            admitted.append(project_id)
+
+    async def main() -> None:
+        async with scheduler.admit(busy):
+            # the second execution of the busy project waits for its own slot
+            tasks = [asyncio.create_task(execute(busy)), asyncio.create_task(execute(other))]
+            await asyncio.sleep(0)
+            metrics = scheduler.get_metrics()
+            assert metrics["in_flight"] == 2
+            assert metrics["waiting"] == 1
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    assert admitted == [other, busy]
+
+
+def test_waiter_is_withdrawn_on_timeout() -> None:
+    blocker, project_id = uuid.uuid4(), uuid.uuid4()
+    scheduler = FairShareScheduler(
+        enabled=True,
+        max_concurrency=1,
+        max_in_flight_per_project=10,
+        max_queued_per_project=10,
+        queue_timeout_seconds=0.05,
+        plan_weights={},
+        default_weight=1.0,
+        weight_cache_ttl_seconds=60,
+        weight_cache_size=100,
+    )
+    admitted: list[UUID] = []
+
+    async def execute() -> None:
+        async with scheduler.admit(project_id):
+            admitted.append(project_id)
+
+    async def main() -> None:
+        async with scheduler.admit(blocker):
+            with pytest.raises(TooManyConcurrentExecutions):
+                await execute()
+            assert scheduler.get_metrics()["waiting"] == 0
+            # queued after the withdrawn waiter, whose heap entry is skipped
+            task = asyncio.create_task(execute())
+            await asyncio.sleep(0)
+        await task
+
+    asyncio.run(main())
+
+    assert admitted == [project_id]
+    metrics = scheduler.get_metrics()
+    assert metrics["timeouts"] == 1
+    assert metrics["admitted"] == 2
+    assert metrics["in_flight"] == 0
+    assert metrics["projects"] == 0
+
+
+def test_waiter_is_withdrawn_on_cancel() -> None:
+    blocker, project_id = uuid.uuid4(), uuid.uuid4()
+    scheduler = FairShareScheduler(
+        enabled=True,
+        max_concurrency=1,
+        max_in_flight_per_project=10,
+        max_queued_per_project=10,
+        queue_timeout_seconds=5,
+        plan_weights={},
+        default_weight=1.0,
+        weight_cache_ttl_seconds=60,
+        weight_cache_size=100,
+    )
+
+    async def execute() -> None:
+        async with scheduler.admit(project_id):
+            pass
+
+    async def main() -> None:
+        async with scheduler.admit(blocker):
+            task = asyncio.create_task(execute())
+            await asyncio.sleep(0)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            assert scheduler.get_metrics()["waiting"] == 0
+
+    asyncio.run(main())
+
+    metrics = scheduler.get_metrics()
+    assert metrics["admitted"] == 1
+    assert metrics["in_flight"] == 0
+    assert metrics["projects"] == 0
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_released() -> None:
+    blocker, project_id = uuid.uuid4(), uuid.uuid4()
+    scheduler = FairShareScheduler(
+        enabled=True,
+        max_concurrency=1,
+        max_in_flight_per_project=10,
+        max_queued_per_project=10,
+        queue_timeout_seconds=5,
+        plan_weights={},
+        default_weight=1.0,
+        weight_cache_ttl_seconds=60,
+        weight_cache_size=100,
+    )
+
+    async def execute() -> None:
+        async with scheduler.admit(project_id):
+            pass
+
+    async def main() -> None:
+        async with scheduler.admit(blocker):
+            task = asyncio.create_task(execute())
+            await asyncio.sleep(0)
+        # admitted when the blocker released its slot, cancelled before resuming
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+
+    metrics = scheduler.get_metrics()
+    assert metrics["admitted"] == 2
+    assert metrics["in_flight"] == 0
+    assert metrics["projects"] == 0
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from aci.server import rate_limiter as rate_limiter_module
+from aci.server.rate_limiter import InMemoryRateLimiter, RateLimit, _get_retry_after
+
+_PER_10_SECONDS = RateLimit(name="per-10-seconds", amount=10, window_seconds=10)
+
+
+class FakeClock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    # start of a window of every limit
+    fake_clock = FakeClock(1000.0)
+    monkeypatch.setattr(rate_limiter_module.time, "time", fake_clock)
+    return fake_clock
+
+
+def _create_rate_limiter() -> InMemoryRateLimiter:
+    return InMemoryRateLimiter(plan_tiers={}, tier_cache_ttl_seconds=60, local_max_size=100)
+
+
+def _hit_until_limited(limiter: InMemoryRateLimiter, rate_limit: RateLimit) -> int:
+    allowed = 0
+    while asyncio.run(limiter.hit([("key", rate_limit)])).allowed:
+        allowed += 1
+    return allowed
+
+
+def test_retry_after_waits_for_the_previous_window_weight_to_decrease() -> None:
+    # estimate at elapsed 6: 10 * (10 - 6) / 10 + 5 = 9, one more request fits
+    assert _get_retry_after(_PER_10_SECONDS, current=5, previous=10, elapsed=2) == pytest.approx(4)
+
+
+def test_retry_after_is_zero_once_the_previous_window_weight_is_low_enough() -> None:
+    assert _get_retry_after(_PER_10_SECONDS, current=5, previous=10, elapsed=7) == 0
+    assert _get_retry_after(_PER_10_SECONDS, current=5, previous=0, elapsed=2) == 0
+
+
+def test_retry_after_waits_for_the_next_window_when_the_current_window_is_full() -> None:
+    # next window at elapsed 1: 10 * (10 - 1) / 10 + 0 = 9, one more request fits
+    assert _get_retry_after(_PER_10_SECONDS, current=10, previous=0, elapsed=3) == pytest.approx(8)
+
+
+def test_sliding_window_estimate_weights_the_previous_window(clock: FakeClock) -> None:
+    limiter = _create_rate_limiter()
+
+    assert _hit_until_limited(limiter, _PER_10_SECONDS) == 10
+
+    # half of the previous window still overlaps the sliding window: 10 * 0.5 + 5 = 10
+    clock.now = 1015.0
+    assert _hit_until_limited(limiter, _PER_10_SECONDS) == 5
+
+    # the previous window is now the window above, with 5 requests
+    clock.now = 1028.0
+    result = asyncio.run(limiter.hit([("key", _PER_10_SECONDS)]))
+    assert result.allowed
+    # 5 * 0.2 + 1
+    assert result.stats[0].remaining == 8
+    assert result.stats[0].reset_time == 1030.0
+
+
+def test_limited_client_is_shed_locally_until_retry_after(clock: FakeClock) -> None:
+    limiter = _create_rate_limiter()
+    _hit_until_limited(limiter, _PER_10_SECONDS)
+
+    clock.now = 1005.0
+    result = asyncio.run(limiter.hit([("key", _PER_10_SECONDS)]))
+    assert not result.allowed
+    assert result.exceeded == "per-10-seconds"
+    # blocked until 1011, when the estimate is 10 * 0.9 + 0
+    assert result.retry_after == pytest.approx(6)
+    assert limiter.get_metrics()["shed_locally"] == 1
+
+    clock.now = 1011.0
+    assert asyncio.run(limiter.hit([("key", _PER_10_SECONDS)])).allowed
+    assert asyncio.run(limiter.hit([("other-key", _PER_10_SECONDS)])).allowed
+
+
+def test_limited_request_is_not_counted_in_the_other_limits(clock: FakeClock) -> None:
+    limiter = _create_rate_limiter()
+    per_second = RateLimit(name="per-second", amount=1, window_seconds=1)
+    per_day = RateLimit(name="per-day", amount=100, window_seconds=86400)
+
+    assert asyncio.run(limiter.hit([("key", per_day), ("key", per_second)])).allowed
+    result = asyncio.run(limiter.hit([("key", per_day), ("key", per_second)]))
+    assert not result.allowed
+    assert result.exceeded == "per-second"
+
+    result = asyncio.run(limiter.hit([("key", per_day)]))
+    assert result.allowed
+    assert result.stats[0].remaining == 98
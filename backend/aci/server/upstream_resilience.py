@@ -0,0 +1,415 @@
+"""
+Protection of the workers against failing upstream APIs called by REST functions.
+
+- Circuit breaker per upstream host: when the failure rate (transport errors and 5xx responses)
+  over a rolling window gets too high, the circuit opens and calls to the host fail fast instead
+  of each one tying up a request for the full timeout. After a cool-down a few probe calls are let
+  through (half-open), which close the circuit again if they succeed.
+- Retry with exponential backoff and full jitter, only for idempotent methods, on transport
+  errors and 429/5xx responses. Retry-After is honored if it's within the retry budget. No retry
+  is made past the execution deadline (see aci.server.execution_deadline).
+- Bulkhead per upstream host: a cap on concurrent calls to the same host, so a slow or
+  rate-limited API can't take all of the worker's connections. Calls waiting too long for a slot
+  fail fast with a 429. Apps can have their own cap (App.max_concurrency).
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from enum import StrEnum
+from typing import Any
+
+import httpx
+
+from aci.common.exceptions import UpstreamConcurrencyLimitExceeded
+from aci.common.logging_setup import get_logger
+from aci.server import config
+from aci.server.execution_deadline import get_remaining_seconds
+
+logger = get_logger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class _WindowBucket:
+    second: int
+    total: int = 0
+    failures: int = 0
+
+
+@dataclass
+class HostCircuitStats:
+    """Runtime counters of a single upstream host"""
+
+    requests: int = 0
+    failures: int = 0
+    # calls rejected because the circuit was open
+    rejected: int = 0
+    retries: int = 0
+    opened: int = 0
+
+
+@dataclass
+class HostCircuitBreaker:
+    host: str
+    window_seconds: int
+    min_requests: int
+    failure_rate_threshold: float
+    open_seconds: float
+    half_open_max_calls: int
+    state: CircuitState = CircuitState.CLOSED
+    opened_at: float = 0.0
+    stats: HostCircuitStats = field(default_factory=HostCircuitStats)
+    _buckets: deque[_WindowBucket] = field(default_factory=deque)
+    _half_open_calls: int = 0
+    _half_open_successes: int = 0
+
+    def allow_request(self) -> bool:
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.stats.rejected += 1
+                return False
+            self._transition(CircuitState.HALF_OPEN)
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self._half_open_calls >= self.half_open_max_calls:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    self.stats.rejected += 1
+                    return False
+                # the probe calls never reported back (e.g. cancelled), probe again
+                self._transition(CircuitState.HALF_OPEN)
+            self._half_open_calls += 1
+
+        return True
+
+    def retry_after_seconds(self) -> float:
+        """How long until the open circuit lets a probe call through"""
+        return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        self.stats.requests += 1
+        if self.state == CircuitState.HALF_OPEN:
+            self._half_open_successes += 1
+            if self._half_open_successes >= self.half_open_max_calls:
+                self._transition(CircuitState.CLOSED)
+            return
+        self._record(failed=False)
+
+    def record_failure(self) -> None:
+        self.stats.requests += 1
+        self.stats.failures += 1
+        if self.state == CircuitState.HALF_OPEN:
+            self._transition(CircuitState.OPEN)
+            return
+        self._record(failed=True)
+        total, failures = self._window_counts()
+        if total >= self.min_requests and failures / total >= self.failure_rate_threshold:
+            self._transition(CircuitState.OPEN)
+
+    def _record(self, failed: bool) -> None:
+        second = int(time.monotonic())
+        if not self._buckets or self._buckets[-1].second != second:
+            self._buckets.append(_WindowBucket(second=second))
+        bucket = self._buckets[-1]
+        bucket.total += 1
+        if failed:
+            bucket.failures += 1
+
+    def _window_counts(self) -> tuple[int, int]:
+        oldest = int(time.monotonic()) - self.window_seconds
+        while self._buckets and self._buckets[0].second <= oldest:
+            self._buckets.popleft()
+        return (
+            sum(bucket.total for bucket in self._buckets),
+            sum(bucket.failures for bucket in self._buckets),
+        )
+
+    def _transition(self, state: CircuitState) -> None:
+        if state == CircuitState.OPEN:
+            self.opened_at = time.monotonic()
+            self.stats.opened += 1
+            logger.warning(f"Circuit opened for upstream host, host={self.host}")
+        elif state == CircuitState.HALF_OPEN:
+            # reused as the start of the half-open period
+            self.opened_at = time.monotonic()
+        elif state == CircuitState.CLOSED:
+            logger.info(f"Circuit closed for upstream host, host={self.host}")
+        self.state = state
+        self._buckets.clear()
+        self._half_open_calls = 0
+        self._half_open_successes = 0
+
+
+class CircuitBreakerRegistry:
+    def __init__(
+        self,
+        enabled: bool,
+        max_hosts: int,
+        window_seconds: int,
+        min_requests: int,
+        failure_rate_threshold: float,
+        open_seconds: float,
+        half_open_max_calls: int,
+    ):
+        """
+        Args:
+            enabled: if False, the circuit of every host always stays closed
+            max_hosts: max number of tracked hosts, the least recently used closed circuit is
+                dropped first
+            window_seconds: rolling window of the failure rate
+            min_requests: min requests in the window before the circuit can open
+            failure_rate_threshold: failure rate (0-1) in the window that opens the circuit
+            open_seconds: how long an open circuit rejects calls before probing the host
+            half_open_max_calls: probe calls let through, the circuit closes if all succeed
+        """
+        self.enabled = enabled
+        self.max_hosts = max_hosts
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.failure_rate_threshold = failure_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._breakers: OrderedDict[str, HostCircuitBreaker] = OrderedDict()
+
+    def get(self, host: str) -> HostCircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = HostCircuitBreaker(
+                host=host,
+                window_seconds=self.window_seconds,
+                min_requests=self.min_requests,
+                failure_rate_threshold=self.failure_rate_threshold,
+                open_seconds=self.open_seconds,
+                half_open_max_calls=self.half_open_max_calls,
+            )
+            self._evict()
+            self._breakers[host] = breaker
+        self._breakers.move_to_end(host)
+        return breaker
+
+    def allow_request(self, breaker: HostCircuitBreaker) -> bool:
+        return not self.enabled or breaker.allow_request()
+
+    def _evict(self) -> None:
+        if len(self._breakers) < self.max_hosts:
+            return
+        # never forget an open circuit, that would let the traffic through again
+        for host, breaker in self._breakers.items():
+            if breaker.state == CircuitState.CLOSED:
+                del self._breakers[host]
+                return
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            host: {
+                "state": breaker.state,
+                "requests": breaker.stats.requests,
+                "failures": breaker.stats.failures,
+                "rejected": breaker.stats.rejected,
+                "retries": breaker.stats.retries,
+                "opened": breaker.stats.opened,
+            }
+            for host, breaker in self._breakers.items()
+        }
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    backoff_base_seconds: float
+    backoff_max_seconds: float
+    # a Retry-After longer than this isn't waited for, the response is returned as is
+    retry_after_max_seconds: float
+
+    def is_retryable_method(self, method: str) -> bool:
+        return self.max_attempts > 1 and method.upper() in IDEMPOTENT_METHODS
+
+    def get_delay(self, attempt: int, response: httpx.Response | None = None) -> float | None:
+        """
+        Get how long to wait before the next attempt.
+
+        Args:
+            attempt: the attempt that just failed, starting at 1
+            response: the retryable response, None for a transport error
+
+        Returns:
+            None if no further attempt should be made, including when the execution deadline
+            would be reached before the next attempt
+        """
+        if attempt >= self.max_attempts:
+            return None
+        delay = None
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                if retry_after > self.retry_after_max_seconds:
+                    return None
+                delay = retry_after
+        if delay is None:
+            # exponential backoff with full jitter
+            delay = random.uniform(
+                0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** (attempt - 1))
+            )
+        return delay if delay < get_remaining_seconds() else None
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header, either delay-seconds or an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+@dataclass
+class Bulkhead:
+    name: str
+    max_concurrency: int
+    semaphore: asyncio.Semaphore
+    waiting: int = 0
+    in_flight: int = 0
+    completed: int = 0
+    # calls that timed out waiting for a slot
+    rejected: int = 0
+    last_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class BulkheadRegistry:
+    def __init__(
+        self,
+        default_max_concurrency: int,
+        max_concurrency_overrides: dict[str, int],
+        queue_timeout_seconds: float,
+    ):
+        """
+        Args:
+            default_max_concurrency: max concurrent calls per upstream host
+            max_concurrency_overrides: per host overrides of the concurrency cap
+            queue_timeout_seconds: max time a call waits for a slot before failing
+        """
+        self.default_max_concurrency = default_max_concurrency
+        self.max_concurrency_overrides = max_concurrency_overrides
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._bulkheads: dict[str, Bulkhead] = {}
+
+    def get(self, host: str, app_name: str, app_max_concurrency: int | None = None) -> Bulkhead:
+        """
+        Get the bulkhead of an upstream host, or the app's own bulkhead if the app overrides the
+        concurrency cap.
+        """
+        if app_max_concurrency is not None:
+            name, max_concurrency = f"{host}:{app_name}", app_max_concurrency
+        else:
+            name = host
+            max_concurrency = self.max_concurrency_overrides.get(host, self.default_max_concurrency)
+
+        bulkhead = self._bulkheads.get(name)
+        if bulkhead is None or bulkhead.max_concurrency != max_concurrency:
+            if bulkhead is not None:
+                # the app's cap changed, calls holding a slot of the old bulkhead finish on it
+                logger.info(
+                    f"Bulkhead concurrency changed, bulkhead={name}, "
+                    f"old={bulkhead.max_concurrency}, new={max_concurrency}"
+                )
+            bulkhead = Bulkhead(
+                name=name,
+                max_concurrency=max_concurrency,
+                semaphore=asyncio.Semaphore(max_concurrency),
+            )
+            self._bulkheads[name] = bulkhead
+        return bulkhead
+
+    @asynccontextmanager
+    async def slot(self, bulkhead: Bulkhead) -> AsyncIterator[None]:
+        """
+        Hold a slot of the bulkhead for the duration of the context.
+
+        Raises:
+            UpstreamConcurrencyLimitExceeded: no slot was free within the queue timeout
+        """
+        start = time.monotonic()
+        bulkhead.waiting += 1
+        try:
+            await asyncio.wait_for(bulkhead.semaphore.acquire(), timeout=self.queue_timeout_seconds)
+        except TimeoutError as e:
+            bulkhead.rejected += 1
+            logger.warning(
+                f"Timed out waiting for upstream bulkhead slot, bulkhead={bulkhead.name}, "
+                f"max_concurrency={bulkhead.max_concurrency}"
+            )
+            raise UpstreamConcurrencyLimitExceeded(
+                f"too many concurrent calls to {bulkhead.name}, retry later"
+            ) from e
+        finally:
+            bulkhead.waiting -= 1
+            bulkhead.last_wait_seconds = time.monotonic() - start
+            bulkhead.max_wait_seconds = max(bulkhead.max_wait_seconds, bulkhead.last_wait_seconds)
+
+        bulkhead.in_flight += 1
+        try:
+            yield
+        finally:
+            bulkhead.in_flight -= 1
+            bulkhead.completed += 1
+            bulkhead.semaphore.release()
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            name: {
+                "max_concurrency": bulkhead.max_concurrency,
+                "waiting": bulkhead.waiting,
+                "in_flight": bulkhead.in_flight,
+                "completed": bulkhead.completed,
+                "rejected": bulkhead.rejected,
+                "last_wait_seconds": round(bulkhead.last_wait_seconds, 3),
+                "max_wait_seconds": round(bulkhead.max_wait_seconds, 3),
+            }
+            for name, bulkhead in self._bulkheads.items()
+        }
+
+
+circuit_breaker_registry = CircuitBreakerRegistry(
+    enabled=config.UPSTREAM_CIRCUIT_BREAKER_ENABLED,
+    max_hosts=config.UPSTREAM_CIRCUIT_BREAKER_MAX_HOSTS,
+    window_seconds=config.UPSTREAM_CIRCUIT_BREAKER_WINDOW_SECONDS,
+    min_requests=config.UPSTREAM_CIRCUIT_BREAKER_MIN_REQUESTS,
+    failure_rate_threshold=config.UPSTREAM_CIRCUIT_BREAKER_FAILURE_RATE_THRESHOLD,
+    open_seconds=config.UPSTREAM_CIRCUIT_BREAKER_OPEN_SECONDS,
+    half_open_max_calls=config.UPSTREAM_CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+)
+
+retry_policy = RetryPolicy(
+    max_attempts=config.UPSTREAM_RETRY_MAX_ATTEMPTS,
+    backoff_base_seconds=config.UPSTREAM_RETRY_BACKOFF_BASE_SECONDS,
+    backoff_max_seconds=config.UPSTREAM_RETRY_BACKOFF_MAX_SECONDS,
+    retry_after_max_seconds=config.UPSTREAM_RETRY_AFTER_MAX_SECONDS,
+)
+
+bulkhead_registry = BulkheadRegistry(
+    default_max_concurrency=config.UPSTREAM_BULKHEAD_MAX_CONCURRENCY,
+    max_concurrency_overrides=config.UPSTREAM_BULKHEAD_MAX_CONCURRENCY_OVERRIDES,
+    queue_timeout_seconds=config.UPSTREAM_BULKHEAD_QUEUE_TIMEOUT_SECONDS,
+)
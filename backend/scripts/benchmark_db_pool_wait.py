@@ -0,0 +1,173 @@
+"""
+Benchmark of the function execution route under concurrency, to compare the DB pool wait time
+before and after releasing the DB connection before the credential refresh and the upstream call.
+
+Measures, against a running server, the requests/s and latency of
+POST /v1/functions/{function_name}/execute. Use a function with a slow upstream (e.g. a REST
+function of a mock app pointing at an endpoint that responds after ~300ms), and a concurrency above
+the DB pool size of the server (pool_size + max_overflow = 20 per worker): while the connection is
+held across the upstream call, executions wait for a connection from the pool and the latency grows
+with the concurrency.
+
+If --metrics-token is given, the DB pool of the worker is read from /v1/health/metrics: the time
+spent getting a connection from the pool (timed by the server on checkout, mean over the checkouts
+of the run and max since the worker started), and the checked out connections and overflow sampled
+during the run. Only meaningful with a single worker. The pool wait is only reported by servers
+with the timed pool (aci/common/utils.py TimedAsyncQueuePool); for the run before the change, use
+the server at the commit before the change with the timed pool and its db_pool metrics applied.
+
+Run it once against the server at the commit before the change (--label before) and once at the
+commit of the change (--label after), with the same settings. Raise the rate limits of the server
+(SERVER_RATE_LIMIT_IP_PER_SECOND, SERVER_RATE_LIMIT_IP_PER_DAY) above the load, rate limited
+requests are counted separately and excluded from the latencies.
+
+Usage (from the backend directory, with the server running):
+    uv run python scripts/benchmark_db_pool_wait.py --label after \\
+        --base-url http://localhost:8000 --concurrency 100 --requests 2000 \\
+        --api-key <API key> --function-name <FUNCTION_NAME> --linked-account-owner-id <owner id> \\
+        --metrics-token <SERVER_METRICS_TOKEN>
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import httpx
+
+
+async def _get_db_pool(client: httpx.AsyncClient, metrics_token: str) -> dict[str, Any]:
+    response = await client.get("/v1/health/metrics", headers={"X-METRICS-TOKEN": metrics_token})
+    if response.status_code != 200:
+        return {}
+    db_pool: dict[str, Any] = response.json().get("db_pool", {})
+    return db_pool
+
+
+async def _sample_db_pool(
+    client: httpx.AsyncClient, metrics_token: str, stop: asyncio.Event
+) -> list[dict[str, Any]]:
+    samples: list[dict[str, Any]] = []
+    while not stop.is_set():
+        db_pool = await _get_db_pool(client, metrics_token)
+        if db_pool:
+            samples.append(db_pool)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.05)
+        except TimeoutError:
+            pass
+    return samples
+
+
+async def _run(
+    send: Callable[[], Awaitable[httpx.Response]],
+    client: httpx.AsyncClient,
+    args: argparse.Namespace,
+) -> None:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies_ms: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def run_one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code != 429:
+                latencies_ms.append(elapsed_ms)
+
+    # warm up (connections, caches)
+    await asyncio.gather(*[run_one() for _ in range(min(args.concurrency, args.requests))])
+    latencies_ms.clear()
+    statuses.clear()
+
+    db_pool_before = await _get_db_pool(client, args.metrics_token) if args.metrics_token else {}
+    stop = asyncio.Event()
+    sampler = (
+        asyncio.create_task(_sample_db_pool(client, args.metrics_token, stop))
+        if args.metrics_token
+        else None
+    )
+    start = time.perf_counter()
+    await asyncio.gather(*[run_one() for _ in range(args.requests)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    samples = await sampler if sampler else []
+    db_pool_after = await _get_db_pool(client, args.metrics_token) if args.metrics_token else {}
+
+    latencies_ms.sort()
+    if latencies_ms:
+        p50 = latencies_ms[len(latencies_ms) // 2]
+        p99 = latencies_ms[max(int(len(latencies_ms) * 0.99) - 1, 0)]
+        latency = (
+            f"latency ms mean={statistics.mean(latencies_ms):8.2f} p50={p50:8.2f} p99={p99:8.2f}"
+        )
+    else:
+        latency = "no successful requests"
+    if samples:
+        db_pool = (
+            f"  db pool max checked_out={max(sample['checked_out'] for sample in samples)} "
+            f"max overflow={max(sample['overflow'] for sample in samples)}"
+        )
+    else:
+        db_pool = ""
+    if "checkouts" in db_pool_before and "checkouts" in db_pool_after:
+        checkouts = db_pool_after["checkouts"] - db_pool_before["checkouts"]
+        wait_ms = db_pool_after["wait_ms_total"] - db_pool_before["wait_ms_total"]
+        pool_wait = (
+            f"  pool wait ms mean={wait_ms / max(checkouts, 1):8.2f} "
+            f"max={db_pool_after['wait_ms_max']:8.2f} checkouts={checkouts}"
+        )
+    else:
+        pool_wait = ""
+    print(
+        f"{args.label:>6}: requests/s={args.requests / elapsed:8.1f}  {latency}{pool_wait}{db_pool}  "
+        f"statuses={dict(sorted(statuses.items()))}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--label", default="run", help="name of the run in the output, e.g. before/after"
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--api-key", required=True, help="API key of the project")
+    parser.add_argument("--function-name", required=True, help="function to execute")
+    parser.add_argument("--linked-account-owner-id", default="benchmark")
+    parser.add_argument("--function-input", default="{}", help="JSON input of the function")
+    parser.add_argument(
+        "--metrics-token", help="token of /v1/health/metrics, to report the pool wait"
+    )
+    args = parser.parse_args()
+
+    # +1 connection for the pool sampler
+    limits = httpx.Limits(
+        max_connections=args.concurrency + 1, max_keepalive_connections=args.concurrency + 1
+    )
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=120) as client:
+        body = {
+            "function_input": json.loads(args.function_input),
+            "linked_account_owner_id": args.linked_account_owner_id,
+        }
+
+        async def execute() -> httpx.Response:
+            return await client.post(
+                f"/v1/functions/{args.function_name}/execute",
+                json=body,
+                headers={"X-API-KEY": args.api_key},
+            )
+
+        await _run(execute, client, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""
+Benchmark of the requests per second of the server, to compare the middleware stack before and
+after moving InterceptorMiddleware and RateLimitMiddleware from BaseHTTPMiddleware to pure ASGI.
+
+Measures, against a running server, the requests/s and latency of:
+- GET /v1/health: the cost of the middleware stack itself
+- POST /v1/functions/{function_name}/execute: a function execution (use a cheap function, e.g. a
+  connector function of a mock app, so that the upstream latency doesn't hide the middlewares)
+
+Run it once against the server at the commit before the change (--label before) and once at the
+commit of the change (--label after), with the same settings. Raise the rate limits of the server
+(SERVER_RATE_LIMIT_IP_PER_SECOND, SERVER_RATE_LIMIT_IP_PER_DAY) above the load, rate limited
+requests are counted separately and excluded from the latencies.
+
+Usage (from the backend directory, with the server running):
+    uv run python scripts/benchmark_middleware.py --label after \\
+        --base-url http://localhost:8000 --concurrency 50 --requests 5000 \\
+        --api-key <API key> --function-name <FUNCTION_NAME> --linked-account-owner-id <owner id>
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+
+async def _run(
+    name: str, send: Callable[[], Awaitable[httpx.Response]], args: argparse.Namespace
+) -> None:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies_ms: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def run_one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code != 429:
+                latencies_ms.append(elapsed_ms)
+
+    # warm up (connections, caches)
+    await asyncio.gather(*[run_one() for _ in range(min(args.concurrency, args.requests))])
+    latencies_ms.clear()
+    statuses.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[run_one() for _ in range(args.requests)])
+    elapsed = time.perf_counter() - start
+
+    latencies_ms.sort()
+    if latencies_ms:
+        p50 = latencies_ms[len(latencies_ms) // 2]
+        p99 = latencies_ms[max(int(len(latencies_ms) * 0.99) - 1, 0)]
+        latency = (
+            f"latency ms mean={statistics.mean(latencies_ms):7.2f} p50={p50:7.2f} p99={p99:7.2f}"
+        )
+    else:
+        latency = "no successful requests"
+    print(
+        f"{args.label:>6} {name:>8}: requests/s={args.requests / elapsed:8.1f}  {latency}  "
+        f"statuses={dict(sorted(statuses.items()))}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--label", default="run", help="name of the run in the output, e.g. before/after"
+    )
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--api-key", help="API key of the project executing the function")
+    parser.add_argument(
+        "--function-name", help="function to execute, the execute route is skipped if not set"
+    )
+    parser.add_argument("--linked-account-owner-id", default="benchmark")
+    parser.add_argument("--function-input", default="{}", help="JSON input of the function")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+
+        async def health() -> httpx.Response:
+            return await client.get("/v1/health")
+
+        await _run("health", health, args)
+
+        if args.function_name:
+            body = {
+                "function_input": json.loads(args.function_input),
+                "linked_account_owner_id": args.linked_account_owner_id,
+            }
+            headers = {"X-API-KEY": args.api_key} if args.api_key else {}
+
+            async def execute() -> httpx.Response:
+                return await client.post(
+                    f"/v1/functions/{args.function_name}/execute", json=body, headers=headers
+                )
+
+            await _run("execute", execute, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())